@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Benchmark the text and ast complier backends, building and compiling a suite
+
+Usage::
+
+    python bench/backend.py [sections]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+from corpus import best, generateSuite
+
+from nomos.builder import NomosBuilder, compileCode
+
+
+def main(sections):
+    text = generateSuite(sections)
+    path = tempfile.mkdtemp()
+    try:
+        with open(os.path.join(path, "suite.ns"), "w") as f:
+            f.write(text)
+
+        print("suite: %d sections, %.2f MB" % (sections, len(text) / 1e6))
+        # the dsl parsing is the same for both backends
+        root = NomosBuilder(path, "suite.ns").parser.buildNomos()
+        timings = {}
+        for backend in ("text", "ast"):
+            def build():
+                builder = NomosBuilder(path, "suite.ns", backend=backend)
+                builder.compiler.complie(root)
+                return compileCode(builder.compiler.code, path, "suite.ns")
+            timings[backend] = best(build)
+            print("%-5s complie + compile %8.3fs" % (backend, timings[backend]))
+        print("speedup  %.2fx" % (timings["text"] / timings["ast"]))
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3000)
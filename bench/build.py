@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Benchmark parsing and compiling many test files with the build workers
+
+Usage::
+
+    python bench/build.py [files] [workers]
+"""
+
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+
+from corpus import best, generateSuite
+
+from nomos.runner import NomosRunner
+
+
+def main(count, workers):
+    path = tempfile.mkdtemp()
+    try:
+        files = []
+        for index in range(count):
+            filename = "suite%d.ns" % index
+            with open(os.path.join(path, filename), "w") as f:
+                f.write(generateSuite(20))
+            files.append((path, filename))
+
+        print("%d files, %d cpus" % (count, multiprocessing.cpu_count()))
+        timings = {}
+        for n in (1, workers):
+            timings[n] = best(lambda: NomosRunner("http://localhost", [path], cache=False,
+                                                  buildWorkers=n).compileTestcases(files))
+            print("build workers %2d %8.3fs" % (n, timings[n]))
+        print("speedup  %.2fx" % (timings[1] / timings[workers]))
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+         int(sys.argv[2]) if len(sys.argv) > 2 else multiprocessing.cpu_count())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Synthetic nomos suites for the benchmarks"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+INITIALIZE = """[initialize]
+
+$status= 1
+$token ="token"
+$page = 10
+
+"""
+
+SECTION = """
+# section {index}
+[post json data {index}]
+
+>> POST /post token=$token page=$page
+
+head << {{
+    connection: keep-alive
+    x_request_id: "req-{index}"
+}}
+
+json << {{
+    deviceStatus: [
+        {{
+            deviceId: {index}
+            status: $status
+            arr:[1,2,6]
+            name: "device {index}"
+        }}
+    ]
+}}
+
+content =~ /device/i
+code : 200
+content_type: application/json
+
+json {{
+    json {{
+        deviceStatus: [
+            {{
+                deviceId: {index}
+                deviceId != 0
+                arr:[1,2,6]
+            }}
+        ]
+    }}
+}}
+"""
+
+
+def generateSuite(sections):
+    """Generate the nomos dsl text with the given number of sections"""
+    parts = [INITIALIZE]
+    for index in range(sections):
+        parts.append(SECTION.format(index=index))
+    return "".join(parts)
+
+
+def best(func, number=1, repeat=3):
+    """Returns the best timing of the function in seconds"""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
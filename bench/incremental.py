@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Benchmark rebuilding a suite after one test section changed
+
+Usage::
+
+    python bench/incremental.py [sections]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+from corpus import best, generateSuite
+
+from nomos.builder import NomosBuilder
+
+
+def main(sections):
+    text = generateSuite(sections)
+    edits = [text.replace("deviceId: %d\n" % (sections // 2), "deviceId: %d\n" % value, 1) for value in (-1, -2)]
+    path = tempfile.mkdtemp()
+    filepath = os.path.join(path, "suite.ns")
+    try:
+        with open(filepath, "w") as f:
+            f.write(text)
+
+        print("suite: %d sections, %.2f MB" % (sections, len(text) / 1e6))
+        full = best(lambda: NomosBuilder(path, "suite.ns").build())
+        print("full build      %8.3fs" % full)
+
+        builder = NomosBuilder(path, "suite.ns")
+        builder.build()
+        state = {"edit": 0}
+
+        def rebuild():
+            state["edit"] ^= 1
+            with open(filepath, "w") as f:
+                f.write(edits[state["edit"]])
+            return builder.build()
+
+        incremental = best(rebuild)
+        print("one section     %8.3fs  changed %s" % (incremental, sorted(rebuild()[2])))
+        print("speedup  %.1fx" % (full / incremental))
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
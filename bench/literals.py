@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Benchmark the tokenizer pull methods over multi-megabyte literals
+
+Usage::
+
+    python bench/literals.py [megabytes]
+"""
+
+import sys
+
+from corpus import best
+
+from nomos.parser import NomosTokenizer
+
+
+def cases(size):
+    """The (name, text, pull function) benchmark cases"""
+    body = ("abcdefgh" * (size // 8 + 1))[:size]
+    lines = ("import os.path as p%d\r\n" * (size // 24 + 1))[:size]
+    return [
+        ("pullQuotedText", '"%s"' % body, lambda r: r.pullQuotedText()),
+        ("pullTripQuotedText", '"""%s"""' % body.replace("h", "\n"), lambda r: r.pullTripQuotedText()),
+        ("pullUnquotedText", body, lambda r: r.pullUnquotedText()),
+        ("pullRestOfLine", body + "\n", lambda r: r.pullRestOfLine()),
+        ("pullUtilMatch", "%s %%>" % lines.replace("\r\n", "\n"), lambda r: r.pullUtilMatch("%>")),
+    ]
+
+
+def main(megabytes):
+    size = int(megabytes * 1000000)
+    print("literal size: %.2f MB" % (size / 1e6))
+    for name, text, pull in cases(size):
+        try:
+            elapsed = best(lambda: pull(NomosTokenizer(text)))
+            print("%-20s %8.3fs %8.1f MB/s" % (name, elapsed, size / 1e6 / elapsed))
+        except Exception as e:
+            print("%-20s error: %s" % (name, e))
+
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 4)
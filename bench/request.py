@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Benchmark the client side cpu time of a request of the generated test method
+
+The test method runs against a session preparing the request like ``requests``
+without sending it. Run it before and after a complier change to compare.
+
+Usage::
+
+    python bench/request.py [headers] [params] [devices]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+import requests
+
+from corpus import best
+
+from nomos import nodes
+from nomos.builder import NomosBuilder, compileCode
+from nomos.testcase import WebTestCase
+
+
+SUITE = """[initialize]
+$token = "token"
+$page = 10
+
+[request]
+>> POST /post token=$token page=$page {params}
+head << {{ {headers} }}
+data: {{ name: "nomos", size: 12, page: $page }}
+
+[device status]
+>> POST /status token=$token
+json << {{ deviceStatus: [{devices}] }}
+"""
+
+DEVICE = '{{ deviceId: {index}, status: $page, name: "device {index}", arr: [1, 2, 6] }}'
+
+
+class Response(object):
+    status = 200
+
+
+class PreparingSession(object):
+    """The session preparing the request without sending it"""
+
+    def __init__(self):
+        self.session = requests.Session()
+
+    def doRequest(self, method, path, params=None, data=None, headers=None, json=None, files=None):
+        request = requests.Request(method, "http://localhost" + path, params=params, data=data,
+                                   headers=headers, json=json, files=files)
+        self.session.prepare_request(request)
+        return Response()
+
+
+class NullSession(object):
+    """The session doing nothing, the test method code only"""
+
+    def doRequest(self, method, path, params=None, data=None, headers=None, json=None, files=None):
+        return Response()
+
+
+def loadMethod(path, session, name):
+    """Returns the test method of the suite"""
+    code, className = NomosBuilder(path, "suite.ns").build()[:2]
+    ns = {"WebTestCase": WebTestCase, "_n": nodes, "_session": session, "_params": {}}
+    exec(compileCode(code, path, "suite.ns"), ns)
+    testClass = ns[className]
+    testClass.setUpClass()
+    return getattr(testClass(name), name)
+
+
+def main(headers, params, devices):
+    path = tempfile.mkdtemp()
+    try:
+        with open(os.path.join(path, "suite.ns"), "w") as f:
+            f.write(SUITE.format(
+                headers=", ".join('x_header_%d: "value %d"' % (i, i) for i in range(headers)),
+                params=" ".join('p%d="value %d"' % (i, i) for i in range(params)),
+                devices=", ".join(DEVICE.format(index=i) for i in range(devices))))
+
+        number = 2000
+        for section, title in (("test_request", "%d literal headers, %d literal params" % (headers, params)),
+                               ("test_device_status", "json of %d devices" % devices)):
+            print("section: %s" % title)
+            for name, session in (("test method", NullSession()), ("with request prepare", PreparingSession())):
+                method = loadMethod(path, session, section)
+                print("  %-22s %8.2fus per request" % (name, best(method, number) * 1e6))
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main(*[int(_) for _ in sys.argv[1:4]] + [10, 10, 100][len(sys.argv[1:4]):])
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Benchmark the tokenizers over a generated multi-megabyte suite
+
+Usage::
+
+    python bench/tokenizer.py [sections]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+from corpus import best, generateSuite
+
+from nomos.dsl import DslParser
+from nomos.parser import TOKENIZERS
+
+
+def main(sections):
+    text = generateSuite(sections)
+    path = tempfile.mkdtemp()
+    try:
+        with open(os.path.join(path, "suite.ns"), "w") as f:
+            f.write(text)
+
+        print("suite: %d sections, %.2f MB" % (sections, len(text) / 1e6))
+        timings = {}
+        for name in sorted(TOKENIZERS):
+            timings[name] = best(lambda: DslParser(path, "suite.ns", name).buildNomos())
+            print("%-8s buildNomos %8.3fs" % (name, timings[name]))
+        print("speedup  %.2fx" % (timings["default"] / timings["regex"]))
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Measure the memory held by the token stream of a generated suite
+
+Usage::
+
+    python bench/tokens.py [sections]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+from corpus import generateSuite
+
+from nomos import parser
+from nomos.dsl import DslParser
+
+
+class RecordingScanner(parser.NomosScanner):
+    """Keeps every pulled token alive"""
+
+    tokens = []
+
+    def pullNext(self):
+        t = super(RecordingScanner, self).pullNext()
+        self.tokens.append(t)
+        return t
+
+    def pullValue(self):
+        t = super(RecordingScanner, self).pullValue()
+        self.tokens.append(t)
+        return t
+
+
+def retained(path, tokenizer):
+    """Returns the memory retained by the parse tree plus the kept tokens"""
+    dslParser = DslParser(path, "suite.ns", tokenizer)
+    tracemalloc.start()
+    root = dslParser.buildNomos()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size
+
+
+def main(sections):
+    text = generateSuite(sections)
+    path = tempfile.mkdtemp()
+    try:
+        with open(os.path.join(path, "suite.ns"), "w") as f:
+            f.write(text)
+        parser.TOKENIZERS["recording"] = RecordingScanner
+        size = retained(path, "recording") - retained(path, "regex")
+    finally:
+        shutil.rmtree(path)
+
+    count = len(RecordingScanner.tokens)
+    print("suite: %d sections, %.2f MB" % (sections, len(text) / 1e6))
+    print("tokens: %d, %.2f MB, %.1f bytes/token" % (count, size / 1e6, float(size) / count))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
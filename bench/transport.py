@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Benchmark the per request overhead of the http transports against a local stub server
+
+The stub server runs in another process, the client cpu time is the
+time of this process only. Every transport sends the same requests on
+the keep-alive connections of its pool.
+
+Usage::
+
+    python bench/transport.py [requests]
+"""
+
+import json
+import multiprocessing
+import sys
+import time
+
+from nomos.http import HttpPool, HttpSession
+
+
+BODY = json.dumps({"code": 0, "items": list(range(20))}).encode()
+
+
+def serve(queue):
+    """Serves the stub responses, puts the server port to the queue"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def stub(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(BODY)))
+            self.end_headers()
+            self.wfile.write(BODY)
+
+        do_GET = do_POST = stub
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def measure(session, number):
+    """Returns the wall and the client cpu seconds of a request"""
+    requests = [
+        lambda: session.doRequest("GET", "/get", params={"page": 1, "q": "nomos"}),
+        lambda: session.doRequest("POST", "/post", json={"name": "nomos", "size": 12}),
+    ]
+    for request in requests:
+        request()
+    wall, cpu = time.time(), time.process_time()
+    for i in range(number):
+        requests[i % 2]().status
+    return (time.time() - wall) / number, (time.process_time() - cpu) / number
+
+
+def main(number):
+    queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(queue,))
+    server.daemon = True
+    server.start()
+    try:
+        url = "http://127.0.0.1:%d" % queue.get()
+        for backend in ("requests", "urllib3"):
+            pool = HttpPool()
+            results = [measure(HttpSession(url, pool=pool, backend=backend), number) for _ in range(3)]
+            wall, cpu = min(results, key=lambda _: _[1])
+            pool.close()
+            print("%-10s %8.1fus per request, %8.1fus client cpu, %d connections opened"
+                  % (backend, wall * 1e6, cpu * 1e6, pool.opened))
+    finally:
+        server.terminate()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
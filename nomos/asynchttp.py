@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""The asyncio http/1.1 client of the async test methods
+
+The :class:`AsyncHttpSession` has the :class:`HttpSession` interface with the
+``doRequest`` coroutine returning the :class:`HttpResponse`, it encodes the
+request bodies, follows the redirects and keeps the cookies like ``requests``.
+The keep-alive connections are in the :class:`ConnectionPool` shared by the
+sessions of a run, a connection serves one request at a time.
+"""
+
+import asyncio
+from http.cookiejar import CookieJar
+import ssl
+from urllib.parse import urlsplit
+from urllib.request import Request
+import zlib
+
+from requests.exceptions import TooManyRedirects
+from requests.structures import CaseInsensitiveDict
+
+from .http import HttpResponse
+from .transport import MAX_REDIRECTS, RawResponse, encodeBody, encodeQuery, redirect
+
+
+#: the methods retried on a new connection when the kept alive connection is closed before the response
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')
+
+
+class AsyncHttpSession(object):
+    """Asyncio http session
+
+    :param url: prefix url of the request paths.
+    :param timeout: (optional) How long to wait for the server to send
+                    data before giving up, as a float, or a (connect timeout,
+                    read timeout) tuple.
+    :type timeout: float or tuple
+    :param verify: (optional) Either a boolean, in which case it controls whether we verify
+                    the server's TLS certificate, or a string, in which case it must be a path
+                    to a CA bundle to use. Defaults to ``True``.
+    :param cert: (optional) if String, path to ssl client cert file (.pem).
+                    If Tuple, ('cert', 'key') pair.
+    :param pool: (optional) the connection pool shared by the sessions,
+                 defaults to a pool of the session.
+    """
+
+    #: the maximum number of the redirects of a request like ``requests``
+    MAX_REDIRECTS = MAX_REDIRECTS
+
+    def __init__(self, url, timeout=5, verify=True, cert=None, pool=None):
+        self.url = url
+        self.timeout = timeout
+        self.verify = verify
+        self.cert = cert
+        self.pool = pool if pool is not None else ConnectionPool()
+        #: the cookies of the responses sent by the next requests
+        self.cookies = CookieJar()
+        self._sslContext = None
+
+    async def doRequest(self, method, path, params=None, data=None, headers=None, json=None, files=None):
+        """Returns :class:`HttpResponse <Response>` object, see :meth:`HttpSession.doRequest`"""
+        url = encodeQuery(self.url + path, params)
+        headers = dict((k, v) for k, v in (headers or {}).items() if v is not None)
+        body, contentType = encodeBody(data, json, files)
+        if contentType and not any(k.lower() == 'content-type' for k in headers):
+            headers['Content-Type'] = contentType
+
+        for _ in range(self.MAX_REDIRECTS + 1):
+            res = await self.send(method, url, headers, body)
+            request = redirect(res, method, url, headers, body)
+            if request is None:
+                return HttpResponse(res)
+            method, url, headers, body = request
+        raise TooManyRedirects('Exceeded %s redirects.' % self.MAX_REDIRECTS)
+
+    async def send(self, method, url, headers, body):
+        """Sends the request on a pooled connection, returns the :class:`AsyncResponse`
+
+        A kept alive connection closed by the server is retried on a new connection when the
+        request is not written, or when no response is read and the method is idempotent.
+        """
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        key = (scheme, parts.hostname, parts.port or (443 if scheme == 'https' else 80))
+        connectTimeout, readTimeout = self.timeout if isinstance(self.timeout, tuple) else (self.timeout,) * 2
+        head = self.requestHead(method, url, parts, headers, body)
+
+        conn = await self.pool.acquire(key, self.sslContext() if scheme == 'https' else None, connectTimeout)
+        while True:
+            try:
+                res = await asyncio.wait_for(exchange(conn, head + body if body else head, method, url),
+                                             readTimeout)
+                break
+            except (ConnectionError, asyncio.IncompleteReadError):
+                conn.close()
+                # the server may have processed a request it did not answer
+                if not conn.requests or conn.written and (conn.received or method not in IDEMPOTENT_METHODS):
+                    raise
+            except BaseException:
+                conn.close()
+                raise
+            conn = await self.pool.acquire(key, conn.ssl, connectTimeout, reuse=False)
+
+        conn.requests += 1
+        if res.keepAlive:
+            self.pool.release(conn)
+        else:
+            conn.close()
+        self.cookies.extract_cookies(res, Request(url, method=method))
+        return res
+
+    def requestHead(self, method, url, parts, headers, body):
+        """Returns the request line and the headers bytes"""
+        host = parts.hostname
+        if ':' in host:
+            host = '[%s]' % host
+        if parts.port:
+            host = '%s:%d' % (host, parts.port)
+        fields = CaseInsensitiveDict([
+            ('Host', host),
+            ('User-Agent', 'nomos'),
+            ('Accept-Encoding', 'gzip, deflate'),
+            ('Accept', '*/*'),
+            ('Connection', 'keep-alive'),
+        ])
+        fields.update(headers)
+        if body:
+            fields['Content-Length'] = str(len(body))
+        elif method in ('POST', 'PUT', 'PATCH'):
+            fields['Content-Length'] = '0'
+        cookie = Request(url, method=method)
+        self.cookies.add_cookie_header(cookie)
+        if cookie.has_header('Cookie') and 'Cookie' not in fields:
+            fields['Cookie'] = cookie.get_header('Cookie')
+
+        target = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+        lines = ['%s %s HTTP/1.1' % (method, target)]
+        lines.extend('%s: %s' % (k, v) for k, v in fields.items())
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    def sslContext(self):
+        """Returns the ssl context of the verify and the cert options"""
+        if self._sslContext is None:
+            if isinstance(self.verify, str):
+                context = ssl.create_default_context(cafile=self.verify)
+            else:
+                context = ssl.create_default_context()
+                if not self.verify:
+                    context.check_hostname = False
+                    context.verify_mode = ssl.CERT_NONE
+            if self.cert:
+                context.load_cert_chain(*self.cert) if isinstance(self.cert, tuple) else context.load_cert_chain(self.cert)
+            self._sslContext = context
+        return self._sslContext
+
+
+class Connection(object):
+    """The http connection of the pool"""
+
+    def __init__(self, key, ssl, reader, writer):
+        self.key = key
+        self.ssl = ssl
+        self.reader = reader
+        self.writer = writer
+        #: the number of the requests served
+        self.requests = 0
+        #: the current request is written, and its response is started
+        self.written = self.received = False
+
+    def usable(self):
+        """Returns ``True`` if the connection is not closed by the both sides"""
+        return not self.writer.is_closing() and not self.reader.at_eof()
+
+    def close(self):
+        self.writer.close()
+
+
+class ConnectionPool(object):
+    """The idle keep-alive connections by the (scheme, host, port)
+
+    :param maxsize: (optional) the maximum number of the idle connections of a host, defaults to 100
+    :type maxsize: int
+    """
+
+    def __init__(self, maxsize=100):
+        self.maxsize = maxsize
+        self.idle = {}
+        #: the number of the connections opened and the requests sent on the idle connections
+        self.opened = 0
+        self.reused = 0
+
+    async def acquire(self, key, ssl, timeout=None, reuse=True):
+        """Returns an idle connection of the host or a new connection"""
+        idle = self.idle.get(key)
+        while reuse and idle:
+            conn = idle.pop()
+            if conn.usable():
+                self.reused += 1
+                return conn
+            conn.close()
+        scheme, host, port = key
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port, ssl=ssl), timeout)
+        self.opened += 1
+        return Connection(key, ssl, reader, writer)
+
+    def release(self, conn):
+        """Keeps the connection of a complete response alive for the next requests"""
+        idle = self.idle.setdefault(conn.key, [])
+        if len(idle) < self.maxsize and conn.usable():
+            idle.append(conn)
+        else:
+            conn.close()
+
+    def close(self):
+        """Closes the idle connections"""
+        for idle in self.idle.values():
+            for conn in idle:
+                conn.close()
+        self.idle = {}
+
+
+class AsyncResponse(RawResponse):
+    """The response of the asyncio session"""
+
+    def __init__(self, url, status, reason, fields, content, keepAlive):
+        super(AsyncResponse, self).__init__(url, status, reason, fields, content)
+        #: ``True`` if the connection serves the next request
+        self.keepAlive = keepAlive
+
+
+async def exchange(conn, request, method, url):
+    """Writes the request bytes with the flow control of the connection, returns the response"""
+    conn.written = conn.received = False
+    conn.writer.write(request)
+    await conn.writer.drain()
+    conn.written = True
+    line = await conn.reader.readline()
+    conn.received = bool(line)
+    return await readResponse(conn.reader, method, url, line)
+
+
+async def readResponse(reader, method, url, line=None):
+    """Reads the response of the request, the informational responses are skipped
+
+    :param line: (optional) the status line already read
+    """
+    while True:
+        if line is None:
+            line = await reader.readline()
+        if not line:
+            raise ConnectionError('The connection is closed before the response')
+        version, status, reason = (line.decode('latin-1').rstrip('\r\n').split(None, 2) + [''])[:3]
+        status = int(status)
+        fields = []
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            k, _, v = line.decode('latin-1').partition(':')
+            fields.append((k.strip(), v.strip()))
+        if not 100 <= status < 200:
+            break
+        line = None
+
+    headers = CaseInsensitiveDict()
+    for k, v in fields:
+        headers[k] = headers[k] + ', ' + v.lower() if k in headers else v.lower()
+    connection = headers.get('connection', '')
+    keepAlive = 'close' not in connection if version == 'HTTP/1.1' else 'keep-alive' in connection
+
+    if method == 'HEAD' or status in (204, 304):
+        content = b''
+    elif 'chunked' in headers.get('transfer-encoding', ''):
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';', 1)[0], 16)
+            if not size:
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        # the trailer headers
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+        content = b''.join(chunks)
+    elif 'content-length' in headers:
+        content = await reader.readexactly(int(headers['content-length']))
+    else:
+        content = await reader.read()
+        keepAlive = False
+
+    encoding = headers.get('content-encoding', '')
+    if encoding in ('gzip', 'x-gzip'):
+        content = zlib.decompress(content, 16 + zlib.MAX_WBITS)
+    elif encoding == 'deflate':
+        try:
+            content = zlib.decompress(content)
+        except zlib.error:
+            content = zlib.decompress(content, -zlib.MAX_WBITS)
+    return AsyncResponse(url, status, reason, fields, content, keepAlive)
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""The asyncio engine running the async test methods
+
+The test methods of all the test case classes run concurrently on the event
+loop of one thread, at most ``workers`` at a time. The tests of a class start
+after its ``setUpClass`` and its ``tearDownClass`` runs after them, a test
+starts after the tests it depends on, see :attr:`WebTestCase.DEPENDENCIES`,
+so a class takes the time of its longest dependency path. The events are
+recorded by test and replayed in the suite order like the
+:class:`ThreadedSuite` does.
+"""
+
+import asyncio
+import sys
+import time
+import unittest
+from unittest.util import strclass
+
+from .parallel import RecordingResult, replay
+from .testcase import WebTestCase
+
+
+#: the tracebacks of the test errors hide the frames of this module like the unittest frames
+__unittest = True
+
+
+class ClassFixture(object):
+    """The placeholder test of the errors and the skips of a class fixture, the setup and the teardown
+    of a test case class are not tests
+
+    :param description: the fixture and the test case class name
+    :type description: str
+    """
+
+    failureException = AssertionError
+
+    def __init__(self, description):
+        self.description = description
+
+    def id(self):
+        return self.description
+
+    def shortDescription(self):
+        return None
+
+    def countTestCases(self):
+        return 0
+
+    def __str__(self):
+        return self.description
+
+    __repr__ = __str__
+
+
+class AsyncSuite(object):
+    """The test suite running the test case class suites on an event loop
+
+    :param suites: the test case class suites
+    :type suites: list
+    :param workers: the maximum number of the tests running at a time
+    :type workers: int
+    :param pool: (optional) the connection pool of the sessions closed after the run
+    :type pool: ConnectionPool
+    """
+
+    def __init__(self, suites, workers, pool=None):
+        self.suites = list(suites)
+        self.workers = workers
+        self.pool = pool
+
+    def countTestCases(self):
+        return sum(_.countTestCases() for _ in self.suites)
+
+    def __call__(self, result):
+        return self.run(result)
+
+    def run(self, result):
+        """Runs the suites on a new event loop, the results are replayed to the result in the suite order"""
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self.runSuites(result))
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+        return result
+
+    async def runSuites(self, result):
+        semaphore = asyncio.Semaphore(max(self.workers, 1))
+        tasks = [asyncio.ensure_future(self.runClass(suite, semaphore)) for suite in self.suites]
+        try:
+            for task in tasks:
+                replay(await task, result)
+                if result.shouldStop:
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def runClass(self, suite, semaphore):
+        """Runs the tests of the test case class suite, returns the recorded events"""
+        tests = list(suite)
+        if not tests:
+            return []
+        testClass = type(tests[0])
+        fixtures = not getattr(testClass, '__unittest_skip__', False)
+        recorder = RecordingResult()
+        start = time.time()
+        if fixtures and not classFixture(testClass, 'setUpClass', recorder):
+            return recorder.events
+
+        # the loader orders the tests after the tests they depend on
+        dependencies = getattr(testClass, 'DEPENDENCIES', {})
+        tasks = {}
+        for test in tests:
+            depends = [tasks[_] for _ in dependencies.get(test._testMethodName, ()) if _ in tasks]
+            tasks[test._testMethodName] = asyncio.ensure_future(self.runTest(test, semaphore, depends))
+        events = []
+        for testEvents in await asyncio.gather(*tasks.values()):
+            events.extend(testEvents)
+        if fixtures:
+            classFixture(testClass, 'tearDownClass', recorder)
+            if hasattr(testClass, 'doClassCleanups'):
+                testClass.doClassCleanups()
+                for exc_info in testClass.tearDown_exceptions:
+                    recorder.addError(ClassFixture('tearDownClass (%s)' % strclass(testClass)), exc_info)
+        if getattr(suite, 'key', None) is not None:
+            recorder.addClassDuration(suite.key, time.time() - start)
+        return events + recorder.events
+
+    async def runTest(self, test, semaphore, depends=()):
+        if depends:
+            await asyncio.wait(depends)
+        recorder = RecordingResult()
+        async with semaphore:
+            await runTestCase(test, recorder)
+        return recorder.events
+
+
+def classFixture(testClass, name, result):
+    """Calls the class fixture method, the error is added to the result, returns ``True`` if it does not fail"""
+    try:
+        getattr(testClass, name)()
+        return True
+    except unittest.SkipTest as e:
+        result.addSkip(ClassFixture('%s (%s)' % (name, strclass(testClass))), str(e))
+    except Exception:
+        result.addError(ClassFixture('%s (%s)' % (name, strclass(testClass))), sys.exc_info())
+    return False
+
+
+class Outcome(object):
+    """The outcome of the parts of a test"""
+
+    def __init__(self, test):
+        self.test = test
+        #: the (failure, exc_info) errors
+        self.errors = []
+        #: the skip reason
+        self.skipped = None
+
+    async def call(self, func):
+        """Calls the function, awaits the coroutine it returns, returns ``True`` if it does not fail"""
+        try:
+            value = func()
+            if asyncio.iscoroutine(value):
+                await value
+            return True
+        except unittest.SkipTest as e:
+            self.skipped = str(e)
+        except self.test.failureException:
+            self.errors.append((True, sys.exc_info()))
+        except Exception:
+            self.errors.append((False, sys.exc_info()))
+        return False
+
+
+async def runTestCase(test, result):
+    """Runs the test like ``TestCase.run`` does, the coroutine of the test method is awaited"""
+    result.startTest(test)
+    try:
+        method = getattr(test, test._testMethodName)
+        for skipped in (type(test), method):
+            if getattr(skipped, '__unittest_skip__', False):
+                result.addSkip(test, getattr(skipped, '__unittest_skip_why__', ''))
+                return
+        failed = test.failedDependency() if isinstance(test, WebTestCase) else None
+        if failed:
+            result.addSkip(test, "%s did not pass" % failed)
+            return
+
+        outcome = Outcome(test)
+        if await outcome.call(test.setUp):
+            await outcome.call(method)
+            await outcome.call(test.tearDown)
+        await outcome.call(test.doCleanups)
+
+        expecting = getattr(method, '__unittest_expecting_failure__', False)
+        if outcome.skipped is not None:
+            result.addSkip(test, outcome.skipped)
+        elif expecting and outcome.errors:
+            result.addExpectedFailure(test, outcome.errors[0][1])
+        elif expecting:
+            result.addUnexpectedSuccess(test)
+        elif outcome.errors:
+            for failure, exc_info in outcome.errors:
+                (result.addFailure if failure else result.addError)(test, exc_info)
+        else:
+            result.addSuccess(test)
+            if isinstance(test, WebTestCase):
+                test.markPassed()
+    finally:
+        result.stopTest(test)
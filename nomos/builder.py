@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Incremental test case builder"""
+
+import ast
+import marshal
+import os
+
+from .compiler import AST_BACKEND, NomasAstComplirer, NomasComplirer
+from .dsl import DslParser
+
+
+class NomosBuilder(object):
+    """Builds the test case class code of a dsl file
+
+    The first build parses and complies the whole file, the next builds
+    re-parse and re-complie only the changed test sections.
+
+    :param path: the dsl file directory
+    :type path: str
+    :param filename: the dsl file name
+    :type filename: str
+    :param tokenizer: the dsl tokenizer name, defaults to ``"default"``
+    :type tokenizer: str, optional
+    :param backend: ``"ast"`` builds the python ast module, ``"text"`` the python code,
+                    defaults to ``"text"``, the text code before python 3.8
+    :type backend: str, optional
+    :param asyncMethods: builds the async test methods of the asyncio engine, defaults to ``False``
+    :type asyncMethods: bool, optional
+    """
+
+    def __init__(self, path, filename, tokenizer="default", backend="text", asyncMethods=False):
+        self.parser = DslParser(path, filename, tokenizer)
+        if backend == "ast" and AST_BACKEND:
+            self.compiler = NomasAstComplirer(asyncMethods)
+        else:
+            self.compiler = NomasComplirer(asyncMethods)
+        #: the test case node of the last build
+        self.root = None
+
+    def build(self):
+        """Build the test case class code
+
+        :returns: the class code or ast module, the class name and the names of
+                  the test methods added, removed or changed since the last build
+        :rtype: tuple
+        """
+        if self.root is None:
+            self.root = self.parser.buildNomos()
+        else:
+            self.parser.updateNomos()
+        self.compiler.code = ''
+        self.compiler.complie(self.root)
+        return self.compiler.code, self.root.name, self.compiler.changedMethods
+
+
+def compileCode(code, path, filename):
+    """Compile the test case class code, the ast module is compiled with the dsl file path
+    to show the dsl lines in the tracebacks"""
+    if isinstance(code, ast.AST):
+        return compile(code, os.path.join(path, filename), 'exec')
+    return compile(code, filename, 'exec')
+
+
+def buildWorker(args):
+    """Build and compile the dsl file in a build worker process
+
+    The code object can not be pickled, it is returned marshalled.
+
+    :param args: the dsl file directory, file name, the tokenizer name, the complier backend
+                 and if the test methods are async
+    :type args: tuple
+    :returns: the error raised, the marshalled code object and the class name
+    :rtype: tuple
+    """
+    path, filename, tokenizer, backend, asyncMethods = args
+    try:
+        code, className = NomosBuilder(path, filename, tokenizer, backend, asyncMethods).build()[:2]
+        return None, marshal.dumps(compileCode(code, path, filename)), className
+    except Exception as e:
+        return e, None, None
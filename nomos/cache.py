@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compiled test case cache, like the python ``__pycache__``"""
+
+import hashlib
+import marshal
+import os
+import platform
+import sys
+import tempfile
+
+from . import __version__
+from .compat import replace_file
+
+
+class CompileCache(object):
+    """The compiled nomos dsl code cache
+
+    The cache file stores the compiled code object and the test class name,
+    it is valid while the dsl content hash, the nomos version and the python
+    version are the same.
+
+    :param cacheDir: the cache directory, defaults to None, stores the cache
+                     in the ``__nomoscache__`` directory next to the dsl file.
+    :type cacheDir: str, optional
+    """
+
+    CACHE_DIR = "__nomoscache__"
+    """The default cache directory name"""
+
+    TAG = "%s%d%d" % (platform.python_implementation().lower(), sys.version_info[0], sys.version_info[1])
+    """The python implementation cache tag"""
+
+    def __init__(self, cacheDir=None):
+        self.cacheDir = cacheDir
+
+    def cachePath(self, filepath):
+        """Returns the cache file path for the dsl file"""
+        path, filename = os.path.split(os.path.abspath(filepath))
+        if self.cacheDir:
+            # keeps the files with the same name in different directories apart
+            digest = hashlib.sha1(path.encode("utf-8")).hexdigest()[:12]
+            return os.path.join(self.cacheDir, "%s.%s.%s.nsc" % (filename, digest, self.TAG))
+        return os.path.join(path, self.CACHE_DIR, "%s.%s.nsc" % (filename, self.TAG))
+
+    def key(self, text, codegen=""):
+        """Returns the cache key of the dsl text and the code generator name"""
+        h = hashlib.sha1()
+        h.update(text.encode("utf-8"))
+        h.update(("codegen %s" % codegen).encode("utf-8"))
+        h.update(("nomos %s" % __version__).encode("utf-8"))
+        h.update(("python %s" % sys.version).encode("utf-8"))
+        return h.hexdigest()
+
+    def load(self, filepath, key):
+        """Load the code object and class name, returns None if not cached"""
+        try:
+            with open(self.cachePath(filepath), "rb") as f:
+                cachedKey, className, code = marshal.load(f)
+        except Exception:
+            return None
+
+        if cachedKey != key:
+            return None
+        return code, className
+
+    def dump(self, filepath, key, code, className):
+        """Stores the code object and class name, a failed write is ignored"""
+        cachePath = self.cachePath(filepath)
+        try:
+            cacheDir = os.path.dirname(cachePath)
+            if not os.path.isdir(cacheDir):
+                os.makedirs(cacheDir)
+            fd, tmpPath = tempfile.mkstemp(dir=cacheDir)
+        except (IOError, OSError):
+            return
+
+        try:
+            with os.fdopen(fd, "wb") as f:
+                marshal.dump((key, className, code), f)
+            replace_file(tmpPath, cachePath)
+        except (IOError, OSError):
+            os.remove(tmpPath)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""The recorded http responses of the sessions
+
+A :class:`Cassette` file has a line of a request and its response, the
+line is the match key of the request, a tab and the json response. The
+recording transport appends a line of every request it sends, the replay
+transport answers the requests from the cassette without the network.
+
+The key of a request is the method, the url path, the sorted query params
+and the sha1 of the body, the requests to the other hosts of a recording
+match too. A request sent again gets the next recorded response of its key
+and the last one once they are used up.
+
+The replay indexes the line offsets by the key in one pass reading the
+keys only, the responses are read from the file when they are requested.
+"""
+
+import base64
+import hashlib
+import json as _json
+import os.path
+import threading
+
+from requests.compat import str, urlencode, urlsplit
+
+from .compat import parse_qsl
+from .errors import CassetteError
+from .transport import RawResponse, encodeBody
+
+
+#: the boundary of the multipart bodies of the match keys
+BOUNDARY = "nomos-cassette"
+
+
+class Cassette(object):
+    """The cassette file of the recorded responses
+
+    :param path: the cassette file
+    :type path: str
+    :param mode: ``"record"`` appends the responses to the file, ``"replay"`` reads them
+    :type mode: str
+    """
+
+    def __init__(self, path, mode="replay"):
+        self.path = path
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.file = None
+        #: the line offsets by the key of the replay and the number of the responses of a key replayed
+        self.offsets = None
+        self.replayed = {}
+
+    def record(self, key, res):
+        """Appends the response of the request key, a line is written at once by the processes of a run"""
+        entry = {"url": res.url, "status": res.status_code, "reason": res.reason,
+                 "headers": list(res.headers.items())}
+        content = res.content or b""
+        try:
+            entry["text"] = content.decode("utf-8")
+        except UnicodeDecodeError:
+            entry["base64"] = base64.b64encode(content).decode("ascii")
+        line = (key + "\t" + _json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8")
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, "ab")
+            self.file.write(line)
+            self.file.flush()
+
+    def replay(self, key):
+        """Returns the :class:`RawResponse` of the request key
+
+        :raises CassetteError: if the cassette has no response of the key
+        """
+        with self.lock:
+            if self.offsets is None:
+                self.offsets = self.index()
+            offsets = self.offsets.get(key)
+            if not offsets:
+                raise CassetteError("The cassette %r has no response of %s" % (self.path, key))
+            i = self.replayed.get(key, 0)
+            self.replayed[key] = i + 1
+            self.file.seek(offsets[min(i, len(offsets) - 1)])
+            line = self.file.readline()
+        entry = _json.loads(line.decode("utf-8").partition("\t")[2])
+        content = entry["text"].encode("utf-8") if "text" in entry else base64.b64decode(entry["base64"])
+        return RawResponse(entry["url"], entry["status"], entry["reason"], [tuple(_) for _ in entry["headers"]],
+                           content)
+
+    def index(self):
+        """Returns the line offsets by the key of the cassette file"""
+        if not os.path.isfile(self.path):
+            raise CassetteError("The cassette %r does not exist, record it first" % self.path)
+        self.file = open(self.path, "rb")
+        offsets = {}
+        offset = 0
+        for line in self.file:
+            key = line.partition(b"\t")[0].decode("utf-8")
+            offsets.setdefault(key, []).append(offset)
+            offset += len(line)
+        return offsets
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+            self.file = None
+            self.offsets = None
+            self.replayed = {}
+
+
+class RecordingTransport(object):
+    """The transport recording the responses of the transport to the cassette"""
+
+    def __init__(self, transport, cassette):
+        self.transport = transport
+        self.cassette = cassette
+
+    def request(self, method, url, params, data, headers, json, files, verify, cert, timeout, stream=False):
+        # the recorded content is read at once
+        key = requestKey(method, url, params, data, json, files)
+        res = self.transport.request(method, url, params, data, headers, json, files, verify, cert, timeout,
+                                     stream)
+        self.cassette.record(key, res)
+        return res
+
+
+class ReplayTransport(object):
+    """The transport answering the requests from the cassette"""
+
+    def __init__(self, cassette):
+        self.cassette = cassette
+
+    def request(self, method, url, params, data, headers, json, files, verify, cert, timeout, stream=False):
+        return self.cassette.replay(requestKey(method, url, params, data, json, files))
+
+
+def requestKey(method, url, params, data, json, files):
+    """Returns the match key of the request, the method, the path, the sorted query params and the body sha1"""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    for name, values in (params or {}).items():
+        for value in values if isinstance(values, list) else [values]:
+            if value is not None:
+                query.append((str(name), str(value)))
+    key = "%s %s" % (method.upper(), parts.path or "/")
+    if query:
+        key += "?" + urlencode(sorted(query))
+    body = bodyBytes(data, json, files)
+    if body:
+        key += " " + hashlib.sha1(body).hexdigest()
+    return key
+
+
+def bodyBytes(data, json, files):
+    """Returns the body of the request encoded the same way every time, the json keys are sorted and
+    the file objects are the file names
+    """
+    if files:
+        stable = {}
+        for name, value in files.items():
+            if isinstance(value, (tuple, list)):
+                content = getattr(value[1], "name", name) if hasattr(value[1], "read") else value[1]
+                value = (value[0], content) + tuple(value[2:3])
+            elif hasattr(value, "read"):
+                value = getattr(value, "name", name)
+            stable[name] = value
+        return encodeBody(data, None, stable, BOUNDARY)[0]
+    if not data and json is not None:
+        return _json.dumps(json, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    if hasattr(data, "read"):
+        return getattr(data, "name", "").encode("utf-8")
+    return encodeBody(data, None, None)[0]
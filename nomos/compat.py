@@ -39,3 +39,26 @@ except:
 
         def import_module_from_file(name, path):
             return imp.load_source(name, path)
+
+
+try:
+    # python 3.3+
+    from os import replace as replace_file
+except ImportError:
+    # python 2.7
+    import os
+
+    def replace_file(src, dst):
+        if os.name == 'nt' and os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+
+try:
+    # python 3
+    from urllib.parse import parse_qsl
+    from urllib.request import Request as UrlRequest
+except ImportError:
+    # python 2.7
+    from urllib2 import Request as UrlRequest
+    from urlparse import parse_qsl
@@ -14,17 +14,73 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import ast
+import keyword
 import re
+import sys
 
 from . import nodes
+from .errors import NomosError
+from .testcase import WebTestCase
+
+
+#: the json path key name
+_NAME_RE = re.compile(r'[A-Za-z_]\w*$')
+
+#: the class variables of the python expressions
+_SELF_ATTR_RE = re.compile(r'\bself\.([A-Za-z_]\w*)')
+
+#: the python expressions using the response but its status and its headers
+_RES_RE = re.compile(r'\bres\b(?!\.(?:status|contentType|charset|getHeader)\b)')
 
 
 class NomasComplirer(object):
-    """Test case node complier"""
+    """Test case node complier
+
+    :param asyncMethods: the test methods are the coroutines awaiting the request of
+                         the asyncio session, defaults to ``False``
+    :type asyncMethods: bool, optional
+    """
 
-    def __init__(self):
+    #: the value types of the literals in the request templates
+    LITERAL_TYPES = (nodes.ValueType.TEXT, nodes.ValueType.NUMRIC, nodes.ValueType.BOOL, nodes.ValueType.NONE)
+
+    #: the assert method of the json assert operations, see ``WebTestCase.assertRule``
+    RULE_ASSERTS = {
+        ':': 'assertEqual',
+        '=': 'assertEqual',
+        '==': 'assertEqual',
+        '<-': 'assertIn',
+        '=~': 'assertTrue',
+        '~~': 'assertEqual',
+        '!=': 'assertNotEqual',
+        '>': 'assertGreater',
+        '>=': 'assertGreaterEqual',
+        '<': 'assertLess',
+        '<=': 'assertLessEqual',
+    }
+
+    #: the content assert operations checked by the chunks of the streamed content
+    STREAM_OPERATIONS = ('=~', '<-', '~~')
+
+    def __init__(self, asyncMethods=False):
         self.code = ''
+        self.asyncMethods = asyncMethods
         self.indent = 0
+        #: the method code by the method node, reused while the node is not rebuilt
+        self.methodCodes = {}
+        #: the method code by the python method name, the later method of the same name wins
+        self.methodSources = {}
+        #: the class imports of the last complie
+        self.imports = None
+        #: the names of the methods changed by the last complie
+        self.changedMethods = set()
+        #: the python method name of the method complied
+        self.currentMethod = None
+        #: the (name, value code) class attributes of the method complied, written before it
+        self.constants = []
+        #: the class variables set by the initialize section only, the json of them is encoded once
+        self.initialVariables = set()
 
     def puts(self, line, indent=None):
         """Puts line with indent"""
@@ -45,6 +101,8 @@ class NomasComplirer(object):
         :type indent: number, optional
         """
         if isinstance(node, nodes.HttpTestCalssNode):
+            if self.updateInitialVariables(node):
+                self.methodCodes = {}
             # import modules
             if node.imports:
                 for importLine in node.imports:
@@ -55,11 +113,139 @@ class NomasComplirer(object):
             self.puts('class %s(%s):\n' % (node.name, node.baseClass))
             indent += 1
             self.writeSetupMethod(indent)
+            dependencies = self.methodDependencies(node.methods)
+            if dependencies:
+                self.puts('DEPENDENCIES = %r' % (dependencies,), indent)
+            methodCodes = {}
+            methodSources = {}
             for subnode in node.methods:
-                self.complie(subnode, indent)
+                code = self.methodCodes.get(subnode)
+                if code is None:
+                    code = self.complieMethodCode(subnode, indent)
+                methodCodes[subnode] = code
+                methodSources[self.methodName(subnode)] = code
+            # joins the method codes at once, appending one by one copies the class code per method
+            self.write(''.join(methodCodes[subnode] for subnode in node.methods))
+            self.changedMethods = self.diffMethods(methodSources, node.imports != self.imports)
+            self.methodCodes = methodCodes
+            self.methodSources = methodSources
+            self.imports = list(node.imports)
         elif isinstance(node, nodes.ActionMethodNode):
             self.complieMethod(node, indent)
 
+    def updateInitialVariables(self, node):
+        """Sets the class variables of the initialize section not captured by the test sections,
+        returns ``True`` if they are changed, the methods complied before are complied again
+        """
+        variables = set()
+        captured = set()
+        for subnode in node.methods:
+            (variables if subnode.name == 'initialize' else captured).update(subnode.context)
+        variables -= captured
+        if variables == self.initialVariables:
+            return False
+        self.initialVariables = variables
+        return True
+
+    def complieMethodCode(self, node, indent=0):
+        """Returns the method section code"""
+        code, self.code = self.code, ''
+        try:
+            self.complieMethod(node, indent)
+            return self.code
+        finally:
+            self.code = code
+
+    def diffMethods(self, methodSources, importsChanged=False):
+        """Returns the names of the methods added, removed or changed since the last complie"""
+        old, new = self.methodSources, methodSources
+        if importsChanged:
+            return set(old) | set(new)
+        return set(name for name in set(old) | set(new) if old.get(name) != new.get(name))
+
+    def methodName(self, node):
+        """Returns the python method name of the method node"""
+        return self.sectionMethodName(node.name)
+
+    def sectionMethodName(self, name):
+        """Returns the python method name of the test section name"""
+        if name == 'initialize':
+            return name
+        return "test_" + "_" .join(re.split(r"\W+", name))
+
+    def methodDependencies(self, methods):
+        """Returns the python method names of the test methods the test methods depend on
+
+        A test section depends on the sections of its ``depends`` key and the sections
+        capturing the class variables it uses.
+
+        :param methods: the method nodes
+        :type methods: list
+        :returns: the sorted method names tuple by the method name, the independent methods are not in
+        :rtype: dict
+        :raises NomosError: if a test section is unknown or the sections depend on each other
+        """
+        tests = [_ for _ in methods if _.name != 'initialize']
+        names = set(self.methodName(_) for _ in tests)
+        #: the method names by the captured class variable
+        captures = {}
+        for node in tests:
+            for key in node.context:
+                captures.setdefault(key, set()).add(self.methodName(node))
+
+        dependencies = {}
+        for node in tests:
+            name = self.methodName(node)
+            found = set()
+            for section in node.depends:
+                depend = self.sectionMethodName(section)
+                if depend not in names:
+                    raise NomosError("Unknown test section `%s` in the depends of the test section `%s`"
+                                     % (section, node.name))
+                found.add(depend)
+            for variable in self.methodVariables(node):
+                found.update(_ for _ in captures.get(variable, ()) if _ != name)
+            if found:
+                dependencies[name] = tuple(sorted(found))
+
+        path = []
+
+        def visit(name):
+            if name in path:
+                cycle = path[path.index(name):] + [name]
+                raise NomosError("The test sections depend on each other: %s" % " -> ".join(cycle))
+            path.append(name)
+            for depend in dependencies.get(name, ()):
+                visit(depend)
+            path.pop()
+
+        for name in dependencies:
+            visit(name)
+        return dependencies
+
+    def methodVariables(self, node):
+        """Returns the names of the class variables the test method uses"""
+        variables = set()
+        values = [node.params, node.data, node.headers, node.json, node.files, node.testAsserts,
+                  list(node.context.values())]
+        while values:
+            value = values.pop()
+            if isinstance(value, dict):
+                values.extend(value.keys())
+                values.extend(value.values())
+            elif isinstance(value, list):
+                values.extend(value)
+            elif isinstance(value, nodes.Node):
+                values.append(value.value)
+            elif isinstance(value, nodes.ValueNode):
+                if value.valueType == nodes.ValueType.VAR:
+                    variables.add(value.value.split('.')[0])
+                elif value.valueType in (nodes.ValueType.OBJ, nodes.ValueType.ARRAY):
+                    values.append(value.value)
+                elif isinstance(value.value, str):
+                    variables.update(_SELF_ATTR_RE.findall(value.value))
+        return variables
+
     def writeSetupMethod(self, indent):
         """Writes setup method"""
         self.puts("@classmethod", indent)
@@ -80,30 +266,42 @@ class NomasComplirer(object):
                 self.puts('cls.%s = %s' % (key, value.realValue()), indent)
             return
 
-        name = "_" .join(re.split("\W+", node.name))
-        self.puts("def {}(self):".format("test_" + name), indent)
+        # the method is written first, the class attributes it adds are written before it
+        code, self.code = self.code, ''
+        self.currentMethod = self.methodName(node)
+        self.constants = []
+        try:
+            self.complieTestMethod(node, indent)
+        finally:
+            method, self.code = self.code, code
+        for name, value in self.constants:
+            self.puts('%s = %s' % (name, value), indent)
+        self.write(method)
+
+    def complieTestMethod(self, node, indent=0):
+        """Write test method"""
+        self.puts("{}def {}(self):".format("async " if self.asyncMethods else "", self.currentMethod), indent)
         indent += 1
 
+        encoded = self.isEncodedJson(node)
+
         # writes request headers
-        self.puts('headers = {}', indent)
-        for k, v in node.headers.items():
-            k = self.formatHeaderKey(k.value)
-            self.puts('headers[%r] = %s' % (k, v.realValue()), indent)
+        self.complieRequestDict('headers', self.headerItems(node, encoded), indent)
 
         # writes http path params
-        self.puts('params = {}', indent)
-        for k, v in node.params.items():
-            v = v.realValue()
-            self.puts('params[%r] = %s' % (k.value, v), indent)
+        self.complieRequestDict('params', [(k.value, v) for k, v in node.params.items()], indent)
 
-        # writes http conttent params
-        self.puts('data = {}', indent)
-        for k, v in node.data.items():
-            v = v.realValue()
-            self.puts('data[%r] = %s' % (k.value, v), indent)
+        # writes http conttent params, the constant json is encoded by the first call of the class
+        if encoded:
+            attr = self.hoist('_body_%s' % self.currentMethod, 'None')
+            self.puts('data = self.%s' % attr, indent)
+            self.puts('if data is None:', indent)
+            self.puts('data = type(self).%s = self.encodeJson(%s)' % (attr, self.jsonNodePyCode(node.json)), indent + 1)
+        else:
+            self.complieRequestDict('data', [(k.value, v) for k, v in node.data.items()], indent)
 
         # writes json data
-        if node.json is not None:
+        if node.json is not None and not encoded:
             self.puts('jsonData =%s' % (self.jsonNodePyCode(node.json)), indent)
         else:
             self.puts('jsonData = None', indent)
@@ -114,14 +312,99 @@ class NomasComplirer(object):
         else:
             self.puts('files = None', indent)
 
-        self.puts('res = self.session.doRequest("{}", "{}", params=params, data=data, headers=headers, json=jsonData, files=files)'.format(
-            node.httpMethod, node.httpPath), indent)
+        self.puts('res = {}self.session.doRequest("{}", "{}", params=params, data=data, headers=headers, json=jsonData, files=files)'.format(
+            "await " if self.asyncMethods else "", node.httpMethod, node.httpPath), indent)
 
         self.puts("")
         self.puts("#Assert section", indent)
+        streamed = self.streamedAsserts(node)
         for testAssert in node.testAsserts:
+            if any(_ is testAssert for _ in streamed):
+                if testAssert is streamed[0]:
+                    self.complieStreamedAsserts(streamed, indent)
+                continue
             self.complieAssert(testAssert, indent)
 
+        # the class variables captured for the next test sections
+        for key, value in node.context.items():
+            self.puts('type(self).%s = %s' % (key, value.realValue()), indent)
+
+    def isEncodedJson(self, node):
+        """Returns ``True`` if the request json is sent as the json bytes encoded once by the class
+
+        The object or array json of the literals and the class variables of the initialize section
+        only is encoded, the variables captured by the test sections are sent by the ``json`` of the call,
+        ``requests`` sends no body for the None json and drops the json with the data or the files.
+        """
+        return (node.json is not None and node.json.valueType in (nodes.ValueType.OBJ, nodes.ValueType.ARRAY) and
+                not node.data and node.files is None and self.isConstantJson(node.json))
+
+    def isConstantJson(self, node):
+        """Returns ``True`` if the json value node has the literals and the initial class variables only,
+        see :meth:`updateInitialVariables`
+        """
+        if node.valueType == nodes.ValueType.OBJ:
+            return all(self.isConstantJson(_) for _ in node.value.values())
+        if node.valueType == nodes.ValueType.ARRAY:
+            return all(self.isConstantJson(_) for _ in node.value)
+        if node.valueType == nodes.ValueType.VAR:
+            return node.value.split('.')[0] in self.initialVariables
+        return node.valueType in self.LITERAL_TYPES
+
+    def headerItems(self, node, encoded=False):
+        """Returns the (key, value node) request headers, the encoded json sets the json content type"""
+        items = [(self.formatHeaderKey(k.value), v) for k, v in node.headers.items()]
+        if encoded and not any(k.lower() == 'content-type' for k, v in items):
+            items.append(('Content-Type', nodes.ValueNode('application/json', nodes.ValueType.TEXT)))
+        return items
+
+    def complieRequestDict(self, name, items, indent):
+        """Write the request dict of the (key, value node) items
+
+        The literal items are the class attribute template copied by the call,
+        the call sets the variable items only.
+        """
+        template, slots = self.requestTemplate(items)
+        if template:
+            attr = self.hoist('_%s_%s' % (name, self.currentMethod), '{%s}' % ', '.join(
+                '%r: %s' % (k, v.realValue() if v is not None else None) for k, v in template))
+            self.puts('%s = self.%s.copy()' % (name, attr), indent)
+        else:
+            self.puts('%s = {}' % name, indent)
+        for k, v in slots:
+            self.puts('%s[%r] = %s' % (name, k, v.realValue()), indent)
+
+    def requestTemplate(self, items):
+        """Returns the template and the variable slots of the request dict items
+
+        The template has the keys in the order they are first set, the keys set by the
+        variables are None in the template. The later items of such a key are slots too,
+        they set the key after the variable like before. The template is empty without
+        literal values left, all the items are slots then.
+
+        :param items: the (key, value node) list
+        :returns: the (key, value node or None) template list and the (key, value node) slot list
+        """
+        template = []
+        values = {}
+        slots = []
+        for key, value in items:
+            if key not in values:
+                template.append(key)
+            if key in values and values[key] is None or value.valueType not in self.LITERAL_TYPES:
+                values[key] = None
+                slots.append((key, value))
+            else:
+                values[key] = value
+        if all(values[_] is None for _ in template):
+            return [], list(items)
+        return [(_, values[_]) for _ in template], slots
+
+    def hoist(self, name, value):
+        """Adds the class attribute code written before the method, returns the name"""
+        self.constants.append((name, value))
+        return name
+
     def jsonNodePyCode(self, node):
         """Format json data to python code"""
         if node.valueType not in [nodes.ValueType.OBJ, nodes.ValueType.ARRAY]:
@@ -142,6 +425,33 @@ class NomasComplirer(object):
 
         return value
 
+    def streamedAsserts(self, node):
+        """Returns the content asserts of the test section checked by the chunks of the content at the
+        first of them, an empty list if the section reads the whole content
+
+        The asserts are the ``=~``, ``<-`` and ``~~`` content asserts, the other content asserts, the json
+        asserts and the expressions using the response read the whole content,
+        see ``WebTestCase.assertContentChunks``.
+        """
+        asserts = [_ for _ in node.testAsserts if not isinstance(_, nodes.JsonAssertNode) and
+                   self._key(_.key.value) == 'Content']
+        if not asserts or any(_.operation not in self.STREAM_OPERATIONS for _ in asserts):
+            return []
+        if any(isinstance(_, nodes.JsonAssertNode) for _ in node.testAsserts):
+            return []
+        values = [_.value for _ in node.testAsserts] + list(node.context.values())
+        if any(_.valueType == nodes.ValueType.GLOBAL_VAR and _RES_RE.search(_.value) for _ in values):
+            return []
+        return asserts
+
+    def complieStreamedAsserts(self, asserts, indent):
+        """Complie the content asserts checked by the chunks of the content"""
+        rules = []
+        for node in asserts:
+            regex = self.hoistRegex(node.value) if node.operation == '=~' else None
+            rules.append('(%r, %s)' % (node.operation, 'self.' + regex if regex else node.value.realValue()))
+        self._line('self.assertContentChunks(res, [%s])' % ', '.join(rules), indent)
+
     def complieAssert(self, node, indent=0):
         """Complie assert section"""
         if isinstance(node, nodes.JsonAssertNode):
@@ -150,50 +460,125 @@ class NomasComplirer(object):
             self.complieNormalAssert(node, indent)
 
     def complieJsonAssert(self, node, indent=0):
-        """Complie json assert section"""
-        # self.puts("#Testing json assert for {}".format(node.key.value), indent)
-        self.puts('assertNode =%s' % (self.jsonAssertNodePyCode(node)), indent)
-        self.puts("self.assertJson(res.json, assertNode)", indent)
+        """Complie json assert section to the straight-line asserts of the json values"""
+        self.puts('json0 = res.json', indent)
+        self.puts('self.assertIsNotNone(json0, %r)' % ('json',), indent)
+        for step in self.jsonAssertSteps(node):
+            if step[0] == 'load':
+                name, parent, key, path, checked = step[1:]
+                self.puts('%s = %s[%r]' % (name, parent, key), indent)
+                if checked:
+                    self.puts('self.assertIsNotNone(%s, %r)' % (name, path), indent)
+                continue
 
-    def jsonAssertNodePyCode(self, node):
-        """Returns the assert data serialize python code"""
+            parent, key, sized, operation, value, path = step[1:]
+            data = '%s[%r]' % (parent, key)
+            if sized:
+                data = 'len(%s)' % data
+            method = self.RULE_ASSERTS.get(operation)
+            if method is None:
+                # the other operations assert nothing
+                self.puts(data, indent)
+                continue
 
-        if isinstance(node, nodes.ValueNode):
-            return"_n.ValueNode(%s, _n.ValueType.RAW)" % (node.realValue())
+            regex = self.hoistRegex(value) if operation == '=~' else None
+            value = value.realValue()
+            if operation == '<-':
+                args = (value, data)
+            elif regex:
+                args = ('self.%s.search(%s)' % (regex, data),)
+            elif operation == '=~':
+                args = ('self._complieRegexMatch(%s).search(%s)' % (value, data),)
+            elif operation == '~~':
+                args = ('len(%s)' % data, value)
+            else:
+                args = (data, value)
+            self.puts('self.%s(%s, %r)' % (method, ', '.join('%s' % (_,) for _ in args), path), indent)
 
-        key = "_n.ValueNode(%r, %r)" % (node.key.value, node.key.valueType)
-        value = None
-        if isinstance(node.value, nodes.ValueNode):
-            value = "_n.ValueNode(%s, _n.ValueType.RAW)" % (node.value.realValue())
-        else:
-            value = []
+    def jsonAssertSteps(self, node, parent='json0', path='json', names=None, steps=None):
+        """Returns the steps of the json assert node checking the json value of the ``parent`` local,
+        the same checks in the same order as ``WebTestCase.assertJson``
+
+        - ``('load', name, parent, key, path, checked)`` loads ``parent[key]`` to the ``name`` local,
+          checks it is not None if ``checked``
+        - ``('rule', parent, key, sized, operation, value, path)`` asserts ``parent[key]`` or its
+          length if ``sized`` by the operation and the value node
+
+        :param path: the json path of the ``parent`` value in the failure messages
+        """
+        names = names if names is not None else [0]
+        steps = steps if steps is not None else []
+        key = node.key.value
+        path = self.jsonPath(path, key)
+
+        def local():
+            names[0] += 1
+            return 'json%d' % names[0]
+
+        if isinstance(node.value, nodes.ValueNode) or node.value is None:
+            # the array value of the other operations is dropped by the parser, the key is only loaded
+            steps.append(('rule', parent, key, node.key.valueType == nodes.ValueType.CMP,
+                          node.operation if node.value is not None else None, node.value, path))
+        elif node.nodeType == 'array':
+            name = local()
+            steps.append(('load', name, parent, key, path, False))
+            idx = 0
             for subnode in node.value:
-                value.append(self.jsonAssertNodePyCode(subnode))
-            value = "[" + ", \n".join(value) + "]"
+                itemPath = '%s[%d]' % (path, idx)
+                if isinstance(subnode, nodes.ValueNode):
+                    steps.append(('rule', name, idx, False, ':', subnode, itemPath))
+                    idx += 1
+                else:
+                    # the object items of the array are checked against the current item
+                    item = local()
+                    steps.append(('load', item, name, idx, itemPath, True))
+                    self.jsonAssertSteps(subnode, item, itemPath, names, steps)
+        elif node.value:
+            name = local()
+            steps.append(('load', name, parent, key, path, True))
+            for subnode in node.value:
+                self.jsonAssertSteps(subnode, name, path, names, steps)
+        return steps
 
-        return """_n.JsonAssertNode(
-        %s,
-        %r,
-        %s,
-        %r)
-""" % (key, node.nodeType, value, node.operation)
+    def jsonPath(self, path, key):
+        """Returns the json path of the key in the ``path`` value"""
+        if isinstance(key, str) and _NAME_RE.match(key):
+            return '%s.%s' % (path, key)
+        return '%s[%r]' % (path, key)
 
     def complieNormalAssert(self, node, indent):
         """Complie normal assert section"""
         assertKey = self._key(node.key.value)
+        regex = self.hoistRegex(node.value) if node.operation == '=~' else None
+        value = 'self.' + regex if regex else node.value.realValue()
 
         if assertKey in ('Status', 'Code', 'ContentType', 'Charset'):
-            self._line('self.assert%s(res, %r, %s)' % (assertKey, node.operation, node.value.realValue()), indent)
+            self._line('self.assert%s(res, %r, %s)' % (assertKey, node.operation, value), indent)
 
         elif assertKey == 'Content':
-            self._line('self.assertContent(res, %r, %s)' % (node.operation, node.value.realValue()), indent)
+            self._line('self.assertContent(res, %r, %s)' % (node.operation, value), indent)
 
         elif node.operation in [':', '=']:
             key = self._key(node.key.value)
-            self._line('self.assertHeader(res,%r, %r, %s)' % (key, node.operation, node.value.realValue()), indent)
+            self._line('self.assertHeader(res,%r, %r, %s)' % (key, node.operation, value), indent)
         else:
             key = self._key(node.key.value)
-            self._line('self.assertHeader(res,%r, %r, %s)' % (key, node.operation, node.value.realValue()), indent)
+            self._line('self.assertHeader(res,%r, %r, %s)' % (key, node.operation, value), indent)
+
+    def hoistRegex(self, node):
+        """Returns the class attribute name of the regex literal complied with the class
+
+        The variables and the texts failing to complie return None, they are complied
+        by the call through ``WebTestCase.REGEX_CACHE`` and fail the test like before.
+        """
+        if node.valueType != nodes.ValueType.TEXT:
+            return None
+        try:
+            WebTestCase.complieRegex(ast.literal_eval(node.realValue()))
+        except Exception:
+            return None
+        index = sum(1 for name, value in self.constants if name.startswith('_re_'))
+        return self.hoist('_re_%s_%d' % (self.currentMethod, index), 'WebTestCase.complieRegex(%s)' % node.realValue())
 
     def formatHeaderKey(self, key):
         """format headerk ey to speficial"""
@@ -210,3 +595,430 @@ class NomasComplirer(object):
         parts = re.split(r'[_-]', key.lower())
         parts = [_.capitalize() for _ in parts]
         return ''.join(parts)
+
+
+#: the ast backend builds the python 3.8+ ast nodes
+AST_BACKEND = sys.version_info >= (3, 8)
+
+#: the keyword has the location since python 3.9
+_KEYWORD_LOCATED = 'lineno' in ast.keyword._attributes
+
+#: the shared expression contexts, like the python parser
+_LOAD = ast.Load()
+_STORE = ast.Store()
+
+
+def _isName(value):
+    """Check the value is a python name"""
+    return value.isidentifier() and not keyword.iskeyword(value)
+
+
+def _sameTree(a, b):
+    """Check the ast nodes or the lists of them are the same but their locations"""
+    if a is b:
+        return True
+    if isinstance(a, list):
+        return isinstance(b, list) and len(a) == len(b) and all(_sameTree(x, y) for x, y in zip(a, b))
+    if isinstance(a, ast.AST):
+        return type(a) is type(b) and all(_sameTree(getattr(a, _, None), getattr(b, _, None)) for _ in a._fields)
+    return type(a) is type(b) and a == b
+
+
+class NomasAstComplirer(NomasComplirer):
+    """Test case node complier building the python ast
+
+    The ``code`` is the ``ast.Module`` of the test case class, it is passed to
+    ``compile()`` like the text code without parsing the python code again.
+    The method statements have the line numbers of the dsl file.
+    """
+
+    def __init__(self, asyncMethods=False):
+        super(NomasAstComplirer, self).__init__(asyncMethods)
+        self.code = None
+        #: the class attribute statements and the method ast by the method node
+        self.methodAsts = {}
+        #: the regex class attribute statements of the method built
+        self.constantAsts = []
+        #: the (lineno, col_offset, end_lineno, end_col_offset) of the nodes built next
+        self.loc = (1, 0, 1, 0)
+        #: the load expressions and constants of the location, the nodes of a line are shared
+        self.shared = {}
+        self.at(1)
+
+    def at(self, lineno):
+        """Sets the line number of the nodes built next"""
+        self.loc = (lineno, 0, lineno, 0)
+        self.shared = {}
+
+    def located(self, node):
+        """Sets the location of the node, the ast nodes are built with the positional fields,
+        the location keywords cost as much as the node"""
+        node.lineno, node.col_offset, node.end_lineno, node.end_col_offset = self.loc
+        return node
+
+    def complie(self, node, indent=0):
+        """Complie the test case class node to the python ast module
+
+        A method node complied before reuses its ast while its line number is the same.
+
+        :param node: the test case class node
+        :type node: nodes.HttpTestCalssNode
+        """
+        if self.updateInitialVariables(node):
+            self.methodAsts = {}
+        self.at(1)
+        body = []
+        for importLine in node.imports:
+            body.extend(self.parseCode(importLine).body)
+
+        methodSources = {}
+        methodAsts = {}
+        methods = [self.setupMethodAst()]
+        dependencies = self.methodDependencies(node.methods)
+        if dependencies:
+            self.at(1)
+            methods.extend(self.parseCode('DEPENDENCIES = %r' % (dependencies,)).body)
+        for subnode in node.methods:
+            trees = self.methodAsts.get(subnode)
+            if trees is None or trees[-1].lineno != (subnode.lineno or 1):
+                trees = self.methodAst(subnode)
+            methodSources[self.methodName(subnode)] = trees
+            methodAsts[subnode] = trees
+            methods.extend(trees)
+
+        self.at(1)
+        classDef = ast.ClassDef(name=node.name, bases=[self.loadExpr(node.baseClass)], keywords=[],
+                                body=methods, decorator_list=[])
+        self.located(classDef)
+        if 'type_params' in ast.ClassDef._fields:
+            classDef.type_params = []
+        classDef.end_lineno = max(_.end_lineno for _ in methods)
+        body.append(classDef)
+        self.code = ast.Module(body=body, type_ignores=[])
+
+        self.changedMethods = self.diffMethods(methodSources, node.imports != self.imports)
+        self.methodSources = methodSources
+        self.methodAsts = methodAsts
+        self.imports = list(node.imports)
+
+    def diffMethods(self, methodSources, importsChanged=False):
+        """Returns the names of the methods added, removed or changed since the last complie,
+        the method trees are compared without their locations
+        """
+        old, new = self.methodSources, methodSources
+        if importsChanged:
+            return set(old) | set(new)
+        return set(name for name in set(old) | set(new)
+                   if name not in old or name not in new or not _sameTree(old[name], new[name]))
+
+    def functionAst(self, name, argName, body, decorators=(), asyncDef=False):
+        """Returns the function or the coroutine function definition at the current line"""
+        func = (ast.AsyncFunctionDef if asyncDef else ast.FunctionDef)(
+            name=name,
+            args=ast.arguments(posonlyargs=[], args=[self.located(ast.arg(arg=argName, annotation=None))],
+                               vararg=None, kwonlyargs=[], kw_defaults=[], kwarg=None, defaults=[]),
+            body=body, decorator_list=[self.loadExpr(_) for _ in decorators], returns=None)
+        self.located(func)
+        if 'type_params' in ast.FunctionDef._fields:
+            func.type_params = []
+        func.end_lineno = max(_.end_lineno for _ in body) if body else func.lineno
+        return func
+
+    def setupMethodAst(self):
+        """Returns the setup method ast"""
+        body = [
+            self.exprStmt(self.callExpr(self.loadExpr('cls.initialize'), [])),
+            self.assignStmt(self.attrTarget('cls', 'session'), self.loadExpr('_session')),
+            self.assignStmt(self.attrTarget('cls', 'params'), self.loadExpr('_params')),
+        ]
+        return self.functionAst('setUpClass', 'cls', body, ['classmethod'])
+
+    def methodAst(self, node):
+        """Returns the class attribute statements of the method and the method ast"""
+        lineno = node.lineno or 1
+        self.at(lineno)
+        if node.name == 'initialize':
+            body = []
+            for key, value in node.context.items():
+                if _isName(key):
+                    body.append(self.assignStmt(self.attrTarget('cls', key), self.valueExpr(value)))
+                else:
+                    body.extend(self.parseCode('cls.%s = %s' % (key, value.realValue())).body)
+            self.at(lineno)
+            return [self.functionAst('initialize', 'cls', body, ['classmethod'])]
+
+        self.currentMethod = self.methodName(node)
+        self.constants = []
+        self.constantAsts = []
+        body = self.requestAst(node) + self.assertsAst(node) + self.capturesAst(node)
+        self.at(lineno)
+        return self.constantAsts + [self.functionAst(self.currentMethod, 'self', body, asyncDef=self.asyncMethods)]
+
+    def requestAst(self, node):
+        """Returns the request statements at the request line"""
+        self.at(node.requestLineno or node.lineno or 1)
+        encoded = self.isEncodedJson(node)
+        body = self.requestDictAst('headers', self.headerItems(node, encoded))
+        body.extend(self.requestDictAst('params', [(k.value, v) for k, v in node.params.items()]))
+        if encoded:
+            body.extend(self.encodedJsonAst(node))
+        else:
+            body.extend(self.requestDictAst('data', [(k.value, v) for k, v in node.data.items()]))
+
+        body.append(self.assignStmt('jsonData', self.jsonExpr(node.json) if node.json is not None and not encoded
+                                    else self.constExpr(None)))
+        body.append(self.assignStmt('files', self.jsonExpr(node.files) if node.files is not None
+                                    else self.constExpr(None)))
+
+        request = self.callExpr(
+            self.loadExpr('self.session.doRequest'),
+            [self.textExpr("{}".format(node.httpMethod)), self.textExpr("{}".format(node.httpPath))],
+            [(_, self.loadExpr(_)) for _ in ('params', 'data', 'headers')] +
+            [('json', self.loadExpr('jsonData')), ('files', self.loadExpr('files'))])
+        if self.asyncMethods:
+            request = self.located(ast.Await(request))
+        body.append(self.assignStmt('res', request))
+        return body
+
+    def requestDictAst(self, name, items):
+        """Returns the request dict statements, see :meth:`complieRequestDict`"""
+        template, slots = self.requestTemplate(items)
+        if template:
+            attr = '_%s_%s' % (name, self.currentMethod)
+            self.constantAsts.append(self.assignStmt(attr, self.dictExpr(
+                [self.constExpr(k) for k, v in template],
+                [self.valueExpr(v) if v is not None else self.constExpr(None) for k, v in template])))
+            body = [self.assignStmt(name, self.callExpr(self.loadExpr('self.%s.copy' % attr), []))]
+        else:
+            body = [self.assignStmt(name, self.dictExpr([], []))]
+        for k, v in slots:
+            body.append(self.assignStmt(self.subscriptTarget(name, k), self.valueExpr(v)))
+        return body
+
+    def encodedJsonAst(self, node):
+        """Returns the statements of the json encoded by the first call, see :meth:`complieTestMethod`"""
+        attr = '_body_%s' % self.currentMethod
+        self.constantAsts.append(self.assignStmt(attr, self.constExpr(None)))
+        target = self.located(ast.Attribute(
+            self.callExpr(self.loadExpr('type'), [self.loadExpr('self')]), attr, _STORE))
+        encode = self.located(ast.Assign(
+            [self.located(ast.Name('data', _STORE)), target],
+            self.callExpr(self.loadExpr('self.encodeJson'), [self.jsonExpr(node.json)])))
+        test = self.located(ast.Compare(self.loadExpr('data'), [ast.Is()], [self.constExpr(None)]))
+        return [
+            self.assignStmt('data', self.loadExpr('self.' + attr)),
+            self.located(ast.If(test, [encode], [])),
+        ]
+
+    def assertsAst(self, node):
+        """Returns the assert statements at the assert lines, the streamed content asserts at the first
+        of them, see :meth:`streamedAsserts`
+        """
+        body = []
+        streamed = self.streamedAsserts(node)
+        for testAssert in node.testAsserts:
+            if any(_ is testAssert for _ in streamed):
+                if testAssert is streamed[0]:
+                    self.at(testAssert.lineno or node.lineno or 1)
+                    body.append(self.streamedAssertsAst(streamed))
+                continue
+            self.at(testAssert.lineno or node.lineno or 1)
+            body.extend(self.assertAst(testAssert))
+        return body
+
+    def streamedAssertsAst(self, asserts):
+        """Returns the statement of the content asserts checked by the chunks of the content"""
+        rules = []
+        for node in asserts:
+            regex = self.hoistRegexAst(node.value) if node.operation == '=~' else None
+            value = self.loadExpr('self.' + regex) if regex else self.valueExpr(node.value)
+            rules.append(self.located(ast.Tuple([self.constExpr(node.operation), value], _LOAD)))
+        return self.exprStmt(self.callExpr(self.loadExpr('self.assertContentChunks'),
+                                           [self.loadExpr('res'), self.listExpr(rules)]))
+
+    def capturesAst(self, node):
+        """Returns the class variable statements at the variable lines, see :meth:`complieTestMethod`"""
+        body = []
+        for key, value in node.context.items():
+            self.at(node.contextLinenos.get(key) or node.lineno or 1)
+            if _isName(key):
+                target = self.located(ast.Attribute(
+                    self.callExpr(self.loadExpr('type'), [self.loadExpr('self')]), key, _STORE))
+                body.append(self.assignStmt(target, self.valueExpr(value)))
+            else:
+                body.extend(self.parseCode('type(self).%s = %s' % (key, value.realValue())).body)
+        return body
+
+    def assertAst(self, node):
+        """Returns the assert section statements"""
+        if isinstance(node, nodes.JsonAssertNode):
+            return self.jsonAssertAst(node)
+
+        assertKey = self._key(node.key.value)
+        regex = self.hoistRegexAst(node.value) if node.operation == '=~' else None
+        value = self.loadExpr('self.' + regex) if regex else self.valueExpr(node.value)
+        args = [self.loadExpr('res'), self.constExpr(node.operation), value]
+        if assertKey in ('Status', 'Code', 'ContentType', 'Charset', 'Content'):
+            func = 'assert' + assertKey
+        else:
+            func = 'assertHeader'
+            args.insert(1, self.constExpr(assertKey))
+        return [self.exprStmt(self.callExpr(self.loadExpr('self.' + func), args))]
+
+    def jsonAssertAst(self, node):
+        """Returns the straight-line json assert statements, see :meth:`complieJsonAssert`"""
+        body = [
+            self.assignStmt('json0', self.loadExpr('res.json')),
+            self.exprStmt(self.callExpr(self.loadExpr('self.assertIsNotNone'),
+                                        [self.loadExpr('json0'), self.constExpr('json')])),
+        ]
+        for step in self.jsonAssertSteps(node):
+            if step[0] == 'load':
+                name, parent, key, path, checked = step[1:]
+                body.append(self.assignStmt(name, self.subscriptExpr(parent, key)))
+                if checked:
+                    body.append(self.exprStmt(self.callExpr(self.loadExpr('self.assertIsNotNone'),
+                                                            [self.loadExpr(name), self.constExpr(path)])))
+                continue
+
+            parent, key, sized, operation, value, path = step[1:]
+            data = self.subscriptExpr(parent, key)
+            if sized:
+                data = self.callExpr(self.loadExpr('len'), [data])
+            method = self.RULE_ASSERTS.get(operation)
+            if method is None:
+                body.append(self.exprStmt(data))
+                continue
+
+            regex = self.hoistRegexAst(value) if operation == '=~' else None
+            value = self.valueExpr(value)
+            if operation == '<-':
+                args = [value, data]
+            elif regex:
+                search = self.located(ast.Attribute(self.loadExpr('self.' + regex), 'search', _LOAD))
+                args = [self.callExpr(search, [data])]
+            elif operation == '=~':
+                regex = self.callExpr(self.loadExpr('self._complieRegexMatch'), [value])
+                args = [self.callExpr(self.located(ast.Attribute(regex, 'search', _LOAD)), [data])]
+            elif operation == '~~':
+                args = [self.callExpr(self.loadExpr('len'), [data]), value]
+            else:
+                args = [data, value]
+            body.append(self.exprStmt(self.callExpr(self.loadExpr('self.' + method), args + [self.constExpr(path)])))
+        return body
+
+    def jsonExpr(self, node):
+        """Returns the json data expression"""
+        if node.valueType == nodes.ValueType.ARRAY:
+            return self.listExpr([self.jsonExpr(_) for _ in node.value])
+
+        if node.valueType == nodes.ValueType.OBJ:
+            return self.dictExpr([self.constExpr(_) for _ in node.value],
+                                 [self.jsonExpr(_) for _ in node.value.values()])
+        return self.valueExpr(node)
+
+    def hoistRegexAst(self, node):
+        """Returns the class attribute name of the regex literal, see :meth:`hoistRegex`,
+        the class attribute statement is at the current line
+        """
+        name = self.hoistRegex(node)
+        if name:
+            self.constantAsts.append(self.assignStmt(
+                name, self.callExpr(self.loadExpr('WebTestCase.complieRegex'), [self.valueExpr(node)])))
+        return name
+
+    def valueExpr(self, node):
+        """Returns the expression of the value node, the same value as the ``realValue()`` code"""
+        valueType = node.valueType
+        value = node.value
+        if valueType == nodes.ValueType.NONE:
+            return self.constExpr(None)
+
+        if valueType == nodes.ValueType.TEXT:
+            return self.textExpr(value)
+
+        if valueType == nodes.ValueType.VAR and _isName(value):
+            return self.loadExpr('self.' + value)
+
+        if valueType == nodes.ValueType.GLOBAL_VAR and _isName(value):
+            return self.loadExpr(value)
+
+        if isinstance(value, (bool, int, float)):
+            return self.literalExpr(value)
+
+        return self.parseCode('%s' % (node.realValue(),), 'eval').body
+
+    def textExpr(self, text):
+        """Returns the expression of the text in the double quotes"""
+        if '\\' in text or '"' in text or '\n' in text or '\r' in text or '\0' in text:
+            return self.parseCode('"' + text + '"', 'eval').body
+        return self.constExpr(text)
+
+    def parseCode(self, code, mode='exec'):
+        """Parse the python code at the current line"""
+        tree = ast.parse(code, mode=mode)
+        for node in ast.walk(tree):
+            if 'lineno' in node._attributes:
+                self.located(node)
+        return tree
+
+    def literalExpr(self, value):
+        """Returns the expression of the ``repr()`` code of the value, the negative numbers are negated"""
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and str(value).startswith('-'):
+            return self.located(ast.UnaryOp(ast.USub(), self.constExpr(-value)))
+        return self.constExpr(value)
+
+    def constExpr(self, value):
+        if isinstance(value, float):
+            return self.located(ast.Constant(value))
+        # True == 1, the type keeps them apart
+        key = (type(value), value)
+        node = self.shared.get(key)
+        if node is None:
+            node = self.shared[key] = self.located(ast.Constant(value))
+        return node
+
+    def loadExpr(self, path):
+        """Returns the load expression of the dotted name"""
+        node = self.shared.get(path)
+        if node is None:
+            name, dot, attr = path.rpartition('.')
+            if dot:
+                node = ast.Attribute(self.loadExpr(name), attr, _LOAD)
+            else:
+                node = ast.Name(path, _LOAD)
+            self.shared[path] = self.located(node)
+        return node
+
+    def attrTarget(self, name, attr):
+        return self.located(ast.Attribute(self.loadExpr(name), attr, _STORE))
+
+    def subscriptTarget(self, name, key):
+        return self.subscriptExpr(name, key, _STORE)
+
+    def subscriptExpr(self, name, key, ctx=_LOAD):
+        key = self.literalExpr(key)
+        if sys.version_info < (3, 9):
+            key = ast.Index(key)
+        return self.located(ast.Subscript(self.loadExpr(name), key, ctx))
+
+    def listExpr(self, items):
+        return self.located(ast.List(items, _LOAD))
+
+    def dictExpr(self, keys, values):
+        return self.located(ast.Dict(keys, values))
+
+    def callExpr(self, func, args, keywords=()):
+        keywords = [ast.keyword(k, v) for k, v in keywords]
+        if _KEYWORD_LOCATED:
+            for k in keywords:
+                self.located(k)
+        return self.located(ast.Call(func, list(args), keywords))
+
+    def assignStmt(self, target, value):
+        if isinstance(target, str):
+            target = self.located(ast.Name(target, _STORE))
+        return self.located(ast.Assign([target], value))
+
+    def exprStmt(self, value):
+        return self.located(ast.Expr(value))
@@ -13,18 +13,49 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import hashlib
 import os
 import re
 
 from . import nodes
 from .errors import ParserException
-from .parser import NomosTokenizer
+from .parser import TOKENIZERS
 from .parser import TokenType
 from .util import resource
 
 from .config import SelectConfig
 
 
+def _matchLength(a, b, limit, block=4096):
+    """Returns the length of the common prefix of the texts up to the limit"""
+    i = 0
+    while i + block <= limit and a[i:i + block] == b[i:i + block]:
+        i += block
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class DslSection(object):
+    """The test section span of the dsl text
+
+    The section starts at the ``[`` of the method name, the text before the
+    first section is kept as a section without method.
+    """
+
+    __slots__ = ('start', 'end', 'fingerprint', 'method', 'imports')
+
+    def __init__(self, start, method=None):
+        self.start = start
+        self.end = start
+        #: the sha1 of the section text
+        self.fingerprint = None
+        #: the action method node, None for the text before the first section
+        self.method = method
+        #: the import lines of the section
+        self.imports = []
+
+
 class DslParser(object):
     """Dsl parser"""
 
@@ -64,10 +95,18 @@ class DslParser(object):
     IMPOER_REGEX = re.compile(r"import\s+[.a-zA-Z_][a-zA-Z0-9_]")
     """import regex expression"""
 
-    def __init__(self, path, filename):
+    def __init__(self, path, filename, tokenizer="default"):
         self.filename = filename
         self.path = path
         self._diagnosticStack = []
+        #: the tokenizer class to read dsl text
+        self.tokenizerClass = TOKENIZERS[tokenizer]
+
+        #: the (onText, onObject, onArray) value handlers, builds the value from the text, object or array
+        self.textHandlers = (self.textValueNode, None, None)
+        self.skipHandlers = (self.textValueNode, self.skipObject, self.skipArray)
+        self.jsonHandlers = (self.textValueNode, self.parseJsonObject, self.parseJsonArray)
+        self.configHandlers = (self.literalValue, self.parseConfigObject, self.parseConfigArray)
 
     def _className(self, name):
         """Generate test class name"""
@@ -89,176 +128,295 @@ class DslParser(object):
 
     def buildConfig(self):
         """build  select config"""
-        nodes = []
         filepath = os.path.join(self.path, self.filename)
         text = resource(filepath)
-        self.reader = NomosTokenizer(text, True)
-        self.parseObject(nodes)
-        root = dict()
-        self.convertToDict(root, nodes)
+        self.reader = self.tokenizerClass(text, True)
+        root = self.parseConfigObject()
         pyconfig = SelectConfig(root)
         return pyconfig
 
-    def convertToDict(self, root, nodes):
-        """convert to dict
-        :param root: root config node
-        :type root: dict
-        :param nodes: node list
-        :type nodes: list
-        """
-        for node in nodes:
-            if node['type'] == 'object':
-                subnode = dict()
-                root[node['key']] = subnode
-                self.convertToDict(subnode, node['value'])
-            elif node['type'] == 'text':
-                root[node['key']] = node['value']
-            elif node['type'] == 'array':
-                self.convertToArray(root,  node)
-
-    def convertToArray(self, root, node):
-        """convert to array
-        :param root: root config node
-        :type root: dict|list
-        :param nodes: node list
-        :type nodes: list
-        """
-        subnode = []
-        if isinstance(root, dict):
-            root[node['key']] = subnode
-        else:
-            root.append(subnode)
-        for item in node['value']:
-            if item['type'] == 'text':
-                subnode.append(item['value'])
-            elif item['type'] == 'object':
-                vnode = dict()
-                self.convertToDict(vnode, item['value'])
-                subnode.append(vnode)
-            elif item['type'] == 'array':
-                vnode = []
-                subnode.append(vnode)
-                self.convertToArray(vnode, item)
+    def parseConfigObject(self):
+        """Parse the config object, returns the dict"""
+        config = dict()
+
+        def parseKey(t):
+            config[t.value] = self.parseKey(t, lambda op: self.configHandlers)[1]
+        self.parseObject(parseKey)
+        return config
+
+    def parseConfigArray(self):
+        """Parse the config array, returns the list"""
+        return self.parseArray(self.configHandlers)
 
     def buildNomos(self):
-        """Build  test case rule from nomos dsl language"""
+        """Build  test case rule from nomos dsl language
+
+        Keeps the dsl text and the test sections, :meth:`updateNomos` rebuilds the changed sections.
+        """
         filepath = os.path.join(self.path, self.filename)
-        text = resource(filepath)
-        self.reader = NomosTokenizer(text)
+        #: the dsl text of the sections
+        self.text = resource(filepath)
         name = self.filename.split('.', 1)[0]
         className = self._className(name)
-        root = nodes.HttpTestCalssNode(className, filepath)
-        methods = root.methods
+        #: the test case node
+        self.root = nodes.HttpTestCalssNode(className, filepath)
+        #: the test sections in text order
+        self.sections = self.parseSections(0)[0]
+        self.updateRoot()
+        return self.root
+
+    def updateNomos(self):
+        """Rebuild the test case node after the dsl file changed
+
+        Parses from the section the change starts in until the start of a section
+        after the change, the sections out of the range are kept, and a rebuilt
+        section with the same fingerprint keeps its method node.
+
+        :returns: the test case node and the rebuilt method nodes
+        :rtype: tuple
+        """
+        text = resource(self.root.filePath)
+        old = self.text
+        if text == old:
+            return self.root, []
+
+        # the changed range of the old text
+        size = min(len(old), len(text))
+        prefix = _matchLength(old, text, size)
+        suffix = _matchLength(old[::-1], text[::-1], size - prefix)
+        changeEnd = len(old) - suffix
+        delta = len(text) - len(old)
+
+        # the token before the change may run into it, so starts at the section before the change index
+        sections = self.sections
+        first = 0
+        for i, section in enumerate(sections):
+            if section.start < prefix:
+                first = i
+        start = sections[first].start if sections else 0
+        stops = dict((section.start + delta, i) for i, section in enumerate(sections)
+                     if i > first and section.start >= changeEnd)
+
+        self.text = text
+        try:
+            rebuilt, stop = self.parseSections(start, stops)
+        except Exception:
+            self.text = old
+            raise
+
+        last = stops[stop] if stop is not None else len(sections)
+        kept = sections[last:]
+        # the kept sections start with a method section
+        lineDelta = self.lineOf(stop) - kept[0].method.lineno if kept else 0
+        for section in kept:
+            section.start += delta
+            section.end += delta
+            self.shiftMethodLines(section.method, lineDelta)
+
+        methods = dict((section.fingerprint, section.method) for section in sections[first:last] if section.method)
+        changed = []
+        for section in rebuilt:
+            if section.method is None:
+                continue
+            if section.fingerprint in methods:
+                method = methods.pop(section.fingerprint)
+                self.shiftMethodLines(method, section.method.lineno - method.lineno)
+                section.method = method
+            else:
+                changed.append(section.method)
+
+        self.sections = sections[:first] + rebuilt + kept
+        self.updateRoot()
+        return self.root, changed
+
+    def updateRoot(self):
+        """Collect the methods and imports of the sections into the test case node"""
+        self.root.methods = [section.method for section in self.sections if section.method]
+        self.root.imports = [line for section in self.sections for line in section.imports]
+
+    def parseSections(self, start, stops=()):
+        """Parse the test sections from the start index
+
+        :param start: the text index to start, the begin of the text or a section
+        :type start: int
+        :param stops: the section start indexes to stop at
+        :type stops: dict
+        :returns: the parsed sections and the stopped section start, None at the end of the text
+        :rtype: tuple
+        """
+        self.reader = self.tokenizerClass(self.text, start=start)
+        section = DslSection(start)
+        sections = [section]
+        stop = None
 
         try:
-            node = None
-            paramsNode = []
-            currentMethod = None
+            lineParams = {}
             self.pushDiagnostics("{")
             while not self.reader.eof:
                 t = self.reader.pullNext()
                 if t.tokenType == TokenType.MethodNameStart:
-                    if currentMethod:
-                        self.buildMethod(currentMethod, node, paramsNode)
-                    node = []
-                    paramsNode = []
-                    currentMethod = nodes.ActionMethodNode()
-                    methods.append(currentMethod)
-                    name = self.reader.pullUtilMatch(']')
-                    currentMethod.name = name
+                    # the method name start index is after the `[`
+                    index = t.sourceIndex - 1
+                    if index in stops:
+                        stop = index
+                        break
+                    self.closeSection(section, lineParams, index)
+                    lineParams = {}
+                    section = DslSection(index, nodes.ActionMethodNode())
+                    section.method.lineno = self.lineOf(index)
+                    sections.append(section)
+                    section.method.name = self.reader.pullUtilMatch(']')
                 if t.tokenType == TokenType.HttpMethodStart:
                     (httpMethod, httpPath) = self.reader.pullHttpMethodAndPath()
-                    currentMethod.httpMethod = httpMethod.value
-                    currentMethod.httpPath = httpPath.value
-                    text = self.reader.pullRestOfLine()
-                    _reader = self.reader
-                    self.reader = NomosTokenizer(text)
-                    self.parseObject(paramsNode)
-                    self.reader = _reader
+                    section.method.httpMethod = httpMethod.value
+                    section.method.httpPath = httpPath.value
+                    section.method.requestLineno = self.lineOf(t.sourceIndex)
+                    # parse the params in the rest of the line
+                    self.reader.pushEnd(self.reader.lineEnd())
+                    try:
+                        lineParams.update(self.parseKeyValues())
+                    finally:
+                        self.reader.popEnd()
+                    self.reader.pullRestOfLine()
 
                 if t.tokenType == TokenType.ImportStart:
                     imports = self.reader.pullUtilMatch("%>")
                     for line in imports.split("\n"):
                         line = line.strip()
                         if self.IMPOER_REGEX.match(line) or self.FROM_IMPOER_REGEX.match(line):
-                            root.imports.append(line)
+                            section.imports.append(line)
 
                 if t.tokenType == TokenType.Key:
-                    key = t.value
-                    subnode = {
-                        "key": key,
-                        "keyQuoted": t.isQuoted
-                    }
-                    node.append(subnode)
-                    self.parseKeyContent(subnode)
-
-                elif t.tokenType == TokenType.ArrayStart:
-                    if 'op' not in node:
-                        node['op'] = ':'
-                    node['type'] = "array"
-                    node['value'] = self.parseArray()
+                    if section.method is None:
+                        raise ParserException(str.format(
+                            "Expected a test section before the key `{0}` {1}",
+                            t.value, self.reader.getHelpTextAtIndex(t.sourceIndex)))
+                    self.parseMethodKey(section.method, t)
 
                 elif t.tokenType == TokenType.ObjectEnd:
                     break
+
+            self.closeSection(section, lineParams, len(self.text) if stop is None else stop)
         finally:
-            self.buildMethod(currentMethod, node, paramsNode)
             self.popDiagnostics()
-        return root
+        # drops the empty text before the first section
+        return [_ for _ in sections if _.method or _.end > _.start], stop
+
+    def lineOf(self, index):
+        """Returns the line number of the text index"""
+        return self.reader.lineColumn(index)[0]
+
+    def shiftMethodLines(self, method, delta):
+        """Shift the line numbers of the method node"""
+        if delta:
+            method.lineno += delta
+            if method.requestLineno is not None:
+                method.requestLineno += delta
+            for key in method.contextLinenos:
+                method.contextLinenos[key] += delta
+            self.shiftLines(method.testAsserts, delta)
+
+    def shiftLines(self, nodeList, delta):
+        """Shift the line numbers of the nodes and their json assert nodes"""
+        for node in nodeList:
+            if node.lineno is not None:
+                node.lineno += delta
+            if isinstance(node, nodes.JsonAssertNode) and isinstance(node.value, list):
+                self.shiftLines([_ for _ in node.value if isinstance(_, nodes.JsonAssertNode)], delta)
+
+    def closeSection(self, section, lineParams, end):
+        """Build the section method and fingerprint the section text"""
+        if section.method:
+            self.buildMethod(section.method, lineParams)
+        section.end = end
+        section.fingerprint = hashlib.sha1(self.text[section.start:end].encode("utf-8")).hexdigest()
+
+    def buildMethod(self, currentMethod, lineParams):
+        """Build method, puts the request line params before the section params"""
+        if lineParams:
+            lineParams.update(currentMethod.params)
+            currentMethod.params = lineParams
+
+    def parseMethodKey(self, currentMethod, t):
+        """Parse the test section key content into the method node"""
+        name = t.value
+        try:
+            self.pushDiagnostics(str.format("{0} = ", name))
+            op, objectStarted = self.pullOperation()
+            if op is None:
+                return
+            isAssign = op in (':', '=')
 
-    def buildMethod(self, currentMethod, node, paramsNode):
-        """Build method dsl tree"""
-        self.appendKeyValue(currentMethod.params, paramsNode)
-        for subnode in node:
-            name = subnode.get("key")
-            op = subnode.get("op")
-            if name == 'params' and op in [':', '=']:
-                self.appendKeyValue(currentMethod.params, subnode['value'])
+            if name == 'params' and isAssign:
+                currentMethod.params.update(self.parseContent(objectStarted, onObject=self.parseKeyValues))
 
-            elif name == 'data' and op in [':', '=']:
-                self.appendKeyValue(currentMethod.data, subnode['value'])
+            elif name == 'data' and isAssign:
+                currentMethod.data.update(self.parseContent(objectStarted, onObject=self.parseKeyValues))
 
             elif name == 'head' and op == '<<':
-                self.appendKeyValue(currentMethod.headers, subnode['value'])
+                currentMethod.headers.update(self.parseContent(objectStarted, onObject=self.parseKeyValues))
 
-            elif name == 'head' and op in [":", "="]:
-                self.apendAssertNode(currentMethod.testAsserts, subnode['value'])
+            elif name == 'head' and isAssign:
+                currentMethod.testAsserts.extend(self.parseContent(objectStarted, onObject=self.parseHeadAsserts))
 
             elif name == 'json' and op == '<<':
-                vnode = nodes.ValueNode(None, None)
-                self.buildJsonNode(vnode, subnode['value'])
-                currentMethod.json = vnode
+                currentMethod.json = self.parseContent(objectStarted, *self.jsonHandlers)
 
-            elif name == 'files' and op in [':', '=']:
-                vnode = nodes.ValueNode(None, None)
-                self.buildJsonNode(vnode, subnode['value'])
-                currentMethod.files = vnode
+            elif name == 'files' and isAssign:
+                currentMethod.files = self.parseContent(objectStarted, *self.jsonHandlers)
 
             elif name in ['content', 'charset', 'code', 'content_type']:
-                self.apendAssertNode(currentMethod.testAsserts, subnode)
+                key = self.convertToValueNode(name, t.isQuoted)
+                value = self.parseContent(objectStarted, *self.textHandlers)
+                node = nodes.AssertNode(key, "head", value, op)
+                node.lineno = self.lineOf(t.sourceIndex)
+                currentMethod.testAsserts.append(node)
 
-            elif name == 'json' and op in [':', '=']:
-                self.apendJsonAssertNode(currentMethod.testAsserts, subnode['value'])
+            elif name == 'json' and isAssign:
+                currentMethod.testAsserts.extend(self.parseContent(objectStarted, onObject=self.parseJsonAsserts))
 
-            elif op in [':', '='] and subnode['type'] == 'text':
-                self.tryApendContext(currentMethod.context, subnode)
+            elif name == 'depends' and isAssign:
+                value = self.parseContent(objectStarted, *self.jsonHandlers)
+                values = value.value if value.valueType == nodes.ValueType.ARRAY else [value]
+                currentMethod.depends.extend(str(_.value) for _ in values)
 
-    def tryApendContext(self, context, item):
-        """Append context to method context"""
-        key = self.convertToValueNode(item['key'], item['keyQuoted'])
-        value = self.convertToValueNode(item['value'], item['valueQuoted'], True)
+            else:
+                value = self.parseContent(objectStarted, *self.skipHandlers)
+                if isAssign and value is not None:
+                    self.tryApendContext(currentMethod.context, t, value, currentMethod.contextLinenos)
+        finally:
+            self.popDiagnostics()
+
+    def tryApendContext(self, context, t, value, linenos=None):
+        """Append context to method context, the line numbers of the keys are set to the linenos"""
+        key = self.convertToValueNode(t.value, t.isQuoted)
         if key.valueType == nodes.ValueType.VAR:
             context[key.value] = value
+            if linenos is not None:
+                linenos[key.value] = self.lineOf(t.sourceIndex)
 
-    def appendKeyValue(self, settings, nodeList):
-        """Append key and value to config"""
-        for item in nodeList:
-            if item['op'] in [':', '=']:
-                key = self.convertToValueNode(item['key'], item['keyQuoted'])
-                value = self.convertToValueNode(item['value'], item['valueQuoted'], True)
-                settings[key] = value
-            else:
-                # TODO
-                pass
+    def parseKeyValues(self):
+        """Parse the key and value object, returns the value node dict"""
+        settings = {}
+
+        def parseKey(t):
+            op, value = self.parseKey(t, self.keyValueHandlers)
+            if op in (':', '='):
+                settings[self.convertToValueNode(t.value, t.isQuoted)] = value
+        self.parseObject(parseKey)
+        return settings
+
+    def keyValueHandlers(self, op):
+        """The key value handlers, only the assign value is kept"""
+        return self.textHandlers if op in (':', '=') else self.skipHandlers
+
+    def textValueNode(self, t):
+        """Creates the value node from the literal value token"""
+        return self.convertToValueNode(t.value, t.isQuoted, True)
+
+    def literalValue(self, t):
+        """Returns the literal value of the token"""
+        return t.value
 
     def convertToValueNode(self, value, quoted, isValue=False):
         """Convet to  value node
@@ -301,147 +459,147 @@ class DslParser(object):
 
         return nodes.ValueNode(value, nodes.ValueType.TEXT)
 
-    def apendAssertNode(self, asserts, nodeList):
-        """Append assert node to method assert list"""
-
-        if not isinstance(nodeList, list):
-            nodeList = [nodeList]
-
-        for item in nodeList:
-            key = self.convertToValueNode(item['key'], item['keyQuoted'])
-            value = self.convertToValueNode(item['value'], item['valueQuoted'], True)
-            asserts.append(nodes.AssertNode(key, "head", value, item['op']))
-
-    def apendJsonAssertNode(self, asserts, nodeList):
-        """Append json assert node to method assert list"""
-
-        for item in nodeList:
-            valueType = item.get('type', 'unknow')
-            if 'key' not in item:
-                if valueType == 'object':
-                    self.apendJsonAssertNode(asserts, item['value'])
-                else:
-                    node = self.convertToValueNode(item['value'], item['valueQuoted'], True)
-                    asserts.append(node)
+    def parseHeadAsserts(self):
+        """Parse the head assert object, returns the assert node list"""
+        asserts = []
+
+        def parseKey(t):
+            op, value = self.parseKey(t, lambda op: self.textHandlers)
+            key = self.convertToValueNode(t.value, t.isQuoted)
+            node = nodes.AssertNode(key, "head", value, op)
+            node.lineno = self.lineOf(t.sourceIndex)
+            asserts.append(node)
+        self.parseObject(parseKey)
+        return asserts
+
+    def parseJsonAsserts(self):
+        """Parse the json assert object, returns the json assert node list"""
+        asserts = []
+
+        def parseKey(t):
+            key = self.convertToValueNode(t.value, t.isQuoted)
+            node = nodes.JsonAssertNode(key, 'json', None, ':')
+            node.lineno = self.lineOf(t.sourceIndex)
+
+            def parseArray():
+                node.nodeType = 'array'
+                return self.parseJsonAssertArray()
+
+            def parseObject():
+                node.nodeType = 'json'
+                return self.parseJsonAsserts()
+
+            def handlers(op):
+                if op in (':', '=', '=='):
+                    return self.textValueNode, parseObject, parseArray
+                return self.textValueNode, parseObject, self.skipArray
+
+            node.operation, node.value = self.parseKey(t, handlers)
+            asserts.append(node)
+        self.parseObject(parseKey)
+        return asserts
+
+    def parseJsonAssertArray(self):
+        """Parse the json assert array, the object item asserts are flattened into the list"""
+        asserts = []
+        for item in self.parseArray((self.textValueNode, self.parseJsonAsserts, None)):
+            if isinstance(item, list):
+                asserts.extend(item)
             else:
-                key = self.convertToValueNode(item['key'], item['keyQuoted'])
-                node = nodes.JsonAssertNode(key, 'json', None, item.get('op', ':'))
-
-                if valueType == 'text':
-                    node.value = self.convertToValueNode(item['value'], item['valueQuoted'], True)
+                asserts.append(item)
+        return asserts
 
-                if valueType == 'object':
-                    node.value = []
-                    self.apendJsonAssertNode(node.value, item['value'])
+    def parseJsonObject(self):
+        """Parse the json object, returns the object value node"""
+        value = dict()
 
-                if valueType == 'array' and item['op'] in [':', '=', '==']:
-                    node.nodeType = 'array'
-                    node.value = []
-                    self.apendJsonAssertNode(node.value, item['value'])
-
-                asserts.append(node)
-
-    def buildJsonNode(self, vnode, node, isValue=False):
-        """build json node
-
-        :param vnode: the value node
-        :type vnode: JsonAssertNode
-        :param node: the dls parse dict node
-        :type node: dict
-        :param isValue: If True is a value node, defaults to False
-        :type isValue: bool, optional
-        """
-
-        if isValue:
-            n = self.createValueNodeFromJson(node)
-            vnode.valueType = n.valueType
-            vnode.value = n.value
-            return
-
-        if isinstance(node, dict):
-            if 'key' not in node and node['type'] == 'text':
-                value = self.convertToValueNode(node['value'], node['valueQuoted'], True)
-                vnode.valueType = value.valueType
-                vnode.value = value.value
-                return
-            node = [node]
+        def parseKey(t):
+            value[t.value] = self.parseKey(t, lambda op: self.jsonHandlers)[1]
+        self.parseObject(parseKey)
+        return nodes.ValueNode(value, nodes.ValueType.OBJ)
 
-        for n in node:
-            # check whether is a array  node
-            isArrayItem = not isValue and ('key' not in n)
+    def parseJsonArray(self):
+        """Parse the json array, returns the array value node"""
+        return nodes.ValueNode(self.parseArray(self.jsonHandlers), nodes.ValueType.ARRAY)
 
-            if isArrayItem and vnode.valueType is None:
-                vnode.valueType = nodes.ValueType.ARRAY
-                vnode.value = []
+    def skipObject(self):
+        """Parse and drop the object"""
+        self.parseObject(lambda t: self.parseKey(t, lambda op: self.skipHandlers))
 
-            if not isArrayItem and vnode.valueType is None:
-                vnode.valueType = nodes.ValueType.OBJ
-                vnode.value = dict()
+    def skipArray(self):
+        """Parse and drop the array"""
+        self.parseArray(self.skipHandlers)
 
-            if isArrayItem:
-                vnode.value.append(self.createValueNodeFromJson(n))
-            else:
-                vnode.value[n['key']] = self.createValueNodeFromJson(n)
-
-    def createValueNodeFromJson(self, node):
-        """Creates value node from json format data"""
-        if node['type'] == 'text':
-            return self.convertToValueNode(node['value'], node['valueQuoted'], True)
-        if node['type'] == 'object':
-            subnode = nodes.ValueNode({}, nodes.ValueType.OBJ)
-            self.buildJsonNode(subnode, node['value'])
-            return subnode
-        if node['type'] == 'array':
-            subnode = nodes.ValueNode([], nodes.ValueType.ARRAY)
-            for subValue in node['value']:
-                it = nodes.ValueNode(None, None)
-                subnode.value.append(it)
-                self.buildJsonNode(it, subValue, True)
-            return subnode
-
-    def parseObject(self, node):
-        """parse object"""
+    def parseObject(self, parseKey):
+        """parse object, calls ``parseKey`` with every key token"""
         try:
             self.pushDiagnostics("{")
             while not self.reader.eof:
                 t = self.reader.pullNext()
                 if t.tokenType == TokenType.Key:
-                    key = t.value
-                    subnode = {
-                        "key": key,
-                        "keyQuoted": t.isQuoted
-                    }
-                    node.append(subnode)
-                    self.parseKeyContent(subnode)
+                    parseKey(t)
 
                 elif t.tokenType == TokenType.ObjectEnd:
                     return
         finally:
             self.popDiagnostics()
 
-    def parseKeyContent(self, node):
-        """Parse the token key content"""
-        try:
-            self.pushDiagnostics(str.format("{0} = ", node.get("key", ".")))
-            while not self.reader.eof:
-                t = self.reader.pullNext()
-
-                if t.tokenType == TokenType.Operation:
-                    node['op'] = t.value
-                    self.parseValue(node)
-                    return
+    def parseKey(self, t, handlers):
+        """Parse the token key content
 
-                elif t.tokenType == TokenType.ObjectStart:
-                    node['value'] = []
-                    node['op'] = ":"
-                    node['type'] = "object"
-                    self.parseObject(node["value"])
-                    return
+        :param t: the key token
+        :type t: KeyToken
+        :param handlers: returns the value handlers of the operation
+        :type handlers: function
+        :returns: the operation and the value
+        :rtype: tuple
+        """
+        try:
+            self.pushDiagnostics(str.format("{0} = ", t.value))
+            op, objectStarted = self.pullOperation()
+            if op is None:
+                raise ParserException(
+                    "End of file reached while trying to read a value")
+            return op, self.parseContent(objectStarted, *handlers(op))
         finally:
             self.popDiagnostics()
 
-    def parseValue(self, node):
-        """Parse the value of token"""
+    def pullOperation(self):
+        """Pull the key operation
+
+        :returns: the operation and True if the object starts right after the key,
+                  the operation is None at the end of file.
+        :rtype: tuple
+        """
+        while not self.reader.eof:
+            t = self.reader.pullNext()
+            if t.tokenType == TokenType.Operation:
+                return t.value, False
+
+            elif t.tokenType == TokenType.ObjectStart:
+                return ":", True
+        return None, False
+
+    def parseContent(self, objectStarted, onText=None, onObject=None, onArray=None):
+        """Parse the key content after the operation, returns the value"""
+        if objectStarted:
+            if onObject is None:
+                self.unexpectedValue("object")
+            return onObject()
+        return self.parseValue(onText, onObject, onArray)
+
+    def unexpectedValue(self, valueType):
+        """Raises the value type is not expected here"""
+        raise ParserException(str.format(
+            "Unexpected {0} value {1}", valueType, self.getDiagnosticsStacktrace()))
+
+    def parseValue(self, onText=None, onObject=None, onArray=None):
+        """Parse the value of token, returns the value built by the handler of the value type
+
+        :param onText: builds the value from the literal value token
+        :param onObject: parses the object, the object start is pulled
+        :param onArray: parses the array, the array start is pulled
+        """
 
         if self.reader.eof:
             raise ParserException(
@@ -449,6 +607,7 @@ class DslParser(object):
 
         self.reader.pullWhitespaceAndComments()
         start = self.reader.index
+        value = None
 
         try:
             while self.reader.isValue():
@@ -457,22 +616,19 @@ class DslParser(object):
                     pass
 
                 elif t.tokenType == TokenType.LiteralValue:
-                    node['valueQuoted'] = t.isQuoted
-                    node['type'] = 'text'
-                    node['value'] = t.value
+                    if onText is None:
+                        self.unexpectedValue("text")
+                    value = onText(t)
 
                 elif t.tokenType == TokenType.ObjectStart:
-                    if 'op' not in node:
-                        node['op'] = ':'
-                    node['type'] = 'object'
-                    node['value'] = []
-                    self.parseObject(node['value'])
+                    if onObject is None:
+                        self.unexpectedValue("object")
+                    value = onObject()
 
                 elif t.tokenType == TokenType.ArrayStart:
-                    if 'op' not in node:
-                        node['op'] = ':'
-                    node['type'] = 'array'
-                    node['value'] = self.parseArray()
+                    if onArray is None:
+                        self.unexpectedValue("array")
+                    value = onArray()
 
             self.ignoreComma()
 
@@ -486,16 +642,15 @@ class DslParser(object):
                 raise ParserException(
                     str.format("Hocon syntax error: {0}\r{1}",
                                self.reader.getHelpTextAtIndex(start), self.getDiagnosticsStacktrace()))
+        return value
 
-    def parseArray(self):
-        """Parse array path"""
+    def parseArray(self, handlers):
+        """Parse array path, returns the item values built by the handlers"""
         try:
             self.pushDiagnostics("|")
             arr = []
             while (not self.reader.eof) and (not self.reader.isArrayEnd()):
-                v = {}
-                self.parseValue(v)
-                arr.append(v)
+                arr.append(self.parseValue(*handlers))
                 self.reader.pullWhitespaceAndComments()
             self.reader.pullArrayEnd()
             return arr
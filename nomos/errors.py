@@ -28,3 +28,8 @@ class ParserException(NomosError):
 class TokenizerException(NomosError):
     """Tokenizer error exception"""
     pass
+
+
+class CassetteError(NomosError):
+    """The cassette has no response of the request"""
+    pass
@@ -14,11 +14,27 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
-import requests.sessions
+import codecs
+import itertools
+import threading
 
+from requests.adapters import HTTPAdapter
+from requests.compat import chardet, urlparse
+import urllib3
+
+from .cassette import RecordingTransport, ReplayTransport
+from .errors import NomosError
+from .transport import TRANSPORTS, managerOptions
 from .util import lazy_attr
 
 
+#: the responses up to the content length are read at once in the stream mode, their connections are reused
+STREAM_THRESHOLD = 1 << 20
+
+#: the bytes of a chunk of the streamed content
+CHUNK_SIZE = 1 << 16
+
+
 class HttpSession(object):
     """Http Session
 
@@ -32,14 +48,36 @@ class HttpSession(object):
                     to a CA bundle to use. Defaults to ``True``.
     :param cert: (optional) if String, path to ssl client cert file (.pem).
                     If Tuple, ('cert', 'key') pair.
+    :param pool: (optional) the shared connection pools, the session keeps its own cookies.
+    :type pool: HttpPool
+    :param backend: (optional) the transport sending the requests, ``"requests"`` or ``"urllib3"``,
+                    see :mod:`nomos.transport`. Defaults to ``"requests"``.
+    :param cassette: (optional) the cassette recording the responses of the transport or
+                     replaying them without the network, see :mod:`nomos.cassette`.
+    :type cassette: Cassette
+    :param stream: (optional) If ``True``, the content longer than :data:`STREAM_THRESHOLD` is read
+                   by the content asserts of the test section, see :mod:`nomos.stream`.
     """
 
-    def __init__(self, url, timeout=5, verify=True, cert=None):
+    def __init__(self, url, timeout=5, verify=True, cert=None, pool=None, backend="requests", cassette=None,
+                 stream=False):
         self.url = url
         self.timeout = timeout
+        self.stream = stream
+        #: the last streamed response, its unread content is dropped by the next request
+        self.streamed = None
 
-        #: request session instance
-        self.session = requests.sessions.Session()
+        if cassette is not None and cassette.mode == "replay":
+            #: the transport sending the requests
+            self.transport = ReplayTransport(cassette)
+        else:
+            if pool is None and backend != "requests":
+                pool = HttpPool()
+            self.transport = TRANSPORTS[backend](url, pool)
+            if cassette is not None:
+                self.transport = RecordingTransport(self.transport, cassette)
+        #: request session instance of the ``requests`` transport
+        self.session = getattr(self.transport, "session", None)
         self.cert = cert
         self.verify = verify
 
@@ -62,16 +100,134 @@ class HttpSession(object):
             :rtype: requests.Response"""
 
         url = self.url + path
-        res = self.session.request(method, url, params=params, data=data, headers=headers, json=json, files=files,
-                                   verify=self.verify, cert=self.cert, timeout=self.timeout)
-        return HttpResponse(res)
+        if not self.stream:
+            res = self.transport.request(method, url, params, data, headers, json, files,
+                                         self.verify, self.cert, self.timeout)
+            return HttpResponse(res)
+
+        if self.streamed is not None:
+            self.streamed.close()
+            self.streamed = None
+        res = self.transport.request(method, url, params, data, headers, json, files,
+                                     self.verify, self.cert, self.timeout, stream=True)
+        length = res.headers.get('content-length')
+        if length and length.isdigit() and int(length) <= STREAM_THRESHOLD:
+            # the short content is read, its connection is released
+            res.content
+            return HttpResponse(res)
+        self.streamed = res
+        return HttpResponse(res, stream=True)
+
+
+class HttpPool(object):
+    """The http connection pools shared by the sessions, an adapter or a ``urllib3`` pool manager
+    of the transport by the base url
+
+    The keep-alive connections and their TLS sessions are reused by the
+    sessions of all the test files of a run.
+
+    :param connections: (optional) the number of the host connection pools to cache
+    :type connections: int
+    :param maxsize: (optional) the maximum number of the connections to keep in a host pool
+    :type maxsize: int
+    :param block: (optional) If ``True``, a request waits for a free connection of a full
+                  host pool instead of opening a connection it does not keep
+    :type block: boolean
+    """
+
+    def __init__(self, connections=10, maxsize=10, block=False):
+        self.connections = connections
+        self.maxsize = maxsize
+        self.block = block
+        #: the adapters by the base url and the pool managers by the base url and the tls options
+        self.adapters = {}
+        self.managers = {}
+        self.lock = threading.Lock()
+        #: the counts of the closed connection pools
+        self.closedCounts = (0, 0)
+
+    def adapter(self, url):
+        """Returns the adapter of the base url of the url"""
+        key = baseUrl(url)
+        with self.lock:
+            adapter = self.adapters.get(key)
+            if adapter is None:
+                adapter = self.adapters[key] = HTTPAdapter(pool_connections=self.connections,
+                                                           pool_maxsize=self.maxsize, pool_block=self.block)
+        return adapter
+
+    def mount(self, session, url):
+        """Mounts the adapter of the base url to the ``requests`` session"""
+        session.mount(baseUrl(url), self.adapter(url))
+
+    def manager(self, url, verify, cert):
+        """Returns the ``urllib3`` pool manager of the base url of the url and the tls options"""
+        key = (baseUrl(url), verify, cert)
+        manager = self.managers.get(key)
+        if manager is None:
+            with self.lock:
+                manager = self.managers.get(key)
+                if manager is None:
+                    manager = self.managers[key] = urllib3.PoolManager(
+                        self.connections, maxsize=self.maxsize, block=self.block, **managerOptions(verify, cert))
+        return manager
+
+    def hostPools(self):
+        """Returns the urllib3 connection pools of the hosts"""
+        pools = []
+        managers = [_.poolmanager for _ in list(self.adapters.values())] + list(self.managers.values())
+        for manager in managers:
+            for key in manager.pools.keys():
+                pool = manager.pools.get(key)
+                if pool is not None:
+                    pools.append(pool)
+        return pools
+
+    def counts(self):
+        """Returns the number of the connections opened and the requests sent on the connections opened before"""
+        pools = self.hostPools()
+        opened = sum(_.num_connections for _ in pools)
+        reused = sum(max(_.num_requests - _.num_connections, 0) for _ in pools)
+        return self.closedCounts[0] + opened, self.closedCounts[1] + reused
+
+    @property
+    def opened(self):
+        return self.counts()[0]
+
+    @property
+    def reused(self):
+        return self.counts()[1]
+
+    def close(self):
+        """Closes the connections, the counts are kept"""
+        self.closedCounts = self.counts()
+        with self.lock:
+            adapters, self.adapters = self.adapters, {}
+            managers, self.managers = self.managers, {}
+        for adapter in adapters.values():
+            adapter.close()
+        for manager in managers.values():
+            manager.clear()
+
+
+def baseUrl(url):
+    """Returns the scheme and the host of the url"""
+    parts = urlparse(url)
+    return "%s://%s" % (parts.scheme, parts.netloc)
 
 
 class HttpResponse(object):
-    """Http response wrapper"""
+    """Http response wrapper
 
-    def __init__(self, res):
+    :param stream: (optional) If ``True``, the content is not read yet, it is read once by the chunks
+                   of :meth:`iterContent` or at once by :attr:`content`.
+    """
+
+    def __init__(self, res, stream=False):
         self.res = res
+        self.stream = stream
+        #: the streamed content is read by the chunks and not kept
+        self.consumed = False
 
     @lazy_attr
     def json(self):
@@ -87,8 +243,43 @@ class HttpResponse(object):
     @property
     def content(self):
         """get response content"""
+        if self.consumed:
+            raise NomosError("The streamed content of the response is read by the content asserts")
         return self.res.text
 
+    def iterContent(self, chunkSize=CHUNK_SIZE):
+        """Yields the decoded text chunks of the streamed content, the whole content if it is read
+
+        The content is decoded by the encoding of the headers like :attr:`content`, the encoding
+        guessed by ``requests`` from the whole content is guessed from the first chunk.
+        """
+        if not self.stream:
+            yield self.content
+            return
+        if self.consumed:
+            raise NomosError("The streamed content of the response is read by the content asserts")
+        self.consumed = True
+        chunks = self.res.iter_content(chunkSize)
+        try:
+            encoding = self.res.encoding
+            if not encoding:
+                first = next(chunks, b'')
+                chunks = itertools.chain([first], chunks)
+                encoding = chardet.detect(first)['encoding'] if chardet is not None else 'utf-8'
+            try:
+                decoder = codecs.getincrementaldecoder(encoding or 'utf-8')('replace')
+            except LookupError:
+                decoder = codecs.getincrementaldecoder('utf-8')('replace')
+            for chunk in chunks:
+                text = decoder.decode(chunk)
+                if text:
+                    yield text
+            text = decoder.decode(b'', True)
+            if text:
+                yield text
+        finally:
+            self.res.close()
+
     @lazy_attr
     def contentType(self):
         """Get Content type"""
@@ -0,0 +1,501 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""The stub http server of the test files
+
+The routes are the (method, path) requests of the test sections, the
+response of a route satisfies the asserts of its sections: the status,
+the content type, the charset, the headers, the content and the json
+values. The variables of the asserts are the constant values of the
+``initialize`` and the other sections, the expressions can not be
+satisfied. A value is generated from the candidate values of its asserts,
+the equal values, a text of the regex, the lists of the contained values
+and the neighbours of the compared values, the first one passing all its
+asserts is served, the asserts nothing passes are the route warnings.
+
+The asyncio server serves the precomputed response bytes of the routes on
+the keep-alive connections, the query of a request is not matched.
+
+python 3 only.
+"""
+
+import asyncio
+from collections import OrderedDict
+from http.client import responses
+import json
+import re
+import sys
+import threading
+
+from . import nodes
+from .dsl import DslParser
+from .testcase import WebTestCase
+
+try:
+    # python 3.11+
+    import re._parser as sre_parse
+except ImportError:
+    import sre_parse
+
+
+#: the equal assert operations
+EQUAL = (':', '=', '==')
+
+#: the value of the variables and the expressions not known before the run
+MISSING = object()
+
+#: the samples of the regex character categories
+CATEGORIES = {
+    "CATEGORY_DIGIT": "0",
+    "CATEGORY_NOT_DIGIT": "a",
+    "CATEGORY_WORD": "a",
+    "CATEGORY_NOT_WORD": " ",
+    "CATEGORY_SPACE": " ",
+    "CATEGORY_NOT_SPACE": "a",
+}
+
+
+class Rules(object):
+    """The asserts of a value, a json object has the rules of its fields and a json array of its items"""
+
+    def __init__(self):
+        #: the (operation, expected value) asserts of the value and of its length
+        self.rules = []
+        self.sizeRules = []
+        self.fields = OrderedDict()
+        self.items = {}
+        self.array = False
+
+    def field(self, key):
+        rules = self.fields.get(key)
+        if rules is None:
+            rules = self.fields[key] = Rules()
+        return rules
+
+    def item(self, index):
+        self.array = True
+        rules = self.items.get(index)
+        if rules is None:
+            rules = self.items[index] = Rules()
+        return rules
+
+    def jsonValue(self, warnings, path="json"):
+        """Returns the json value passing the asserts"""
+        if self.fields:
+            return OrderedDict((key, rules.jsonValue(warnings, "%s.%s" % (path, key)))
+                               for key, rules in self.fields.items())
+        if self.array or self.sizeRules:
+            length = max(self.items) + 1 if self.items else 0
+            if self.sizeRules:
+                sized = Rules()
+                sized.rules = self.sizeRules
+                length = int(sized.value(warnings, "len(%s)" % path, max(length, 1)))
+            return [self.items[i].jsonValue(warnings, "%s[%d]" % (path, i)) if i in self.items else 0
+                    for i in range(length)]
+        return self.value(warnings, path)
+
+    def value(self, warnings, path, default=None, text=False):
+        """Returns the first candidate value passing the asserts, the default is a candidate
+
+        :param text: If ``True``, the value is a text
+        """
+        candidates = [_ for _ in self.candidates(default) if not text or _ is None or isinstance(_, str)]
+        for candidate in candidates:
+            if all(check(candidate, operation, expected) for operation, expected in self.rules):
+                return candidate
+        warnings.append("%s %s" % (path, " and ".join("%s %r" % _ for _ in self.rules)))
+        return candidates[0] if candidates else default
+
+    def candidates(self, default):
+        rules = self.rules
+        for operation, expected in rules:
+            if operation in EQUAL:
+                yield expected
+        for operation, expected in rules:
+            if operation == '=~':
+                yield sampleRegex(regex(expected))
+        contains = [expected for operation, expected in rules if operation == '<-']
+        lengths = [expected for operation, expected in rules if operation == '~~' and isinstance(expected, int)]
+        if contains or lengths:
+            length = max(lengths[0] if lengths else 0, len(contains))
+            if all(isinstance(_, str) for _ in contains):
+                yield "".join(contains).ljust(lengths[0] if lengths else 0, "x")
+            yield contains + [0] * (length - len(contains))
+        yield default
+        for operation, expected in rules:
+            if isinstance(expected, bool) or expected is None:
+                yield not expected
+            elif isinstance(expected, (int, float)):
+                for delta in (1, -1, 0.5, -0.5, 0):
+                    yield expected + delta
+            elif isinstance(expected, str):
+                yield expected + "~"
+                yield ""
+
+
+def check(value, operation, expected):
+    """Returns ``True`` if the value passes the assert like :meth:`WebTestCase.assertRule`"""
+    try:
+        if operation in EQUAL:
+            return value == expected
+        if operation == '<-':
+            return expected in value
+        if operation == '=~':
+            return bool(regex(expected).search(value))
+        if operation == '~~':
+            return len(value) == expected
+        if operation == '!=':
+            return value != expected
+        if operation == '>':
+            return value > expected
+        if operation == '>=':
+            return value >= expected
+        if operation == '<':
+            return value < expected
+        if operation == '<=':
+            return value <= expected
+    except Exception:
+        return False
+    return True
+
+
+def regex(value):
+    return value if hasattr(value, "search") else WebTestCase.complieRegex(value)
+
+
+def sampleRegex(pattern):
+    """Returns a text the regex searches, None if it is not sampled"""
+    groups = {}
+
+    def sample(parsed):
+        text = []
+        for op, av in parsed:
+            name = str(op)
+            if name == "LITERAL":
+                text.append(chr(av))
+            elif name == "NOT_LITERAL":
+                text.append("b" if chr(av) == "a" else "a")
+            elif name == "ANY":
+                text.append("a")
+            elif name == "IN":
+                text.append(sampleSet(av))
+            elif name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+                low, high, sub = av
+                text.append(sample(sub) * low)
+            elif name == "SUBPATTERN":
+                value = sample(av[-1])
+                groups[av[0]] = value
+                text.append(value)
+            elif name == "BRANCH":
+                text.append(sample(av[1][0]))
+            elif name == "GROUPREF":
+                text.append(groups.get(av, ""))
+            elif name == "CATEGORY":
+                text.append(CATEGORIES.get(str(av), "a"))
+        return "".join(text)
+
+    def sampleSet(items):
+        if items and str(items[0][0]) == "NEGATE":
+            excluded = set()
+            for op, av in items[1:]:
+                if str(op) == "LITERAL":
+                    excluded.add(chr(av))
+                elif str(op) == "RANGE":
+                    excluded.update(chr(_) for _ in range(av[0], av[1] + 1))
+            return next(_ for _ in "a0 _-b1" if _ not in excluded)
+        op, av = items[0]
+        if str(op) == "LITERAL":
+            return chr(av)
+        if str(op) == "RANGE":
+            return chr(av[0])
+        if str(op) == "CATEGORY":
+            return CATEGORIES.get(str(av), "a")
+        return "a"
+
+    try:
+        text = sample(sre_parse.parse(pattern.pattern, pattern.flags))
+    except Exception:
+        return None
+    return text if pattern.search(text) else None
+
+
+class Route(object):
+    """The asserts of the responses of a (method, path) request of the test sections"""
+
+    #: the assert keys of the response attributes, the other keys are the headers
+    SPECIAL = ("Status", "Code", "ContentType", "Charset", "Content")
+
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.status = Rules()
+        self.contentType = Rules()
+        self.charset = Rules()
+        self.content = Rules()
+        self.headers = OrderedDict()
+        #: the json rules of the json asserts
+        self.json = None
+        #: the asserts the response does not pass
+        self.warnings = []
+
+    def addAssert(self, node, variables):
+        """Adds the assert node of a test section"""
+        if isinstance(node, nodes.JsonAssertNode):
+            if self.json is None:
+                self.json = Rules()
+            self.addJson(self.json, node, variables)
+            return
+        expected = resolve(node.value, variables)
+        if expected is MISSING:
+            self.warnings.append("%s %s %s is not known before the run" % (node.key.value, node.operation,
+                                                                             node.value.value))
+            return
+        key = headerKey(node.key.value)
+        if key in ("Status", "Code"):
+            rules = self.status
+        elif key in ("ContentType", "Charset", "Content"):
+            rules = getattr(self, key[0].lower() + key[1:])
+        else:
+            rules = self.headers.setdefault(key, Rules())
+        rules.rules.append((node.operation, expected))
+
+    def addJson(self, parent, node, variables):
+        """Adds the json assert node of the ``parent`` object like :meth:`WebTestCase.assertJson`"""
+        key = node.key.value
+        rules = parent.field(key)
+        if isinstance(node.value, nodes.ValueNode):
+            expected = resolve(node.value, variables)
+            if expected is MISSING:
+                self.warnings.append("json %s %s %s is not known before the run" % (key, node.operation,
+                                                                                    node.value.value))
+            elif node.key.valueType == nodes.ValueType.CMP:
+                rules.sizeRules.append((node.operation, expected))
+            else:
+                rules.rules.append((node.operation, expected))
+        elif node.nodeType == 'array':
+            rules.array = True
+            index = 0
+            for subnode in node.value:
+                if isinstance(subnode, nodes.ValueNode):
+                    expected = resolve(subnode, variables)
+                    if expected is not MISSING:
+                        rules.item(index).rules.append((':', expected))
+                    index += 1
+                else:
+                    # the object items of the array are checked against the current item
+                    self.addJson(rules.item(index), subnode, variables)
+        elif node.value:
+            for subnode in node.value:
+                self.addJson(rules, subnode, variables)
+
+    def response(self):
+        """Returns the (status, headers, body bytes) of the response passing the asserts"""
+        warnings = self.warnings
+        status = self.status.value(warnings, "status", 200)
+        contentType = self.contentType.value(warnings, "content_type",
+                                             "application/json" if self.json is not None else "text/plain",
+                                             text=True)
+        charset = self.charset.value(warnings, "charset", "utf-8", text=True) or "utf-8"
+        if self.json is not None:
+            value = self.json.jsonValue(warnings)
+            content = json.dumps(value)
+            for operation, expected in self.content.rules:
+                if not check(content, operation, expected) and operation in ('=~', '<-'):
+                    # the text the content asserts search is a field of the json object
+                    value["content%d" % len(value)] = sampleRegex(regex(expected)) if operation == '=~' else expected
+                    content = json.dumps(value)
+                if not check(content, operation, expected):
+                    warnings.append("content %s %r of the json" % (operation, expected))
+        else:
+            content = self.content.value(warnings, "content", "", text=True) or ""
+        headers = [("Content-Type", "%s; charset=%s" % (contentType, charset) if contentType else None)]
+        for key, rules in self.headers.items():
+            headers.append((key, rules.value(warnings, key, None, text=True)))
+        return status, [_ for _ in headers if _[1] is not None], content.encode(charset)
+
+
+def headerKey(key):
+    """Returns the header name of the assert key like the compiler"""
+    return "".join(_.capitalize() for _ in re.split(r"[_-]", key.lower()))
+
+
+def resolve(node, variables, depth=0):
+    """Returns the value of the value node, :data:`MISSING` if it is not known before the run"""
+    valueType = node.valueType
+    if valueType == nodes.ValueType.VAR:
+        value = variables.get(node.value)
+        if value is None or depth > 10:
+            return MISSING
+        return resolve(value, variables, depth + 1)
+    if valueType in (nodes.ValueType.TEXT, nodes.ValueType.NUMRIC, nodes.ValueType.BOOL):
+        return node.value
+    if valueType == nodes.ValueType.NONE:
+        return None
+    return MISSING
+
+
+def buildRoutes(testFiles):
+    """Returns the routes of the (directory, file name) test files by the (method, path)
+
+    :rtype: OrderedDict
+    """
+    routes = OrderedDict()
+    for path, filename in testFiles:
+        root = DslParser(path, filename).buildNomos()
+        variables = {}
+        for method in root.methods:
+            variables.update((k, v) for k, v in method.context.items() if isinstance(v, nodes.ValueNode))
+        for method in root.methods:
+            if not method.httpPath:
+                continue
+            key = (method.httpMethod.upper(), method.httpPath.split("?", 1)[0])
+            route = routes.get(key)
+            if route is None:
+                route = routes[key] = Route(*key)
+            for node in method.testAsserts:
+                route.addAssert(node, variables)
+    return routes
+
+
+def responseBytes(status, headers, body, head=False):
+    """Returns the http/1.1 response bytes"""
+    lines = ["HTTP/1.1 %d %s" % (status, responses.get(status, "Unknown"))]
+    lines.extend("%s: %s" % _ for _ in headers)
+    lines.append("Content-Length: %d" % len(body))
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (b"" if head else body)
+
+
+class MockServer(object):
+    """The asyncio http server of the precomputed responses of the routes
+
+    :param routes: the routes by the (method, path), see :func:`buildRoutes`
+    :param host: (optional) the host to listen on, defaults to ``"127.0.0.1"``
+    :param port: (optional) the port to listen on, defaults to a free port
+    """
+
+    NOT_FOUND = responseBytes(404, [("Content-Type", "text/plain; charset=utf-8")], b"not found")
+
+    def __init__(self, routes, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        #: the response bytes by the (method, path)
+        self.responses = {}
+        for (method, path), route in routes.items():
+            status, headers, body = route.response()
+            self.responses[(method, path)] = responseBytes(status, headers, body)
+            if method == "GET" and ("HEAD", path) not in routes:
+                self.responses[("HEAD", path)] = responseBytes(status, headers, body, head=True)
+        self.server = None
+        self.loop = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    def startThread(self):
+        """Serves on a new event loop of a daemon thread, returns once the server listens"""
+        started = threading.Event()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            self.loop.run_until_complete(self.start())
+            started.set()
+            self.loop.run_forever()
+            self.server.close()
+            self.loop.run_until_complete(self.server.wait_closed())
+            self.loop.close()
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        started.wait()
+        return thread
+
+    def stop(self):
+        """Stops the server of :meth:`startThread`"""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    async def handle(self, reader, writer):
+        """Serves the requests of a connection"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                method, target, version = (line.decode("latin-1").split() + ["", ""])[:3]
+                length = 0
+                chunked = False
+                close = version != "HTTP/1.1"
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    name = name.strip().lower()
+                    value = value.strip().lower()
+                    if name == "content-length":
+                        length = int(value)
+                    elif name == "transfer-encoding":
+                        chunked = "chunked" in value
+                    elif name == "connection":
+                        close = "close" in value if version == "HTTP/1.1" else "keep-alive" not in value
+                if chunked:
+                    while True:
+                        size = int((await reader.readline()).split(b";", 1)[0], 16)
+                        await reader.readexactly(size + 2 if size else 0)
+                        if not size:
+                            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                                pass
+                            break
+                elif length:
+                    await reader.readexactly(length)
+                writer.write(self.responses.get((method, target.split("?", 1)[0]), self.NOT_FOUND))
+                if close:
+                    break
+                await writer.drain()
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+def serveMock(testFiles, address, stream=None):
+    """Serves the routes of the test files forever, prints the routes and their warnings
+
+    :param testFiles: the (directory, file name) test files
+    :param address: the ``[host:]port`` address
+    """
+    stream = stream or sys.stderr
+    host, _, port = address.rpartition(":")
+    routes = buildRoutes(testFiles)
+    server = MockServer(routes, host or "127.0.0.1", int(port))
+    for route in routes.values():
+        stream.write("%s %s\n" % (route.method, route.path))
+        for warning in route.warnings:
+            stream.write("    not passed: %s\n" % warning)
+
+    async def serve():
+        await server.start()
+        stream.write("Serving %d routes on http://%s:%d\n" % (len(routes), server.host, server.port))
+        stream.flush()
+        async with server.server:
+            await server.server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
@@ -171,8 +171,16 @@ class ActionMethodNode(AbstractNode):
         self.files = None
         #: the test assert node list
         self.testAsserts = []
-        #: the http test case class variables
+        #: the http test case class variables, the test section captures them after the asserts
         self.context = {}
+        #: the line numbers of the class variables in the dsl file
+        self.contextLinenos = {}
+        #: the names of the test sections to run before
+        self.depends = []
+        #: the line number of the section in the dsl file
+        self.lineno = None
+        #: the line number of the request line in the dsl file
+        self.requestLineno = None
 
     def __str__(self):
         return """ActionMethodNode <
@@ -207,6 +215,8 @@ class Node(AbstractNode):
         self.key = key
         self.nodeType = nodeType
         self.value = value
+        #: the line number of the key in the dsl file
+        self.lineno = None
 
     def __str__(self):
         return """Node <
@@ -1,7 +1,10 @@
+import sys
+
 from nomos.options import Options
 from nomos.cmd import Cmd
 from nomos import globalvar
 from nomos.runner import NomosRunner
+from nomos.shard import mergeReportFiles, parseShard
 
 
 class Nomoser(object):
@@ -17,6 +20,40 @@ class Nomoser(object):
         _('-m', '--minix', help='The test  minix path list (default %(default)r)', default=[])
         _('-c', '--config', default=self.conf_path, help="config path (default %(default)r)", metavar="FILE")
         _("-v", "--version", help="Show nomos version 0.1")
+        _('--tokenizer', default="default", choices=["default", "regex"],
+          help='The dsl tokenizer (default %(default)r)')
+        _('--no-cache', help='Disable the compiled test case cache (default %(default)r)',
+          action='store_true', default=False)
+        _('--cache-dir', default=None,
+          help='The compiled test case cache directory (default next to the test file)')
+        _('--build-workers', default=1, type=int,
+          help='The number of processes to parse and compile the test files (default %(default)r)')
+        _('--workers', default=1, type=int,
+          help='The number of workers running the test case classes (default %(default)r)')
+        _('--parallel', default="thread", choices=["thread", "process", "asyncio"],
+          help='Run the test case classes of the workers on threads, processes or the tests on '
+               'an event loop, the workers are the tests running at a time (default %(default)r)')
+        _('--codegen', default="text", choices=["ast", "text"],
+          help='Build the python ast with the test file lines or the python code (default %(default)r)')
+        _('--dump-code', help='Print the generated python code of the test files (default %(default)r)',
+          action='store_true', default=False)
+        _('--build', default=None, metavar="DIR",
+          help='Build the test files and minixs to the python package DIR instead of running them, '
+               'the package DIR is a test path then (default %(default)r)')
+        _('--shard', default=None, metavar="i/N",
+          help='Run the i-th of N deterministic shards of the test case classes (default %(default)r)')
+        _('--durations', default=None, metavar="FILE",
+          help='The report FILE of a previous run balancing the shards by the class durations, '
+               'the file sizes balance them without it (default %(default)r)')
+        _('--report', default=None, metavar="FILE",
+          help='Write the outcomes and the class durations of the run to the json report FILE, '
+               'the merged report with --merge (default %(default)r)')
+        _('--mock', default=None, metavar="[HOST:]PORT",
+          help='Serve the responses passing the asserts of the test files on the local PORT '
+               'instead of running them (default %(default)r)')
+        _('--merge', default=None, metavar="FILES",
+          help='Print the merged report of the shard report FILES instead of running the tests '
+               '(default %(default)r)')
 
         group = options.group("http settings")
         _ = group.define
@@ -28,6 +65,23 @@ class Nomoser(object):
           help='Specify a local cert  (default %(default)r)')
         _('--http.cert.client_key', default=None,
           help='Specify a local cert  (default %(default)r)')
+        _('--http.backend', default="requests", choices=["requests", "urllib3"],
+          help='The http transport, urllib3 sends the requests without the requests session hooks '
+               'and the environment proxies (default %(default)r)')
+        _('--http.cassette.file', default=None, metavar="FILE",
+          help='The cassette FILE of the recorded http responses (default %(default)r)')
+        _('--http.cassette.mode', default="replay", choices=["record", "replay"],
+          help='Record the responses to the cassette or replay them without the network '
+               '(default %(default)r)')
+        _('--http.stream', action='store_true', default=False,
+          help='Read the content longer than 1MiB by the chunks of the regex, the in and the length '
+               'content asserts with the bounded memory (default %(default)r)')
+        _('--http.pool.connections', default=10, type=int,
+          help='The number of the host connection pools to cache (default %(default)r)')
+        _('--http.pool.maxsize', default=10, type=int,
+          help='The maximum number of the connections to keep in a host pool (default %(default)r)')
+        _('--http.pool.block', action='store_true', default=False,
+          help='Wait for a free connection of a full host pool (default %(default)r)')
 
     def run(self, doc, conf_path=None):
         cmd = Cmd(conf_path)
@@ -46,12 +100,36 @@ class Nomoser(object):
         if config.get("http.cert.client_key") and config.get("http.cert.client_cert"):
             cert = (config.get("http.cert.client_cert"), config.get("http.cert.client_key"))
 
+        if config.get("merge"):
+            files = config.get("merge")
+            return mergeReportFiles(files.split(",") if not isinstance(files, list) else files,
+                                    config.get("report"))
+
         globalvar.config.update(config)
         runner = NomosRunner(config.get("url"), config.get("path"),  timeout=config.get("http.timeout"), minixs=config.get("minix", []),
-                             debug=config.get("debug"), cert=cert, verify=config.get("http.verify"))
-        runner.run()
+                             debug=config.get("debug"), cert=cert, verify=config.get("http.verify"),
+                             tokenizer=config.get("tokenizer"), cache=not config.get("no_cache"),
+                             cacheDir=config.get("cache_dir"), buildWorkers=config.get("build_workers"),
+                             dumpCode=config.get("dump_code"), codegen=config.get("codegen"),
+                             workers=config.get("workers"), parallel=config.get("parallel"),
+                             shard=parseShard(config.get("shard")) if config.get("shard") else None,
+                             durations=config.get("durations"), report=config.get("report"),
+                             poolConnections=config.get("http.pool.connections"),
+                             poolMaxsize=config.get("http.pool.maxsize"), poolBlock=config.get("http.pool.block"),
+                             backend=config.get("http.backend"), cassette=config.get("http.cassette.file"),
+                             cassetteMode=config.get("http.cassette.mode"), stream=config.get("http.stream"))
+        if config.get("build"):
+            runner.buildPackage(config.get("build"))
+            return
+        if config.get("mock"):
+            # python 3 only
+            from nomos.mock import serveMock
+            serveMock([_[:2] for _ in runner.walkTestFiles()], str(config.get("mock")))
+            return
+        return runner.run()
 
 
 if __name__ == '__main__':
     runner = Nomoser()
-    runner.run("Nomos")
+    results = runner.run("Nomos")
+    sys.exit(0 if results is None or results.wasSuccessful() else 1)
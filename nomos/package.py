@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Ahead of time built test case packages
+
+A built package is a plain python package of the generated test case modules,
+the copied minix modules and the manifest telling the test case classes::
+
+    package/
+        __init__.py
+        nomos_manifest.json
+        tests_json.py
+        _minix_0.py
+
+The runner imports the modules of the manifest without parsing and compiling
+the dsl files.
+"""
+
+import hashlib
+import json
+import os.path
+import py_compile
+import re
+import shutil
+
+from . import __version__
+from .builder import NomosBuilder
+from .compat import import_module_from_file
+from .errors import NomosError
+from .util import resource
+
+
+#: the manifest file name of the built package
+MANIFEST = "nomos_manifest.json"
+
+#: the manifest format version, the other versions are rebuilt
+MANIFEST_VERSION = 1
+
+#: the generated test case module head, the runner sets the session and the params
+MODULE_HEAD = '''# generated by nomos %s from %s, do not edit
+
+from nomos import nodes as _n
+from nomos.globalvar import config
+from nomos.testcase import WebTestCase
+from nomos.util import resource
+
+_session = None
+_params = {}
+
+'''
+
+#: the generated package init module
+PACKAGE_INIT = '''"""The nomos test cases built by nomos %s, see %s"""
+'''
+
+
+def isPackage(path):
+    """Returns ``True`` if the path is a built test case package directory"""
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+def buildPackage(out, testFiles, minixs=(), tokenizer="default", asyncMethods=False, keys=None):
+    """Builds the test case package of the dsl files
+
+    The test cases are generated python modules compiled to the byte code,
+    the minix files are copied, the minix classes are imported by the module name.
+
+    :param out: the package directory, replaced if it is a built package
+    :type out: str
+    :param testFiles: the (directory, file name, minix file paths) of the dsl files
+    :type testFiles: list[tuple]
+    :param minixs: the minix file paths or classes of all the test cases
+    :type minixs: list
+    :param tokenizer: the dsl tokenizer name, defaults to ``"default"``
+    :type tokenizer: str, optional
+    :param asyncMethods: builds the async test methods of the asyncio engine, defaults to ``False``
+    :type asyncMethods: bool, optional
+    :param keys: (optional) the shard keys of the dsl files, see :func:`nomos.shard.testKey`
+    :type keys: list, optional
+    :returns: the manifest
+    :rtype: dict
+    """
+    if os.path.exists(out):
+        if not isPackage(out):
+            raise NomosError("The package directory %r exists and is not a nomos package" % out)
+        shutil.rmtree(out)
+    os.makedirs(out)
+
+    #: the package module names of the minix files
+    minixModules = {}
+
+    def minixNames(sources):
+        names = []
+        for source in sources:
+            if not isinstance(source, str):
+                names.append("%s:%s" % (source.__module__, source.__name__))
+                continue
+            name = minixModules.get(source)
+            if name is None:
+                name = minixModules[source] = "_minix_%d" % len(minixModules)
+                shutil.copyfile(source, os.path.join(out, name + ".py"))
+            names.append(name)
+        return names
+
+    commonMinixs = minixNames(minixs)
+    tests = []
+    modules = set()
+    for i, (path, filename, minixFiles) in enumerate(testFiles):
+        filepath = os.path.join(path, filename)
+        code, className = NomosBuilder(path, filename, tokenizer, "text", asyncMethods).build()[:2]
+        name = moduleName(os.path.splitext(os.path.relpath(filepath))[0], modules)
+        modulePath = os.path.join(out, name + ".py")
+        with open(modulePath, "w") as f:
+            f.write(MODULE_HEAD % (__version__, filepath))
+            f.write(code)
+        py_compile.compile(modulePath, doraise=True)
+        tests.append({
+            "module": name,
+            "class": className,
+            "source": filepath,
+            "sha1": hashlib.sha1(resource(filepath, useConfig=False).encode("utf-8")).hexdigest(),
+            "minixs": commonMinixs + minixNames(minixFiles),
+        })
+        if keys is not None:
+            tests[-1]["key"] = keys[i]
+
+    with open(os.path.join(out, "__init__.py"), "w") as f:
+        f.write(PACKAGE_INIT % (__version__, MANIFEST))
+    manifest = {"version": MANIFEST_VERSION, "nomos": __version__, "async": asyncMethods, "tests": tests}
+    with open(os.path.join(out, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def moduleName(path, modules):
+    """Returns the unique python module name of the dsl file path without the extension"""
+    base = re.sub(r"\W", "_", path)
+    if base[0].isdigit():
+        base = "_" + base
+    name, index = base, 1
+    while name in modules:
+        index += 1
+        name = "%s_%d" % (base, index)
+    modules.add(name)
+    return name
+
+
+def loadManifest(path):
+    """Returns the manifest of the built package"""
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise NomosError("The package %r is built by another nomos version, rebuild it" % path)
+    return manifest
+
+
+def loadPackage(path):
+    """Imports the test case modules of the built package
+
+    The runner sets the ``_session`` and ``_params`` of the modules before running them.
+
+    :param path: the package directory
+    :type path: str
+    :returns: the (module, test case class, minix classes) list in the build order
+    :rtype: list[tuple]
+    """
+    manifest = loadManifest(path)
+    package = os.path.basename(os.path.normpath(path))
+    modules = {}
+
+    def load(name):
+        module = modules.get(name)
+        if module is None:
+            module = modules[name] = import_module_from_file("%s.%s" % (package, name),
+                                                             os.path.join(path, name + ".py"))
+        return module
+
+    testcases = []
+    for test in manifest["tests"]:
+        module = load(test["module"])
+        minixs = []
+        for name in test["minixs"]:
+            if ":" in name:
+                minixModule, className = name.split(":", 1)
+                minixs.append(getattr(__import__(minixModule, fromlist=[className]), className))
+            else:
+                minix = load(name)
+                minixs.extend(getattr(minix, _) for _ in getattr(minix, "__all__"))
+        testcases.append((module, getattr(module, test["class"]), minixs))
+    return testcases
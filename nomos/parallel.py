@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Parallel test case class execution
+
+The test case classes run on the workers, the tests of a class and its
+``setUpClass`` run on one worker. The test events are recorded by the
+workers and replayed in the suite order, the report is the same as the
+serial run.
+
+The process workers send the events with the tests and errors serialized
+to the :class:`RemoteTest` and :class:`FormattedError`, the runner reports
+them with the :class:`TextResult`.
+
+The :class:`TimedSuite` adds the duration of a test case class run to the
+result, the durations are replayed like the test events.
+"""
+
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import time
+import unittest
+
+from . import globalvar
+from .testcase import WebTestLoader
+
+
+class RecordingResult(unittest.TestResult):
+    """The test result recording the test events to replay them to another result"""
+
+    #: the recorded result methods, the ones of the python version
+    EVENTS = ('startTest', 'stopTest', 'addSuccess', 'addError', 'addFailure', 'addSkip',
+              'addExpectedFailure', 'addUnexpectedSuccess', 'addSubTest', 'addDuration')
+
+    def __init__(self):
+        super(RecordingResult, self).__init__()
+        #: the (method name, args) events
+        self.events = []
+
+    def addClassDuration(self, key, seconds):
+        self.events.append(("addClassDuration", (key, seconds)))
+
+    def replay(self, result):
+        """Calls the recorded events on the result, stops if the result should stop"""
+        replay(self.events, result)
+
+    def serialize(self):
+        """Returns the events with the tests and the errors serialized to be sent to another process"""
+        events = []
+        for name, args in self.events:
+            test = args[0]
+            events.append((name, tuple(self.serializeArg(_, test) for _ in args)))
+        return events
+
+    def serializeArg(self, arg, test):
+        if isinstance(arg, tuple) and len(arg) == 3 and isinstance(arg[0], type):
+            return FormattedError(issubclass(arg[0], test.failureException), self._exc_info_to_string(arg, test))
+        if hasattr(arg, "shortDescription"):
+            return RemoteTest(arg)
+        return arg
+
+
+class RemoteTest(object):
+    """The description of the test run in another process"""
+
+    failureException = AssertionError
+
+    def __init__(self, test):
+        self.testId = test.id()
+        self.text = str(test)
+        self.description = test.shortDescription()
+
+    def id(self):
+        return self.testId
+
+    def shortDescription(self):
+        return self.description
+
+    def __str__(self):
+        return self.text
+
+
+class FormattedError(tuple):
+    """The formatted error of the test run in another process, a failure is an ``AssertionError`` error
+
+    It is like the ``sys.exc_info()`` for the test results, the :class:`TextResult` reports the text.
+    """
+
+    def __new__(cls, failure, text):
+        self = tuple.__new__(cls, (AssertionError if failure else Exception, None, None))
+        self.text = text
+        return self
+
+    def __getnewargs__(self):
+        return self[0] is AssertionError, self.text
+
+
+class TextResult(unittest.TextTestResult):
+    """The text test result reporting the formatted errors and summing the test case class durations"""
+
+    def __init__(self, *args, **kwargs):
+        super(TextResult, self).__init__(*args, **kwargs)
+        #: the seconds of the test case classes by the key
+        self.durations = {}
+
+    def addClassDuration(self, key, seconds):
+        self.durations[key] = self.durations.get(key, 0.0) + seconds
+
+    def _exc_info_to_string(self, err, test):
+        if isinstance(err, FormattedError):
+            return err.text
+        return super(TextResult, self)._exc_info_to_string(err, test)
+
+
+def replay(events, result):
+    """Calls the events on the result, stops if the result should stop,
+    the events the result has no method of are skipped
+    """
+    for name, args in events:
+        if result.shouldStop:
+            return
+        method = getattr(result, name, None)
+        if method is not None:
+            method(*args)
+
+
+def _recorder(name):
+    """Returns the result method recording the event"""
+    def record(self, *args):
+        self.events.append((name, args))
+        return getattr(unittest.TestResult, name)(self, *args)
+    record.__name__ = name
+    return record
+
+
+for _name in RecordingResult.EVENTS:
+    if hasattr(unittest.TestResult, _name):
+        setattr(RecordingResult, _name, _recorder(_name))
+
+
+class TimedSuite(unittest.TestSuite):
+    """The test suite of a test case class adding its run duration to the result
+
+    :param key: the test case class key, see :func:`nomos.shard.testKey`
+    :type key: str
+    :param tests: the tests of the class
+    """
+
+    def __init__(self, key, tests=()):
+        super(TimedSuite, self).__init__(tests)
+        self.key = key
+
+    def run(self, result, debug=False):
+        start = time.time()
+        try:
+            return super(TimedSuite, self).run(result, debug)
+        finally:
+            if hasattr(result, "addClassDuration"):
+                result.addClassDuration(self.key, time.time() - start)
+
+
+class ThreadedSuite(object):
+    """The test suite running the test case class suites on a thread pool
+
+    It runs like a ``unittest.TestSuite`` in the ``TextTestRunner``.
+
+    :param suites: the test case class suites
+    :type suites: list
+    :param workers: the number of threads
+    :type workers: int
+    """
+
+    def __init__(self, suites, workers):
+        self.suites = list(suites)
+        self.workers = workers
+
+    def countTestCases(self):
+        return sum(_.countTestCases() for _ in self.suites)
+
+    def __call__(self, result):
+        return self.run(result)
+
+    def run(self, result):
+        """Runs the suites, the results are replayed to the result in the suite order once they are done"""
+        pool = ThreadPool(min(self.workers, len(self.suites)) or 1)
+        try:
+            for recorder in pool.imap(runSuite, self.suites):
+                recorder.replay(result)
+        finally:
+            pool.close()
+            pool.join()
+        return result
+
+
+def runSuite(suite):
+    """Runs the suite on its own result, returns the recording result"""
+    recorder = RecordingResult()
+    suite(recorder)
+    return recorder
+
+
+class ProcessSuite(object):
+    """The test suite running the test case classes on a process pool
+
+    The workers get a copy of the runner, the test case classes are built by
+    :meth:`NomosRunner.taskSuite` in the worker with its own default name space
+    and http session. The events of the classes are replayed in the task order.
+
+    :param runner: the nomos runner
+    :type runner: NomosRunner
+    :param tasks: the pickleable test case class tasks
+    :type tasks: list
+    :param workers: the number of processes
+    :type workers: int
+    :param context: the multiprocessing context, defaults to the multiprocessing module
+    """
+
+    def __init__(self, runner, tasks, workers, context=None):
+        self.runner = runner
+        self.tasks = list(tasks)
+        self.workers = workers
+        self.context = context or multiprocessing
+
+    def __call__(self, result):
+        return self.run(result)
+
+    def run(self, result):
+        """Runs the tasks, the results are replayed to the result in the task order once they are done"""
+        pool = self.context.Pool(min(self.workers, len(self.tasks)) or 1,
+                                 initializer=initWorker, initargs=(self.runner, globalvar.config))
+        try:
+            for events in pool.imap(runTask, self.tasks):
+                replay(events, result)
+        finally:
+            pool.close()
+            pool.join()
+        return result
+
+
+#: the runner of the worker process
+_runner = None
+
+
+def initWorker(runner, config=None):
+    """Sets the runner of the worker process and restores the global config of the parent,
+    the spawned workers do not inherit it.
+    """
+    global _runner
+    _runner = runner
+    if config is not None:
+        globalvar.config.update(config)
+
+
+def runTask(task):
+    """Runs the test case class of the task in a worker process, returns the serialized events"""
+    return runSuite(_runner.taskSuite(task, WebTestLoader())).serialize()
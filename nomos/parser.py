@@ -14,11 +14,16 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import bisect
 import re
 
 from .errors import TokenizerException
 
 
+#: the unquoted key or text chars run, stops at white space and comments
+_UNQUOTED_RUN = r'(?:[^\s"{}\[\]:=,#`^?*&\\/]+|/(?!/))'
+
+
 class TokenType(object):
     """Token Type Enum"""
 
@@ -90,6 +95,8 @@ class Token(object):
     :type value: string, optional
     """
 
+    __slots__ = ('sourceIndex', 'length', 'value', 'tokenType')
+
     def __init__(self, tokenType, sourceIndex, length, value=None):
         self.sourceIndex = sourceIndex
         self.length = length
@@ -133,6 +140,8 @@ class LiteralValue(Token):
     :type value: boolean
     """
 
+    __slots__ = ('isQuoted',)
+
     def __init__(self, sourceIndex, length, value=None, isQuoted=False):
         super(LiteralValue, self).__init__(TokenType.LiteralValue, sourceIndex, length, value)
         self.isQuoted = isQuoted
@@ -145,27 +154,45 @@ class KeyToken(Token):
     :type value: boolean
     """
 
+    __slots__ = ('isQuoted',)
+
     def __init__(self, sourceIndex, length, value=None, isQuoted=False):
         super(KeyToken, self).__init__(TokenType.Key, sourceIndex, length, value)
         self.isQuoted = isQuoted
 
 
 class Tokenizer(object):
-    """The Base Hocon Tokenizer"""
+    """The Base Hocon Tokenizer
+
+    :param text: the source text
+    :type text: str
+    :param pystyle: If True, converts the unquoted text to python value, defaults to False
+    :type pystyle: bool, optional
+    :param start: the begin index of the text range to read, defaults to 0
+    :type start: int, optional
+    :param end: the end index of the text range to read, defaults to the text length
+    :type end: int, optional
+    """
 
-    def __init__(self, text, pystyle=False):
-            #: the current node text
+    def __init__(self, text, pystyle=False, start=0, end=None):
+        #: the current node text
         self._text = text
         #: the begin index
-        self._index = 0
+        self._index = start
+        #: the end index, the text is shared and not copied for a sub range
+        self._end = len(text) if end is None else end
         #: the index stack
         self._indexStack = []
+        #: the end index stack
+        self._endStack = []
         #: the value covert style
         self.pystyle = pystyle
+        #: the line start offsets, built on the first line lookup
+        self._lineStarts = None
 
     @property
     def length(self):
-        return len(self._text)
+        return self._end
 
     @property
     def index(self):
@@ -177,14 +204,28 @@ class Tokenizer(object):
     def pop(self):
         self._indexStack.pop()
 
+    def pushEnd(self, end):
+        """Limits the reading range to end at the index, the text is not copied"""
+        self._endStack.append(self._end)
+        self._end = end
+
+    def popEnd(self):
+        """Restores the reading range end"""
+        self._end = self._endStack.pop()
+
+    def lineEnd(self):
+        """Returns the index of the current line end"""
+        end = self._text.find('\n', self._index, self._end)
+        return self._end if end == -1 else end
+
     @property
     def eof(self):
         """End of file"""
-        return self._index >= len(self._text)
+        return self._index >= self._end
 
     def match(self, pattern):
         """Match the pattern returns ``True``"""
-        if (len(pattern) + self._index) > len(self._text):
+        if (len(pattern) + self._index) > self._end:
             return False
         end = self._index + len(pattern)
         if self._text[self._index:end] == pattern:
@@ -201,7 +242,7 @@ class Tokenizer(object):
 
     def take(self, length):
         """Get the head  length text """
-        if(self._index + length) > len(self._text):
+        if(self._index + length) > self._end:
             return None
         end = self._index + length
         s = self._text[self._index:end]
@@ -223,10 +264,22 @@ class Tokenizer(object):
         self._index += 1
         return self._text[index]
 
+    WHITESPACE_RE = re.compile(r'\s*')
+    """White space regex expression"""
+
     def pullWhitespace(self):
         """Pull white space"""
-        while (not self.eof) and self.peek().isspace():
-            self.takeOne()
+        self._index = self.WHITESPACE_RE.match(self._text, self._index, self._end).end()
+
+    NEWLINE_RE = re.compile(r'\n')
+    """New line regex expression"""
+
+    def lineColumn(self, index):
+        """Returns the 1-based (line, column) of the source index"""
+        if self._lineStarts is None:
+            self._lineStarts = [0] + [m.end() for m in self.NEWLINE_RE.finditer(self._text)]
+        line = bisect.bisect_right(self._lineStarts, index)
+        return line, index - self._lineStarts[line - 1] + 1
 
     def getHelpTextAtIndex(self, index, length=0):
         """Get the help text at index"""
@@ -236,9 +289,10 @@ class Tokenizer(object):
         end = l + index
         snippet = self._text[index:end]
         if length > 1:
-            return snippet + "..."
+            snippet += "..."
         snippet = snippet.replace("\r", "\\r").replace("\n", "\\n")
-        return str.format("at index {0}: `{1}`", index, snippet)
+        line, column = self.lineColumn(index)
+        return str.format("at line {0}, column {1}: `{2}`", line, column, snippet)
 
 
 class NomosTokenizer(Tokenizer):
@@ -247,6 +301,12 @@ class NomosTokenizer(Tokenizer):
     NotInUnquotedKey = "\"{}[]:=,#`^?*&\\"
     NotInUnquotedText = "\"{}[]:=,#`^?*&\\"
 
+    UNQUOTED_RE = re.compile(_UNQUOTED_RUN + '*')
+    """Unquoted key and text regex expression"""
+
+    SPACE_OR_TAB_RE = re.compile(r'[ \t\v]*')
+    """Space or tab regex expression"""
+
     def pullWhitespaceAndComments(self):
         """Pull whitespace and comments"""
         while True:
@@ -258,29 +318,23 @@ class NomosTokenizer(Tokenizer):
 
     def pullRestOfLine(self):
         """Pull the rest of the current line"""
-        sb = ""
-        while not self.eof:
-            c = self.takeOne()
-            if c == '\n':
-                break
-            if c == '\r':
-                continue
-            sb += c
-        return sb.strip()
+        start = self._index
+        end = self._text.find('\n', start, self._end)
+        if end == -1:
+            end = self._index = self._end
+        else:
+            self._index = end + 1
+        return self._text[start:end].replace('\r', '').strip()
 
     def pullUtilMatch(self, key):
-        """Pull the rest of the current line"""
-        sb = ""
-        length = len(key)
-        while not self.eof:
-            c = self.take(length)
-            if c is None:
-                raise TokenizerException(str.format(
-                    "Expected end for math until {0}", key))
-            if c == key:
-                break
-            sb += c
-        return sb.strip()
+        """Pull the text until the key, the key is pulled too"""
+        start = self._index
+        end = self._text.find(key, start, self._end)
+        if end == -1:
+            raise TokenizerException(str.format(
+                "Expected end for math until {0}", key))
+        self._index = end + len(key)
+        return self._text[start:end].strip()
 
     def pullNext(self):
         """Pull the next token section"""
@@ -350,14 +404,23 @@ class NomosTokenizer(Tokenizer):
     def pullCall(self, callType):
         """Pull substitution token"""
         start = self.index
-        sb = ''
-        self.take(2)
-        while (not self.eof) and self.peek() != "}":
-            sb += self.takeOne()
-
-        self.takeOne()
+        sb = self._pullUntil("}", 2)
         return LiteralValue(start, self.index - start, callType + sb.strip(), False)
 
+    def _pullUntil(self, delimiter, skip):
+        """Pull the text after the ``skip`` length opening until the delimiter
+
+        The delimiter is pulled too, returns the text to the end of file if
+        the delimiter is not found.
+        """
+        begin = self._index + skip
+        end = self._text.find(delimiter, begin, self._end)
+        if end == -1:
+            self._index = self._end
+            return self._text[begin:self._end]
+        self._index = end + len(delimiter)
+        return self._text[begin:end]
+
     def pullHttpMethodAndPath(self):
         self.takeOne()
         method = self.pullNext()
@@ -498,10 +561,8 @@ class NomosTokenizer(Tokenizer):
     def pullUnquotedKey(self):
         """Pull unquoted key"""
         start = self.index
-        sb = ""
-        while (not self.eof) and self.isUnquotedKey() and (not self.isWhitesplace()):
-            sb += self.takeOne()
-        return Token.Key(sb.strip(), start, self.index - start, False)
+        self._index = self.UNQUOTED_RE.match(self._text, start, self._end).end()
+        return Token.Key(self._text[start:self._index], start, self.index - start, False)
 
     def isUnquotedKey(self):
         """Check is the  unquoted key"""
@@ -522,49 +583,33 @@ class NomosTokenizer(Tokenizer):
         return self.isWhitesplace() or self.isStartOfComment()
 
     def pullTripQuotedText(self):
-        """Pull the trip quoted text"""
+        """Pull the trip quoted text
+
+        The backslashes are kept as it is, like the quoted text.
+        """
         start = self.index
-        sb = ''
-        self.take(3)
-        while (not self.eof) and (not self.match("\"\"\"")):
-            if self.match("\\"):
-                sb += self.pullEscapeSequence()
-            else:
-                sb += self.takeOne()
-
-        if self.match("\""):
+        end = self._text.find('"""', start + 3, self._end)
+        if end == -1:
             raise TokenizerException(str.format(
-                "Expected end of tripple quoted string {0}", self.getHelpTextAtIndex(self.index)))
+                "Expected end of tripple quoted string {0}", self.getHelpTextAtIndex(start)))
 
-        self.take(3)
-        return Token.LiteralValue(sb, start, self.index - start, True)
+        self._index = end + 3
+        return Token.LiteralValue(self._text[start + 3:end], start, self.index - start, True)
 
     def pullQuotedText(self):
-        """Pull the quoted text"""
-        start = self.index
-        sb = ''
-        self.takeOne()
-        while (not self.eof) and not self.match("\""):
-            if self.match("\\"):
-                sb += self.pullEscapeSequence()
-            else:
-                sb += self.takeOne()
+        """Pull the quoted text
 
-        self.takeOne()
+        The escape sequence backslash is pulled as it is, so the text ends
+        at the next double quote.
+        """
+        start = self.index
+        sb = self._pullUntil('"', 1)
         return Token.LiteralValue(sb, start, self.index - start, True)
 
     def pullQuotedKey(self):
         """Pull the quoted key"""
         start = self.index
-        sb = ''
-        self.takeOne()
-        while (not self.eof) and (not self.match("\"")):
-            if self.match("\\"):
-                sb += self.pullEscapeSequence()
-            else:
-                sb += self.takeOne()
-
-        self.takeOne()
+        sb = self._pullUntil('"', 1)
         return Token.Key(sb, start, self.index - start, True)
 
     def pullEscapeSequence(self):
@@ -650,18 +695,14 @@ class NomosTokenizer(Tokenizer):
     def pullSpaceOrTab(self):
         """Pull black text"""
         start = self.index
-        sb = ''
-        while self.isSpaceOrTab():
-            sb += self.takeOne()
-
-        return Token.LiteralValue(sb, start, self.index - start, False)
+        self._index = self.SPACE_OR_TAB_RE.match(self._text, start, self._end).end()
+        return Token.LiteralValue(self._text[start:self._index], start, self.index - start, False)
 
     def pullUnquotedText(self):
         """Pull unquotes text"""
         start = self.index
-        value = ''
-        while (not self.eof) and self.isUnquotedText() and (not self.isWhitesplace()):
-            value += self.takeOne()
+        self._index = self.UNQUOTED_RE.match(self._text, start, self._end).end()
+        value = self._text[start:self._index]
 
         if self.pystyle:
             value = self.convertToPyValue(value)
@@ -718,3 +759,130 @@ class NomosTokenizer(Tokenizer):
             return True
 
         return False
+
+
+class NomosScanner(NomosTokenizer):
+    """The regex driven Nomos tokenizer
+
+    Recognizes every token with one match of a compiled master pattern at the
+    current index instead of probing the text char by char, it emits the same
+    token stream as :class:`NomosTokenizer`.
+    """
+
+    _UNQUOTED = _UNQUOTED_RUN + '+'
+
+    SKIP_RE = re.compile(r'(?:\s+|(?:#|//)[^\n]*\n?)*')
+    """Whitespace and comments regex expression"""
+
+    NEXT_RE = re.compile(
+        r'(?P<MethodNameStart>\[)'
+        r'|(?P<MethodNameEnd>\])'
+        r'|(?P<HttpMethodStart>>>)'
+        r'|(?P<Call>([$@])\{([^}]*)\}?)'
+        r'|(?P<ImportStart><%)'
+        r'|(?P<Operation>>=|=~|<-|~~|==|<=|!=|<<|[=:<>])'
+        r'|(?P<ObjectStart>\{)'
+        r'|(?P<ObjectEnd>\})'
+        r'|(?P<QuotedKey>"([^"]*)"?)'
+        r'|(?P<UnquotedKey>' + _UNQUOTED + ')')
+    """The ``pullNext`` master regex expression"""
+
+    VALUE_RE = re.compile(
+        r'(?P<ArrayStart>\[)'
+        r'|(?P<ArrayEnd>\])'
+        r'|(?P<ObjectStart>\{)'
+        r'|(?P<TripQuoted>""")'
+        r'|(?P<Quoted>"([^"]*)"?)'
+        r'|(?P<Call>([$@])\{([^}]*)\}?)'
+        r'|(?P<Unquoted>' + _UNQUOTED + ')')
+    """The ``pullValue`` master regex expression"""
+
+    VALUE_START_RE = re.compile(r'[\[{"]|' + _UNQUOTED)
+    """The start of value regex expression"""
+
+    def pullWhitespaceAndComments(self):
+        """Pull whitespace and comments"""
+        self._index = self.SKIP_RE.match(self._text, self._index, self._end).end()
+
+    def pullNext(self):
+        """Pull the next token section"""
+        self.pullWhitespaceAndComments()
+        start = self._index
+        m = self.NEXT_RE.match(self._text, start, self._end)
+        if m is None:
+            if self.eof:
+                return Token(TokenType.EoF, start, 0)
+            raise TokenizerException(str.format(
+                "Unknown token: {0}", self.getHelpTextAtIndex(start)))
+
+        kind = m.lastgroup
+        if kind == 'HttpMethodStart':
+            # the second `>` is pulled by ``pullHttpMethodAndPath``
+            self._index = start + 1
+            return Token(TokenType.HttpMethodStart, self._index, 1)
+
+        end = m.end()
+        self._index = end
+        if kind == 'UnquotedKey':
+            return KeyToken(start, end - start, m.group(kind), False)
+        if kind == 'Operation':
+            return Token(TokenType.Operation, start, end - start, m.group(kind))
+        if kind == 'QuotedKey':
+            return KeyToken(start, end - start, m.group(m.lastindex + 1), True)
+        if kind == 'ObjectStart':
+            return Token(TokenType.ObjectStart, start, 1)
+        if kind == 'ObjectEnd':
+            return Token(TokenType.ObjectEnd, start, 1)
+        if kind == 'Call':
+            return self._callToken(m, start)
+        if kind == 'MethodNameStart':
+            return Token(TokenType.MethodNameStart, end, 1)
+        if kind == 'MethodNameEnd':
+            return Token(TokenType.MethodNameEnd, end, 1)
+        return Token(TokenType.ImportStart, end, 2)
+
+    def _callToken(self, m, start):
+        """Creates the substitution token from the call match"""
+        callType, body = m.group(m.lastindex + 1, m.lastindex + 2)
+        return LiteralValue(start, m.end() - start, callType + body.strip(), False)
+
+    def pullValue(self):
+        """Pull the value, returns the token"""
+        start = self._index
+        m = self.VALUE_RE.match(self._text, start, self._end)
+        if m is None:
+            raise TokenizerException(str.format(
+                "Expected value: Null literal, Array, Quoted Text, Unquoted Text, Triple quoted Text, Object or End of array {0}",
+                self.getHelpTextAtIndex(start)))
+
+        kind = m.lastgroup
+        if kind == 'TripQuoted':
+            return self.pullTripQuotedText()
+
+        end = m.end()
+        self._index = end
+        if kind == 'Unquoted':
+            value = m.group(kind)
+            if self.pystyle:
+                value = self.convertToPyValue(value)
+            return LiteralValue(start, end - start, value, False)
+        if kind == 'Quoted':
+            return LiteralValue(start, end - start, m.group(m.lastindex + 1), True)
+        if kind == 'Call':
+            return self._callToken(m, start)
+        if kind == 'ObjectStart':
+            return Token(TokenType.ObjectStart, start, 1)
+        if kind == 'ArrayStart':
+            return Token(TokenType.ArrayStart, end, 1)
+        return Token(TokenType.ArrayEnd, start, 1)
+
+    def isValue(self):
+        """Check the current token is a value"""
+        return self.VALUE_START_RE.match(self._text, self._index, self._end) is not None
+
+
+#: the selectable tokenizer classes
+TOKENIZERS = {
+    "default": NomosTokenizer,
+    "regex": NomosScanner
+}
@@ -15,16 +15,26 @@
 # under the License.
 
 
+import marshal
+import multiprocessing
 import os
+import sys
+import time
+import types
 import unittest
 
 
 from . import nodes
+from .builder import NomosBuilder, buildWorker, compileCode
+from .cache import CompileCache
+from .cassette import Cassette
 from .compat import import_module_from_file
-from .compiler import NomasComplirer
-from .dsl import DslParser
-from .http import HttpSession
-from .testcase import WebTestCase
+from .errors import NomosError
+from .http import HttpPool, HttpSession
+from .package import buildPackage, isPackage, loadManifest, loadPackage
+from .parallel import ProcessSuite, TextResult, ThreadedSuite, TimedSuite
+from .shard import dumpReport, loadDurations, makeReport, shardUnits, testKey
+from .testcase import WebTestCase, WebTestLoader
 from .util import resource
 from .globalvar import config
 
@@ -48,11 +58,51 @@ class NomosRunner(object):
                     If Tuple, ('cert', 'key') pair.
     :param minixs: (optional) if Classes list, the test case minixes to inherit.
                  other wise a list of minix path to load test case minix.
+    :param paths: the paths may be the test case packages built by :meth:`buildPackage`.
+    :param tokenizer: (optional) the dsl tokenizer name, ``"default"`` or ``"regex"``.
+    :param cache: (optional) If ``True``, loads the compiled test case from the cache
+                    while the dsl file is not changed. Defaults to ``True``.
+    :param cacheDir: (optional) the cache directory, defaults to the ``__nomoscache__``
+                    directory next to the dsl file.
+    :param buildWorkers: (optional) the number of processes to parse and compile the
+                    dsl files, defaults to 1 builds in this process.
+    :param dumpCode: (optional) If ``True``, prints the generated python code of the
+                    test files instead of running them.
+    :param codegen: (optional) ``"ast"`` builds the python ast with the dsl line numbers,
+                    ``"text"`` generates the python code, defaults to ``"text"``.
+    :param workers: (optional) the number of workers running the test case classes,
+                    the maximum number of the tests running at a time of the asyncio engine,
+                    defaults to 1 runs them in order in this thread.
+    :param parallel: (optional) ``"thread"`` runs the test case classes on a thread pool,
+                     ``"process"`` on a process pool with the test case classes built in
+                     the default name space of the worker, ``"asyncio"`` builds the async test
+                     methods and runs the tests on an event loop with the asyncio session,
+                     defaults to ``"thread"``.
+    :param shard: (optional) the 1 based (index, count) shard of the test case classes to run,
+                  see :mod:`nomos.shard`.
+    :param durations: (optional) the report file of a previous run, the shards are balanced by
+                      its test case class durations.
+    :param report: (optional) the report file to write the outcomes and the class durations to.
+    :param poolConnections: (optional) the number of the host connection pools to cache, see :class:`HttpPool`.
+    :param poolMaxsize: (optional) the maximum number of the connections to keep in a host pool.
+    :param poolBlock: (optional) If ``True``, a request waits for a free connection of a full host pool.
+    :param backend: (optional) the http transport of the sessions, ``"requests"`` or ``"urllib3"``,
+                    see :mod:`nomos.transport`, defaults to ``"requests"``.
+    :param cassette: (optional) the cassette file of the http responses, see :mod:`nomos.cassette`.
+    :param cassetteMode: (optional) ``"record"`` writes the responses of the run to the cassette,
+                         ``"replay"`` answers the requests from it without the network,
+                         defaults to ``"replay"``.
+    :param stream: (optional) If ``True``, the long content is read by the chunks of the ``=~``, ``<-``
+                   and ``~~`` content asserts, see :mod:`nomos.stream`.
 
 
     """
 
-    def __init__(self, url, paths, debug=None, timeout=5, verify=True, cert=None, minixs=None, **params):
+    def __init__(self, url, paths, debug=None, timeout=5, verify=True, cert=None, minixs=None,
+                 tokenizer="default", cache=True, cacheDir=None, buildWorkers=1,
+                 dumpCode=False, codegen="text", workers=1, parallel="thread", shard=None, durations=None,
+                 report=None, poolConnections=10, poolMaxsize=10, poolBlock=False, backend="requests",
+                 cassette=None, cassetteMode="replay", stream=False, **params):
         self.paths = paths
         self.url = url
         self.debug = debug
@@ -60,14 +110,79 @@ class NomosRunner(object):
         self.verify = verify
         self.cert = cert
         self.params = params
+        self.tokenizer = tokenizer
+        self.cache = CompileCache(cacheDir) if cache else None
+        self.buildWorkers = buildWorkers
+        self.dumpCode = dumpCode
+        self.codegen = codegen
+        self.workers = workers
+        self.parallel = parallel
+        #: the test methods are async and awaits the asyncio session
+        self.asyncMethods = parallel == "asyncio"
+        self.shard = shard
+        self.durations = durations
+        self.report = report
+        #: the connection pool of the asyncio sessions of a run
+        self.connections = None
+        #: the connection pools of the http sessions of a run
+        self.pool = None
+        self.poolConnections = poolConnections
+        self.poolMaxsize = poolMaxsize
+        self.poolBlock = poolBlock
+        self.backend = backend
+        if cassette and self.asyncMethods:
+            raise NomosError("The cassette is not supported by the asyncio engine")
+        #: the cassette file and the cassette of the http sessions of a run
+        self.cassettePath = cassette
+        self.cassetteMode = cassetteMode
+        self.cassette = None
+        if stream and self.asyncMethods:
+            raise NomosError("The streamed content is not supported by the asyncio engine")
+        self.stream = stream
+        #: the test case builders by the dsl file path, rebuilds the changed sections on the next run
+        self.builders = {}
+        #: the minix paths and classes
+        self.minixSources = list(minixs or [])
         if minixs:
             self.minixs = self.getMinixClasses(None, minixs)
         else:
             self.minixs = []
+        #: the loaded built packages by the path and the minix classes by the minix files of a run
+        self.packages = {}
+        self.minixClasses = {}
+
+    def __getstate__(self):
+        """The process workers get the runner without the builders, the minix classes are imported again"""
+        state = dict(self.__dict__)
+        state["builders"] = {}
+        state["minixs"] = None
+        state["packages"] = {}
+        state["minixClasses"] = {}
+        state["connections"] = None
+        state["pool"] = None
+        state["cassette"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.minixs = self.getMinixClasses(None, self.minixSources)
 
     def defaultNamespace(self):
-        """Default test case name space"""
-        client = HttpSession(self.url, timeout=self.timeout, verify=self.verify, cert=self.cert)
+        """Default test case name space, the session is the asyncio session of the async test methods"""
+        if self.asyncMethods:
+            # python 3 only
+            from .asynchttp import AsyncHttpSession, ConnectionPool
+            if self.connections is None:
+                self.connections = ConnectionPool()
+            client = AsyncHttpSession(self.url, timeout=self.timeout, verify=self.verify, cert=self.cert,
+                                      pool=self.connections)
+        else:
+            if self.pool is None:
+                self.pool = HttpPool(self.poolConnections, self.poolMaxsize, self.poolBlock)
+            if self.cassettePath and self.cassette is None:
+                self.cassette = Cassette(self.cassettePath, self.cassetteMode)
+            client = HttpSession(self.url, timeout=self.timeout, verify=self.verify, cert=self.cert,
+                                 pool=self.pool, backend=self.backend, cassette=self.cassette, stream=self.stream)
         return {
             '_session': client,
             "_params": self.params,
@@ -79,42 +194,179 @@ class NomosRunner(object):
 
     def run(self):
         """Build dsl and run the http test case."""
-        testClassesToRun = []
+        testFiles = self.walkTestFiles()
+
+        if self.dumpCode:
+            for path, filename, minixFiles in testFiles:
+                print(self.genTestcaseSource(path, filename))
+            return
+
+        self.packages = {}
+        self.minixClasses = {}
+        #: the (key, file size, task) test case classes, the task of the dsl file is completed after the sharding
+        units = []
+        for path in self.paths:
+            if isPackage(path):
+                manifest = loadManifest(path)
+                if manifest.get("async", False) != self.asyncMethods:
+                    raise NomosError("The package %r is built %s the async test methods of the asyncio engine, "
+                                     "rebuild it" % (path, "with" if manifest.get("async") else "without"))
+                for i, test in enumerate(manifest["tests"]):
+                    source = test["source"]
+                    size = os.path.getsize(source) if os.path.isfile(source) else 0
+                    # the packages built before the keys have the unique module names
+                    key = test.get("key") or test["module"]
+                    units.append((key, size, ("package", key, path, i)))
+        for testFile in testFiles:
+            filepath = os.path.join(testFile[0], testFile[1])
+            units.append((self.testFileKey(testFile[0], testFile[1]), os.path.getsize(filepath), testFile))
+        if self.shard:
+            units = shardUnits(units, self.shard[0], self.shard[1],
+                               loadDurations(self.durations) if self.durations else None)
+
+        #: the test case class tasks, a test case class of a built package or the compiled dsl file
+        tasks = [unit[2] for unit in units]
+        testFiles = [task for task in tasks if task[0] != "package"]
+        compiled = iter(self.compileTestcases([(path, filename) for path, filename, minixFiles in testFiles]))
+        for i, (key, size, task) in enumerate(units):
+            if task[0] != "package":
+                code, class_name = next(compiled)
+                tasks[i] = ("code", key, code, class_name, tuple(task[2]))
+
+        if self.cassettePath and self.cassetteMode == "record":
+            # the sessions of the run and of the process workers append to the cassette
+            open(self.cassettePath, "w").close()
+
+        if self.workers > 1 and len(tasks) > 1 and self.parallel == "process":
+            # the code objects can not be pickled
+            bigSuite = ProcessSuite(self, [task[:2] + (marshal.dumps(task[2]),) + task[3:]
+                                           if task[0] == "code" else task for task in tasks], self.workers)
+        else:
+            loader = WebTestLoader()
+            self.connections = None
+            self.pool = None
+            self.cassette = None
+            suitesList = [self.taskSuite(task, loader) for task in tasks]
+            bigSuite = unittest.TestSuite(suitesList)
+            if self.asyncMethods:
+                # python 3 only
+                from .asyncsuite import AsyncSuite
+                bigSuite = AsyncSuite(suitesList, self.workers, self.connections)
+            elif self.workers > 1 and len(suitesList) > 1:
+                bigSuite = ThreadedSuite(suitesList, self.workers)
+
+        verbosity = 2 if self.debug else 0
+        runner = unittest.TextTestRunner(verbosity=verbosity, resultclass=TextResult)
+        start = time.time()
+        try:
+            results = runner.run(bigSuite)
+        finally:
+            self.closePools()
+        if self.report:
+            dumpReport(self.report, makeReport(results, time.time() - start, self.shard))
+        return results
+
+    def closePools(self):
+        """Closes the connection pools and the cassette of the run, the debug mode reports the
+        connections reused, the pools of the process workers are closed with the workers
+        """
+        if self.cassette is not None:
+            self.cassette.close()
+            self.cassette = None
+        for pool in (self.pool, self.connections):
+            if pool is None:
+                continue
+            pool.close()
+            if self.debug and pool.opened:
+                sys.stderr.write("http connections: %d opened, %d reused\n" % (pool.opened, pool.reused))
+        self.pool = self.connections = None
+
+    def taskSuite(self, task, loader):
+        """Returns the timed suite of the test case class of the task"""
+        return TimedSuite(task[1], loader.loadTestsFromTestCase(self.taskTestClass(task)))
+
+    def taskTestClass(self, task):
+        """Returns the test case class of the task of :meth:`run`
+
+        The test case class of the dsl file is executed in the default name space,
+        the built packages import the test case modules once and the sessions of
+        the modules are set from the default name space.
+        """
+        if task[0] == "package":
+            path, index = task[2:]
+            package = self.packages.get(path)
+            if package is None:
+                package = self.packages[path] = loadPackage(path)
+            module, testClass, minixs = package[index]
+            ns = self.defaultNamespace()
+            module._session = ns['_session']
+            module._params = ns['_params']
+            return self.extendMinixs(testClass, self.minixs + minixs)
+
+        code, class_name, minixFiles = task[2:]
+        if not isinstance(code, types.CodeType):
+            code = marshal.loads(code)
+        testClass = self.execTestcase(code, class_name)
+        minixs = self.minixClasses.get(minixFiles)
+        if minixs is None:
+            minixs = self.minixClasses[minixFiles] = self.minixs + self.getMinixClasses(None, minixFiles)
+        return self.extendMinixs(testClass, minixs)
+
+    def buildPackage(self, out):
+        """Compiles the dsl files of the paths to the python package, see :mod:`nomos.package`
+
+        :param out: the package directory
+        :type out: str
+        :returns: the package manifest
+        :rtype: dict
+        """
+        testFiles = self.walkTestFiles()
+        return buildPackage(out, testFiles, self.minixSources, self.tokenizer, self.asyncMethods,
+                            [self.testFileKey(path, filename) for path, filename, minixFiles in testFiles])
+
+    def testFileKey(self, path, filename):
+        """Returns the shard key of the dsl file relative to the first path it is found under,
+        see :func:`nomos.shard.testKey`
+        """
+        filepath = os.path.join(path, filename)
+        for root in self.paths:
+            if not os.path.isdir(root):
+                if os.path.normpath(root) == os.path.normpath(filepath):
+                    return testKey(filepath, os.path.dirname(root) or os.curdir)
+                continue
+            relpath = os.path.relpath(filepath, root)
+            if relpath != os.pardir and not relpath.startswith(os.pardir + os.sep):
+                return testKey(filepath, root)
+        return testKey(filepath, path)
+
+    def walkTestFiles(self):
+        """Returns the (directory, file name, minix file paths) of the dsl files of the paths in the walk order,
+        the minix files are the python files next to the dsl file, the built packages are skipped
+        """
+        testFiles = []
         for path in self.paths:
             # walk the directory or file list.
             if os.path.isdir(path):
                 for root, dirs, files in os.walk(path):
-                    minixs = self.getMinixClasses(path, files)
+                    if isPackage(root):
+                        dirs[:] = []
+                        continue
+                    minixFiles = [os.path.join(root, f) for f in files if f.endswith(".py")]
                     for f in files:
-                        testClass = self.genTestClassFromFile(path, f)
-                        if testClass:
-                            # extends minix classess
-                            if minixs or self.minixs:
-                                classes = self.minixs + minixs + self.getClassBases(testClass)
-                                testClass = type(testClass.__name__, tuple(classes), dict(testClass.__dict__))
-                            testClassesToRun.append(testClass)
+                        if self.isTestcaseFile(f):
+                            testFiles.append((root, f, minixFiles))
             else:
                 path, filename = os.path.split(path)
-                testClass = self.genTestClassFromFile(path, filename)
-                if testClass:
-                    if self.minixs:
-                        classes = self.minixs + self.getClassBases(testClass)
-
-                        testClass = type(testClass.__name__, tuple(classes), dict(testClass.__dict__))
-                    testClassesToRun.append(testClass)
-
-        loader = unittest.TestLoader()
+                if self.isTestcaseFile(filename):
+                    testFiles.append((path, filename, []))
+        return testFiles
 
-        suitesList = []
-        for testClass in testClassesToRun:
-            suite = loader.loadTestsFromTestCase(testClass)
-            suitesList.append(suite)
-
-        bigSuite = unittest.TestSuite(suitesList)
-        verbosity = 2 if self.debug else 0
-        runner = unittest.TextTestRunner(verbosity=verbosity)
-        results = runner.run(bigSuite)
-        return results
+    def extendMinixs(self, testClass, minixs):
+        """Returns the test case class extending the minix classes"""
+        if minixs:
+            classes = minixs + self.getClassBases(testClass)
+            testClass = type(testClass.__name__, tuple(classes), dict(testClass.__dict__))
+        return testClass
 
     def getClassBases(self, klass):
         """Getting the base classes excluding the type<object>"""
@@ -147,24 +399,119 @@ class NomosRunner(object):
                     minixs.append(getattr(mod, name))
         return minixs
 
+    def isTestcaseFile(self, filename):
+        """Check the file is a nomos dsl file"""
+        return filename.endswith(".ns") and filename.split('.', 1)[1] == 'ns'
+
     def genTestClassFromFile(self, path, filename):
         """Generate test case class from file resource"""
-        if not filename.endswith(".ns"):
-            return
+        if self.isTestcaseFile(filename):
+            code, class_name = self.compileTestcase(path, filename)
+            return self.execTestcase(code, class_name)
 
-        name, ext = filename.split('.', 1)
-        if ext == 'ns':
-            code, class_name = self.genTestcase(path, filename)
-            ns = self.defaultNamespace()
+    def execTestcase(self, code, class_name):
+        """Returns the test case class of the compiled code in the default name space"""
+        ns = self.defaultNamespace()
+        exec(code, ns)
+        return ns[class_name]
+
+    def compileTestcases(self, files):
+        """Returns the compiled test case code objects and class names of the dsl files in order
+
+        With more than one build worker the files not cached and not built before
+        are built in a process pool, the first error in the file order is raised.
+
+        :param files: the dsl file directory and file name list
+        :type files: list[tuple]
+        :rtype: list[tuple]
+        """
+        results = [None] * len(files)
+        errors = [None] * len(files)
+        #: the cache keys by the index of the files to build in the pool
+        pending = {}
+        if self.buildWorkers > 1:
+            for i, (path, filename) in enumerate(files):
+                filepath = os.path.join(path, filename)
+                if filepath not in self.builders:
+                    key, results[i] = self.loadTestcase(filepath)
+                    if results[i] is None:
+                        pending[i] = key
+
+        # starting the pool costs more than building one file
+        if len(pending) < 2:
+            pending = {}
+
+        pool = None
+        if pending:
+            indexes = sorted(pending)
+            pool = multiprocessing.Pool(min(self.buildWorkers, len(indexes)))
+            built = pool.map_async(buildWorker, [files[i] + (self.tokenizer, self.codegen, self.asyncMethods)
+                                                  for i in indexes])
+
+        try:
+            # builds the rest in this process while the pool is working
+            for i, (path, filename) in enumerate(files):
+                if results[i] is None and i not in pending:
+                    try:
+                        results[i] = self.compileTestcase(path, filename)
+                    except Exception as e:
+                        if pool is None:
+                            raise
+                        errors[i] = e
+
+            if pool:
+                for i, (error, data, class_name) in zip(indexes, built.get()):
+                    if error is not None:
+                        errors[i] = error
+                        continue
+                    results[i] = marshal.loads(data), class_name
+                    self.dumpTestcase(os.path.join(*files[i]), pending[i], results[i][0], class_name)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
+        for error in errors:
+            if error is not None:
+                raise error
+        return results
+
+    def compileTestcase(self, path, filename):
+        """Returns the compiled test case code object and class name
+
+        Loads from the cache if the dsl file is not changed.
+        """
+        filepath = os.path.join(path, filename)
+        key, cached = self.loadTestcase(filepath)
+        if cached:
+            return cached
+
+        code, class_name = self.genTestcase(path, filename)
+        code = compileCode(code, path, filename)
+        self.dumpTestcase(filepath, key, code, class_name)
+        return code, class_name
+
+    def loadTestcase(self, filepath):
+        """Returns the cache key and the cached code object and class name, None if not cached"""
+        if self.cache is None:
+            return None, None
+        key = self.cache.key(resource(filepath), self.codegen + (" async" if self.asyncMethods else ""))
+        return key, self.cache.load(filepath, key)
+
+    def dumpTestcase(self, filepath, key, code, class_name):
+        """Stores the compiled test case in the cache"""
+        if self.cache is not None:
+            self.cache.dump(filepath, key, code, class_name)
 
-            code = compile(code, filename, 'exec')
-            exec(code, ns)
-            return ns[class_name]
+    def genTestcaseSource(self, path, filename):
+        """Returns the generated python code of the dsl file"""
+        return NomosBuilder(path, filename, self.tokenizer, "text", self.asyncMethods).build()[0]
 
     def genTestcase(self, path, filename):
         """Generate test case class  code"""
-        dslParser = DslParser(path, filename)
-        node = dslParser.buildNomos()
-        compiler = NomasComplirer()
-        compiler.complie(node)
-        return compiler.code, node.name
+        filepath = os.path.join(path, filename)
+        builder = self.builders.get(filepath)
+        if builder is None:
+            builder = self.builders[filepath] = NomosBuilder(path, filename, self.tokenizer, self.codegen,
+                                                             self.asyncMethods)
+        return builder.build()[:2]
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Test case class sharding and the run reports
+
+``--shard i/N`` runs the i-th of N shards of the test case classes, every
+node computes the same partition from the same inputs: the classes are
+assigned longest first to the least loaded shard, the weight of a class is
+its duration in the ``--durations`` report of a previous run, or its dsl
+file size scaled by the seconds per byte of the classes with a duration.
+
+The report of a run is a json file with the outcomes and the class
+durations, :func:`mergeReports` merges the reports of the shards.
+"""
+
+import json
+import os.path
+import sys
+
+from .errors import NomosError
+
+
+#: the report format version
+REPORT_VERSION = 1
+
+#: the report outcome lists
+OUTCOMES = ("failures", "errors", "skipped", "expectedFailures", "unexpectedSuccesses")
+
+#: the unittest report names of the outcomes of the errors
+ERROR_FLAVOURS = (("errors", "ERROR"), ("failures", "FAIL"), ("unexpectedSuccesses", "UNEXPECTED SUCCESS"))
+
+
+def parseShard(text):
+    """Returns the (index, count) of the ``i/N`` shard text, the index is 1 based
+
+    :raises NomosError: if the text is not a shard of 1 to N
+    """
+    try:
+        index, count = [int(_) for _ in text.split("/")]
+    except ValueError:
+        raise NomosError("The shard %r is not like i/N" % text)
+    if not 1 <= index <= count:
+        raise NomosError("The shard %r is not between 1/%d and %d/%d" % (text, count, count, count))
+    return index, count
+
+
+def testKey(filepath, root):
+    """Returns the key of the test case class of the dsl file, the path relative to the ``--path``
+    directory it is found under with the slashes, the same in every working directory
+    """
+    return os.path.normpath(os.path.relpath(filepath, root)).replace(os.sep, "/")
+
+
+def shardUnits(units, index, count, durations=None):
+    """Returns the units of the shard in the units order
+
+    :param units: the (key, file size, ...) test case class units
+    :type units: list[tuple]
+    :param index: the 1 based shard index
+    :type index: int
+    :param count: the number of the shards
+    :type count: int
+    :param durations: (optional) the seconds by the key of the previous runs
+    :type durations: dict
+    :rtype: list[tuple]
+    """
+    durations = durations or {}
+    known = [(durations[unit[0]], unit[1]) for unit in units if unit[0] in durations]
+    seconds = sum(_[0] for _ in known)
+    size = sum(_[1] for _ in known)
+    # the seconds of a byte of the classes ran before, the sizes are the weights without them
+    scale = seconds / size if seconds and size else (0 if known else 1)
+
+    def weight(unit):
+        if unit[0] in durations:
+            return durations[unit[0]]
+        return unit[1] * scale if scale else 1.0
+
+    loads = [0.0] * count
+    shards = {}
+    for i in sorted(range(len(units)), key=lambda i: (-weight(units[i]), units[i][0], i)):
+        shard = loads.index(min(loads))
+        loads[shard] += weight(units[i])
+        shards[i] = shard
+    return [unit for i, unit in enumerate(units) if shards[i] == index - 1]
+
+
+def loadReport(path):
+    """Returns the report of the json file"""
+    with open(path) as f:
+        report = json.load(f)
+    if report.get("version") != REPORT_VERSION:
+        raise NomosError("The report %r is written by another nomos version" % path)
+    return report
+
+
+def loadDurations(path):
+    """Returns the class durations of the report file"""
+    return loadReport(path)["durations"]
+
+
+def makeReport(result, elapsed, shard=None):
+    """Returns the report of the test result
+
+    :param result: the text result of the run, see :class:`TextResult`
+    :param elapsed: the seconds of the run
+    :param shard: (optional) the (index, count) shard
+    """
+    report = {"version": REPORT_VERSION, "shard": list(shard) if shard else None,
+              "testsRun": result.testsRun, "time": elapsed, "durations": dict(result.durations)}
+    for name in OUTCOMES:
+        report[name] = [[str(test), text] for test, text in
+                        ((_ if isinstance(_, tuple) else (_, "")) for _ in getattr(result, name, []))]
+    return report
+
+
+def dumpReport(path, report):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def mergeReports(reports):
+    """Returns the report of the reports of the shards, the time is the longest shard time"""
+    merged = {"version": REPORT_VERSION, "shard": None, "testsRun": 0, "time": 0.0, "durations": {}}
+    for name in OUTCOMES:
+        merged[name] = []
+    for report in reports:
+        merged["testsRun"] += report["testsRun"]
+        merged["time"] = max(merged["time"], report["time"])
+        merged["durations"].update(report["durations"])
+        for name in OUTCOMES:
+            merged[name].extend(report[name])
+    return merged
+
+
+def printReport(report, stream):
+    """Prints the errors and the summary of the report like the unittest text runner"""
+    for name, flavour in ERROR_FLAVOURS:
+        for test, text in report[name]:
+            stream.write("=" * 70 + "\n")
+            stream.write("%s: %s\n" % (flavour, test))
+            stream.write("-" * 70 + "\n")
+            stream.write("%s\n" % text)
+    stream.write("-" * 70 + "\n")
+    run = report["testsRun"]
+    stream.write("Ran %d test%s in %.3fs\n\n" % (run, run != 1 and "s" or "", report["time"]))
+
+    infos = ["%s=%d" % (key, len(report[name])) for key, name in
+             (("failures", "failures"), ("errors", "errors"), ("skipped", "skipped"),
+              ("expected failures", "expectedFailures"), ("unexpected successes", "unexpectedSuccesses"))
+             if report[name]]
+    successful = isSuccessful(report)
+    stream.write("OK" if successful else "FAILED")
+    stream.write(" (%s)\n" % ", ".join(infos) if infos else "\n")
+    return successful
+
+
+def isSuccessful(report):
+    return not (report["failures"] or report["errors"] or report["unexpectedSuccesses"])
+
+
+class ReportResult(object):
+    """The test result of a merged report"""
+
+    def __init__(self, report):
+        self.report = report
+
+    def wasSuccessful(self):
+        return isSuccessful(self.report)
+
+
+def mergeReportFiles(paths, out=None, stream=None):
+    """Prints the merged report of the report files, writes it to the out file
+
+    :param paths: the report files of the shards
+    :type paths: list
+    :param out: (optional) the merged report file, the durations of the next sharded run
+    :rtype: ReportResult
+    """
+    report = mergeReports([loadReport(path) for path in paths])
+    printReport(report, stream or sys.stderr)
+    if out:
+        dumpReport(out, report)
+    return ReportResult(report)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""The incremental content asserts of the streamed responses
+
+The ``=~``, ``<-`` and ``~~`` content asserts of a test section are checked
+against the decoded text chunks of the response as they are read, the memory
+is bounded by the chunk and the window kept between the chunks.
+
+A regex match is found if it is at most :data:`WINDOW` characters long and
+its lookarounds see at most :data:`WINDOW` characters around it, the longer
+matches of the unbounded patterns like ``a.*b`` are not found in the stream.
+"""
+
+try:
+    # python 3.11+
+    import re._parser as sre_parse
+except ImportError:
+    import sre_parse
+
+
+#: the characters of the content kept between the chunks for the regex matches
+WINDOW = 16384
+
+#: the characters kept before the searched text for the lookbehinds, ``\b`` and the ``^`` of the multi-line regex
+CONTEXT = 256
+
+
+class RegexScan(object):
+    """Searches the regex in the chunks
+
+    A match is accepted once :data:`WINDOW` characters follow it or the content ends, the ``$``
+    and the lookaheads see the same text as in the whole content.
+    """
+
+    operation = '=~'
+
+    def __init__(self, pattern, window=WINDOW):
+        self.pattern = pattern
+        self.window = window
+        #: the characters the search keeps, a match not accepted yet starts in them
+        self.keep = min(sre_parse.parse(pattern.pattern, pattern.flags).getwidth()[1], window) + window
+        self.text = ''
+        #: the text before the index is the context of the search, the ``^`` does not match at the index
+        self.start = 0
+        self.found = False
+
+    def feed(self, chunk):
+        self.text += chunk
+        self.search(len(self.text) - self.window)
+        if not self.found and len(self.text) > self.keep + CONTEXT:
+            self.text = self.text[-(self.keep + CONTEXT):]
+            self.start = CONTEXT
+
+    def close(self):
+        self.search(len(self.text))
+
+    def search(self, end):
+        m = self.pattern.search(self.text, self.start)
+        if m is not None and m.end() <= end:
+            self.found = True
+
+
+class TextScan(object):
+    """Searches the text in the chunks, the last characters of a chunk are kept for a text split by the chunks"""
+
+    operation = '<-'
+
+    def __init__(self, value):
+        self.value = value
+        self.text = ''
+        self.found = False
+
+    def feed(self, chunk):
+        text = self.text + chunk
+        self.found = self.value in text
+        self.text = text[-(len(self.value) - 1):] if len(self.value) > 1 else ''
+
+    def close(self):
+        pass
+
+
+class LengthScan(object):
+    """Counts the characters of the chunks"""
+
+    operation = '~~'
+
+    def __init__(self):
+        self.length = 0
+        #: the length is known at the end of the content
+        self.found = False
+
+    def feed(self, chunk):
+        self.length += len(chunk)
+
+    def close(self):
+        pass
+
+
+def scanContent(chunks, rules):
+    """Returns the scans of the (operation, value) content rules fed by the text chunks
+
+    The chunks are read until the searches find their values, the length asserts read all of them.
+
+    :param chunks: the text chunks of the content
+    :param rules: the ``=~`` regex, ``<-`` text and ``~~`` length rules
+    :rtype: list
+    """
+    scans = []
+    for operation, value in rules:
+        if operation == '=~':
+            scans.append(RegexScan(value))
+        elif operation == '<-':
+            scans.append(TextScan(value))
+        else:
+            scans.append(LengthScan())
+    pending = list(scans)
+    try:
+        for chunk in chunks:
+            for scan in pending:
+                scan.feed(chunk)
+            pending = [_ for _ in pending if not _.found]
+            if not pending:
+                break
+        else:
+            for scan in pending:
+                scan.close()
+    finally:
+        if hasattr(chunks, 'close'):
+            # the unread content is dropped with its connection
+            chunks.close()
+    return scans
@@ -15,10 +15,13 @@
 # under the License.
 
 
-from unittest import TestCase
+from unittest import TestCase, TestLoader
+import json
 import re
 
 from . import nodes
+from .stream import scanContent
+from .util import LruCache
 
 
 class WebTestCase(TestCase):
@@ -29,6 +32,9 @@ class WebTestCase(TestCase):
 
     """
 
+    #: the failure messages tell the values and the json path of the json asserts on python 2 too
+    longMessage = True
+
     MATCH_RE = re.compile('/(.*)/([ims]+)?')
     FLAGS = {
         'i': re.I,
@@ -36,10 +42,54 @@ class WebTestCase(TestCase):
         's': re.S
     }
 
+    #: the complied regex expressions of the variable regex texts
+    REGEX_CACHE = LruCache(256)
+
+    #: the sorted names of the test methods a test method depends on, it runs after them
+    #: and it is skipped if they do not pass
+    DEPENDENCIES = {}
+
     @classmethod
     def initialize(cls):
         pass
 
+    def run(self, result=None):
+        """Runs the test, the test is skipped if a test it depends on did not pass"""
+        if result is None or not self.DEPENDENCIES:
+            return super(WebTestCase, self).run(result)
+
+        failed = self.failedDependency()
+        if failed:
+            result.startTest(self)
+            result.addSkip(self, "%s did not pass" % failed)
+            result.stopTest(self)
+            return result
+
+        problems = len(result.errors) + len(result.failures) + len(result.skipped)
+        super(WebTestCase, self).run(result)
+        if problems == len(result.errors) + len(result.failures) + len(result.skipped):
+            self.markPassed()
+        return result
+
+    def failedDependency(self):
+        """Returns the name of the first test the test depends on which did not pass, None if they pass"""
+        passed = type(self).__dict__.get('_passedTests', ())
+        for name in self.DEPENDENCIES.get(self._testMethodName, ()):
+            if name not in passed:
+                return name
+
+    def markPassed(self):
+        """Marks the test passed for the tests depending on it"""
+        cls = type(self)
+        if '_passedTests' not in cls.__dict__:
+            cls._passedTests = set()
+        cls._passedTests.add(self._testMethodName)
+
+    @classmethod
+    def encodeJson(cls, value):
+        """Returns the utf-8 json bytes of the request json value, the body ``requests`` sends"""
+        return json.dumps(value, allow_nan=False).encode('utf-8')
+
     def assertHeader(self, response, key, assetType, value):
         """Check a head line value"""
         self.assertRule(response.getHeader(key), assetType, value)
@@ -60,6 +110,24 @@ class WebTestCase(TestCase):
         """Check HTTP Response Body"""
         self.assertRule(response.content, assetType, value)
 
+    def assertContentChunks(self, response, rules):
+        """Check the ``=~``, ``<-`` and ``~~`` rules of the content by the chunks of the streamed content,
+        see :mod:`nomos.stream`, the rules of the content read at once are checked by :meth:`assertContent`
+        """
+        if not response.stream:
+            for assetType, value in rules:
+                self.assertContent(response, assetType, value)
+            return
+        rules = [(assetType, value if assetType != '=~' or hasattr(value, 'search') else
+                  self._complieRegexMatch(value)) for assetType, value in rules]
+        for scan, (assetType, value) in zip(scanContent(response.iterContent(), rules), rules):
+            if assetType == '=~':
+                self.assertTrue(scan.found, "the streamed content has no match of %r" % value.pattern)
+            elif assetType == '<-':
+                self.assertTrue(scan.found, "%r not found in the streamed content" % (value,))
+            else:
+                self.assertEqual(scan.length, value)
+
     def assertJson(self, json, jsonAssertNode):
         self.assertIsNotNone(json)
         key = jsonAssertNode.key.value
@@ -95,8 +163,8 @@ class WebTestCase(TestCase):
             self.assertIn(value, data)
 
         elif assetType == '=~':
-            # the key value regex match assert
-            bodyRe = self._complieRegexMatch(value)
+            # the key value regex match assert, the regex literal complied by the class or the regex text
+            bodyRe = value if hasattr(value, 'search') else self._complieRegexMatch(value)
             self.assertTrue(bodyRe.search(data))
 
         elif assetType == '~~':
@@ -116,17 +184,56 @@ class WebTestCase(TestCase):
             self.assertLessEqual(data, value)
 
     def _complieRegexMatch(self, value):
+        """Returns the complied regex expression of the text from the bounded cache,
+        see :meth:`complieRegex`
+        """
+        bodyRe = self.REGEX_CACHE.get(value)
+        if bodyRe is None:
+            bodyRe = self.REGEX_CACHE.put(value, self.complieRegex(value))
+        return bodyRe
+
+    @classmethod
+    def complieRegex(cls, value):
         """Comlie regex exprression from text like "/(.*)/([ims]+)?"
 
         eg::
             /ok/i, /ok/ims
         """
-        m = self.MATCH_RE.match(value)
+        m = cls.MATCH_RE.match(value)
         flag = None
         if m:
             bodyRe, flags = m.group(1), m.group(2)
             if flags:
                 for _ in flags:
-                    flag = flag | self.FLAGS[_] if flag else self.FLAGS[_]
+                    flag = flag | cls.FLAGS[_] if flag else cls.FLAGS[_]
 
         return re.compile(bodyRe, flag) if flag else re.compile(bodyRe)
+
+
+class WebTestLoader(TestLoader):
+    """The test loader ordering a test method after the test methods it depends on,
+    the independent test methods keep the name order, see :attr:`WebTestCase.DEPENDENCIES`
+    """
+
+    def getTestCaseNames(self, testCaseClass):
+        names = super(WebTestLoader, self).getTestCaseNames(testCaseClass)
+        dependencies = getattr(testCaseClass, 'DEPENDENCIES', None)
+        if not dependencies:
+            return names
+
+        loaded = set(names)
+        ordered = []
+        done = set()
+
+        def visit(name):
+            if name in done:
+                return
+            done.add(name)
+            for depend in dependencies.get(name, ()):
+                if depend in loaded:
+                    visit(depend)
+            ordered.append(name)
+
+        for name in names:
+            visit(name)
+        return ordered
@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""The http transports of the :class:`HttpSession`
+
+A transport sends a request of the session and returns the response with the
+``requests.Response`` attributes the :class:`HttpResponse` reads. The content
+of the ``stream`` requests is read when the response reads it.
+
+The ``requests`` transport sends the request through the ``requests.Session``
+with its hooks, cookie merging and environment proxies. The ``urllib3``
+transport encodes the request like ``requests``, keeps the cookies and
+follows the redirects itself and sends the requests on the ``urllib3``
+connection pools of the :class:`HttpPool`, without the proxies.
+"""
+
+import binascii
+from email.message import Message
+import json as _json
+import os.path
+
+import requests.sessions
+from requests.certs import where
+from requests.compat import bytes, chardet, cookielib, str, urlencode, urljoin, urlsplit
+from requests.exceptions import TooManyRedirects
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers, guess_json_utf
+import urllib3
+
+from .compat import UrlRequest
+
+
+#: the redirect status codes
+REDIRECTS = (301, 302, 303, 307, 308)
+
+#: the request headers removed when a redirect changes the method to GET
+BODY_HEADERS = ('content-type', 'content-length', 'transfer-encoding')
+
+#: the request headers removed when a redirect goes to another host like ``requests``
+AUTH_HEADERS = ('authorization', 'cookie')
+
+#: the maximum number of the redirects of a request like ``requests``
+MAX_REDIRECTS = 30
+
+#: the default ports of the schemes
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+class RequestsTransport(object):
+    """The transport of the ``requests`` session
+
+    :param url: the url prefix of the session
+    :param pool: (optional) the shared connection pools
+    :type pool: HttpPool
+    """
+
+    def __init__(self, url, pool=None):
+        #: request session instance
+        self.session = requests.sessions.Session()
+        if pool is not None:
+            pool.mount(self.session, url)
+
+    def request(self, method, url, params, data, headers, json, files, verify, cert, timeout, stream=False):
+        return self.session.request(method, url, params=params, data=data, headers=headers, json=json, files=files,
+                                    verify=verify, cert=cert, timeout=timeout, stream=stream)
+
+
+class Urllib3Transport(object):
+    """The transport sending the requests on the ``urllib3`` connection pools
+
+    :param url: the url prefix of the session
+    :param pool: the shared connection pools
+    :type pool: HttpPool
+    """
+
+    #: the headers of the requests like ``requests``
+    HEADERS = (
+        ('User-Agent', 'nomos'),
+        ('Accept-Encoding', 'gzip, deflate'),
+        ('Accept', '*/*'),
+        ('Connection', 'keep-alive'),
+    )
+
+    def __init__(self, url, pool):
+        self.url = url
+        self.pool = pool
+        #: the cookies of the responses sent by the next requests
+        self.cookies = cookielib.CookieJar()
+
+    def request(self, method, url, params, data, headers, json, files, verify, cert, timeout, stream=False):
+        url = encodeQuery(url, params)
+        headers = dict((k, v) for k, v in (headers or {}).items() if v is not None)
+        body, contentType = encodeBody(data, json, files)
+        if contentType and not any(k.lower() == 'content-type' for k in headers):
+            headers['Content-Type'] = contentType
+
+        manager = self.pool.manager(self.url, verify, cert)
+        for _ in range(MAX_REDIRECTS + 1):
+            res = self.send(manager, method, url, headers, body, timeout, stream)
+            request = redirect(res, method, url, headers, body)
+            if request is None:
+                return res
+            # the content of the redirect is read, its connection is released
+            res.content
+            method, url, headers, body = request
+        raise TooManyRedirects('Exceeded %s redirects.' % MAX_REDIRECTS)
+
+    def send(self, manager, method, url, headers, body, timeout, stream=False):
+        """Sends the request, returns the :class:`RawResponse`"""
+        fields = CaseInsensitiveDict(self.HEADERS)
+        fields.update(headers)
+        if not body and method in ('POST', 'PUT', 'PATCH'):
+            fields['Content-Length'] = '0'
+        # the cookie jar is not called without the cookies, a cookie request parses the url
+        cookie = None
+        if len(self.cookies):
+            cookie = UrlRequest(url)
+            self.cookies.add_cookie_header(cookie)
+            if cookie.has_header('Cookie') and 'Cookie' not in fields:
+                fields['Cookie'] = cookie.get_header('Cookie')
+
+        connectTimeout, readTimeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        r = manager.request(method, url, body=body, headers=dict(fields), redirect=False, retries=False,
+                            timeout=urllib3.Timeout(connect=connectTimeout, read=readTimeout),
+                            preload_content=not stream)
+        if stream:
+            res = RawResponse(url, r.status, r.reason, list(r.headers.items()), None, r)
+        else:
+            res = RawResponse(url, r.status, r.reason, list(r.headers.items()), r.data)
+        if 'set-cookie' in res.headers or 'set-cookie2' in res.headers:
+            self.cookies.extract_cookies(res, cookie or UrlRequest(url))
+        return res
+
+
+#: the transports by the ``--http.backend`` name
+TRANSPORTS = {
+    "requests": RequestsTransport,
+    "urllib3": Urllib3Transport,
+}
+
+
+def managerOptions(verify, cert):
+    """Returns the ``urllib3`` pool options of the verify and the cert session options like ``requests``"""
+    options = {}
+    if verify:
+        options["cert_reqs"] = "CERT_REQUIRED"
+        options["ca_certs"] = verify if isinstance(verify, str) else where()
+    else:
+        options["cert_reqs"] = "CERT_NONE"
+    if cert:
+        options["cert_file"], options["key_file"] = cert if isinstance(cert, tuple) else (cert, None)
+    return options
+
+
+class RawResponse(object):
+    """The response of the raw http transports, it has the ``requests.Response`` attributes the
+    :class:`HttpResponse` reads
+
+    It is the response of the ``CookieJar`` too.
+
+    :param raw: (optional) the ``urllib3`` response of the content not read yet
+    """
+
+    def __init__(self, url, status, reason, fields, content, raw=None):
+        self.url = url
+        self.status_code = status
+        self.reason = reason
+        self.fields = fields
+        self.headers = CaseInsensitiveDict()
+        for k, v in fields:
+            self.headers[k] = self.headers[k] + ', ' + v if k in self.headers else v
+        self._content = content
+        self.raw = raw
+
+    @property
+    def content(self):
+        """The content bytes, the streamed content is read at once"""
+        if self._content is None and self.raw is not None:
+            self._content = self.raw.read()
+            self.raw.release_conn()
+            self.raw = None
+        return self._content
+
+    def iter_content(self, chunkSize):
+        """Yields the content bytes by the chunks of the size, the content is not kept"""
+        if self.raw is None:
+            if self._content:
+                yield self._content
+            return
+        raw, self.raw = self.raw, None
+        completed = False
+        try:
+            for chunk in raw.stream(chunkSize, decode_content=True):
+                yield chunk
+            completed = True
+        finally:
+            if not completed:
+                # the connection of the unread content is not reused
+                raw.close()
+            raw.release_conn()
+
+    def close(self):
+        """Drops the unread content with its connection"""
+        if self.raw is not None:
+            self.raw.close()
+            self.raw.release_conn()
+            self.raw = None
+
+    def info(self):
+        """Returns the header message of the cookie jar"""
+        message = Message()
+        for k, v in self.fields:
+            message[k] = v
+        return message
+
+    @property
+    def encoding(self):
+        """The encoding of the content type header like ``requests``, ISO-8859-1 for the text types
+        without the charset, None if it is not known
+        """
+        return get_encoding_from_headers(self.headers)
+
+    @property
+    def apparent_encoding(self):
+        """The encoding guessed from the content like ``requests``"""
+        return chardet.detect(self.content)['encoding'] if chardet is not None else 'utf-8'
+
+    @property
+    def text(self):
+        """The content decoded like ``requests``, by the encoding of the headers or the guessed one"""
+        content = self.content
+        if not content:
+            return str()
+        try:
+            return str(content, self.encoding or self.apparent_encoding, errors='replace')
+        except (LookupError, TypeError):
+            return str(content, errors='replace')
+
+    def json(self):
+        """The json of the content like ``requests``, the utf encoding of the json is detected without the charset"""
+        content = self.content
+        if not self.encoding and content and len(content) > 3:
+            encoding = guess_json_utf(content)
+            if encoding is not None:
+                try:
+                    return _json.loads(content.decode(encoding))
+                except UnicodeDecodeError:
+                    pass
+        return _json.loads(self.text)
+
+
+def redirect(res, method, url, headers, body):
+    """Returns the (method, url, headers, body) request of the redirect response like ``requests``,
+    None if it is not a redirect. The credentials are not sent to another host.
+    """
+    location = res.headers.get('location')
+    if res.status_code not in REDIRECTS or not location:
+        return None
+    oldUrl, url = url, urljoin(url, location)
+    if stripAuth(oldUrl, url):
+        headers = dict((k, v) for k, v in headers.items() if k.lower() not in AUTH_HEADERS)
+    if (res.status_code in (302, 303) and method != 'HEAD') or (res.status_code == 301 and method == 'POST'):
+        method = 'GET'
+        body = None
+        headers = dict((k, v) for k, v in headers.items() if k.lower() not in BODY_HEADERS)
+    return method, url, headers, body
+
+
+def stripAuth(oldUrl, newUrl):
+    """Returns ``True`` if the redirect from the old url to the new url changes the host,
+    the port or the scheme like ``requests``, the http to https upgrade of a host keeps the credentials
+    """
+    old, new = urlsplit(oldUrl), urlsplit(newUrl)
+    if old.hostname != new.hostname:
+        return True
+    if (old.scheme == 'http' and old.port in (80, None)
+            and new.scheme == 'https' and new.port in (443, None)):
+        return False
+    if old.scheme != new.scheme:
+        return True
+    defaultPorts = (DEFAULT_PORTS.get(old.scheme), None)
+    return old.port != new.port and not (old.port in defaultPorts and new.port in defaultPorts)
+
+
+def encodeQuery(url, params):
+    """Returns the url with the query of the params like ``requests``"""
+    if params:
+        query = urlencode([(k, v) for k, v in params.items() if v is not None], doseq=True)
+        if query:
+            url += ('&' if urlsplit(url).query else '?') + query
+    return url
+
+
+def encodeBody(data, json, files, boundary=None):
+    """Returns the request body bytes and the content type of the data, the json or the files like ``requests``"""
+    if files:
+        return encodeMultipart(data, files, boundary)
+    if data:
+        if isinstance(data, dict):
+            return (urlencode([(k, v) for k, v in data.items() if v is not None], doseq=True).encode('utf-8'),
+                    'application/x-www-form-urlencoded')
+        if hasattr(data, 'read'):
+            data = data.read()
+        return data.encode('utf-8') if isinstance(data, str) else data, None
+    if json is not None:
+        return _json.dumps(json, allow_nan=False).encode('utf-8'), 'application/json'
+    return None, None
+
+
+def encodeMultipart(data, files, boundary=None):
+    """Returns the multipart form body and the content type of the data fields and the files
+
+    A file is a file object, the content or the (file name, file object or content[, content type[, headers]])
+    tuple. The boundary is random by default.
+    """
+    boundary = boundary or binascii.hexlify(os.urandom(16)).decode('ascii')
+    parts = []
+
+    def part(disposition, content, contentType=None, headers=None):
+        head = '--%s\r\nContent-Disposition: form-data; %s\r\n' % (boundary, disposition)
+        if contentType:
+            head += 'Content-Type: %s\r\n' % contentType
+        # like urllib3 the empty values and the headers set by the part itself are skipped
+        for k, v in (headers or {}).items():
+            if v and k not in ('Content-Disposition', 'Content-Type', 'Content-Location'):
+                head += '%s: %s\r\n' % (k, v)
+        if hasattr(content, 'read'):
+            content = content.read()
+        if not isinstance(content, bytes):
+            content = str(content).encode('utf-8')
+        parts.append(head.encode('utf-8') + b'\r\n' + content + b'\r\n')
+
+    if isinstance(data, dict):
+        for name, values in data.items():
+            for value in values if isinstance(values, list) else [values]:
+                if value is not None:
+                    part('name="%s"' % name, value)
+    for name, value in files.items():
+        contentType = headers = None
+        if isinstance(value, (tuple, list)):
+            filename, content = value[:2]
+            contentType = value[2] if len(value) > 2 else None
+            headers = value[3] if len(value) > 3 else None
+        else:
+            filename, content = os.path.basename(getattr(value, 'name', None) or name), value
+        part('name="%s"; filename="%s"' % (name, filename), content, contentType, headers)
+    body = b''.join(parts) + ('--%s--\r\n' % boundary).encode('ascii')
+    return body, 'multipart/form-data; boundary=%s' % boundary
@@ -17,8 +17,10 @@
 
 import base64
 import codecs
+from collections import OrderedDict
 from .globalvar import config
 import os.path
+import threading
 
 
 def resource(filename, binary=False, encoding="utf-8", b64=False, useConfig=True):
@@ -67,3 +69,38 @@ class lazy_attr(object):
         val = self.wrapped(inst)
         setattr(inst, self.wrapped.__name__, val)
         return val
+
+
+class LruCache(object):
+    """The bounded cache dropping the least recently used item
+
+    :param maxsize: the max item count, defaults to 128
+    :type maxsize: int, optional
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Returns the cached value of the key, the value is moved to the recent end"""
+        with self.lock:
+            try:
+                value = self.items.pop(key)
+            except KeyError:
+                return default
+            self.items[key] = value
+            return value
+
+    def put(self, key, value):
+        """Caches the value of the key and returns the value"""
+        with self.lock:
+            self.items.pop(key, None)
+            self.items[key] = value
+            if len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+        return value
+
+    def __len__(self):
+        return len(self.items)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import asyncio
+import gzip
+import json
+import threading
+import unittest
+
+try:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+except ImportError:
+    ThreadingHTTPServer = None
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body=b"", headers=()):
+        self.send_response(status)
+        for k, v in headers:
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def echo(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if getattr(self, "drop", False):
+            # the kept alive connection is closed without the response
+            self.close_connection = True
+            return
+        self.drop = self.path.startswith("/drop")
+        info = json.dumps({"method": self.command, "path": self.path, "body": body.decode("latin-1"),
+                           "type": self.headers.get("Content-Type"), "cookie": self.headers.get("Cookie")})
+        if self.path.startswith("/redirect"):
+            return self.reply(302, headers=[("Location", "/get?from=redirect")])
+        if self.path.startswith("/login"):
+            return self.reply(200, b"{}", [("Set-Cookie", "token=abc; Path=/")])
+        if self.path.startswith("/gzip"):
+            return self.reply(200, gzip.compress(info.encode()), [("Content-Encoding", "gzip")])
+        if self.path.startswith("/chunked"):
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.end_headers()
+            for i in range(0, len(info), 7):
+                chunk = info[i:i + 7].encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+            return
+        self.reply(200, info.encode(), [("Content-Type", "application/json")])
+
+    do_GET = do_POST = do_PUT = do_HEAD = echo
+
+
+@unittest.skipIf(ThreadingHTTPServer is None, "the asyncio session requires python 3.7+")
+class AsyncHttpSessionTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def request(self, *calls):
+        from nomos.asynchttp import AsyncHttpSession
+
+        async def send():
+            session = AsyncHttpSession("http://127.0.0.1:%d" % self.server.server_address[1])
+            try:
+                return [await session.doRequest(*args, **kw) for args, kw in calls], session.pool
+            finally:
+                session.pool.close()
+        return asyncio.run(send())
+
+    def test_keep_alive(self):
+        responses, pool = self.request(*[(("GET", "/get"), {"params": {"page": i}}) for i in range(3)])
+        self.assertEqual([_.json["path"] for _ in responses], ["/get?page=0", "/get?page=1", "/get?page=2"])
+        self.assertEqual((pool.opened, pool.reused), (1, 2))
+
+    def test_bodies(self):
+        responses, pool = self.request(
+            (("POST", "/post"), {"data": {"a": "1 2", "b": None}}),
+            (("POST", "/post"), {"json": {"a": [1]}}),
+            (("PUT", "/put"), {"data": b"raw", "headers": {"Content-Type": "text/plain"}}),
+            (("POST", "/post"), {"data": {"a": 1}, "files": {"f": ("a.txt", b"hello")}}))
+        self.assertEqual([(_.json["body"], _.json["type"]) for _ in responses[:3]],
+                         [("a=1+2", "application/x-www-form-urlencoded"), ('{"a": [1]}', "application/json"),
+                          ("raw", "text/plain")])
+        self.assertTrue(responses[3].json["type"].startswith("multipart/form-data; boundary="))
+        self.assertIn('name="f"; filename="a.txt"\r\n\r\nhello\r\n', responses[3].json["body"])
+
+    def test_large_body(self):
+        # the body is written with the flow control of the connection
+        body = b"x" * (8 << 20)
+        responses, pool = self.request((("PUT", "/put"), {"data": body}), (("GET", "/get"), {}))
+        self.assertEqual(len(responses[0].json["body"]), len(body))
+        self.assertEqual((pool.opened, pool.reused), (1, 1))
+
+    def test_retry(self):
+        # only the idempotent requests are sent again when the kept alive connection is closed
+        responses, pool = self.request((("GET", "/drop"), {}), (("PUT", "/put"), {"data": b"raw"}))
+        self.assertEqual(responses[1].json["body"], "raw")
+        self.assertEqual((pool.opened, pool.reused), (2, 1))
+        with self.assertRaises(ConnectionError):
+            self.request((("GET", "/drop"), {}), (("POST", "/post"), {"data": b"raw"}))
+
+    def test_redirect_and_cookies(self):
+        responses, pool = self.request((("POST", "/redirect"), {"json": {"a": 1}}),
+                                       (("GET", "/login"), {}),
+                                       (("GET", "/get"), {}))
+        self.assertEqual([responses[0].status, responses[0].json["method"], responses[0].json["body"]],
+                         [200, "GET", ""])
+        self.assertEqual(responses[2].json["cookie"], "token=abc")
+
+    def test_encodings(self):
+        responses, pool = self.request((("GET", "/gzip"), {}), (("GET", "/chunked"), {}), (("HEAD", "/get"), {}))
+        self.assertEqual([_.json["path"] for _ in responses[:2]], ["/gzip", "/chunked"])
+        self.assertEqual((responses[1].contentType, responses[1].charset), ("application/json", "utf-8"))
+        self.assertEqual((responses[2].status, responses[2].content), (200, ""))
+        self.assertEqual(pool.opened, 1)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import ast
+import os.path
+import shutil
+import tempfile
+import unittest
+
+from nomos.builder import NomosBuilder
+from nomos.compiler import AST_BACKEND
+from nomos.errors import ParserException
+from nomos.runner import NomosRunner
+
+
+SUITE = """[initialize]
+$page = 10
+
+[get]
+>> GET /get page=$page
+code : 200
+
+[post]
+>> POST /post
+json << { a: 1 }
+code : 200
+"""
+
+
+class NomosBuilderTest(unittest.TestCase):
+
+    #: the complier backend of the builds
+    backend = "text"
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.write(SUITE)
+        self.builder = NomosBuilder(self.path, "suite.ns", backend=self.backend)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def write(self, text):
+        with open(os.path.join(self.path, "suite.ns"), "w") as f:
+            f.write(text)
+
+    def fullBuild(self, backend=None):
+        return self.dump(NomosBuilder(self.path, "suite.ns", backend=backend or self.backend).build()[0])
+
+    def dump(self, code):
+        if isinstance(code, ast.AST):
+            return ast.dump(code, include_attributes=True)
+        return code
+
+    def test_first_build(self):
+        code, className, changed = self.builder.build()
+        self.assertEqual(className, "SuiteTest")
+        self.assertEqual(changed, set(["initialize", "test_get", "test_post"]))
+
+    def test_changed_section(self):
+        self.builder.build()
+        get, post = self.builder.root.methods[1:]
+        self.write(SUITE.replace("{ a: 1 }", "{ a: 2 }"))
+        code, className, changed = self.builder.build()
+        self.assertEqual(changed, set(["test_post"]))
+        self.assertIs(self.builder.root.methods[1], get)
+        self.assertIsNot(self.builder.root.methods[2], post)
+        self.assertEqual(self.dump(code), self.fullBuild())
+
+    def test_unchanged_behavior(self):
+        self.builder.build()
+        self.write(SUITE.replace("code : 200\n", "code : 200 # ok\n", 1))
+        code, className, changed = self.builder.build()
+        self.assertEqual(changed, set())
+        self.assertEqual(self.dump(code), self.fullBuild())
+
+    def test_added_and_removed_sections(self):
+        self.builder.build()
+        self.write(SUITE.replace("[get]", "[put]\n>> PUT /put\n\n[get2]"))
+        code, className, changed = self.builder.build()
+        self.assertEqual(changed, set(["test_put", "test_get", "test_get2"]))
+        self.assertEqual(self.dump(code), self.fullBuild())
+
+    def test_imports_changed(self):
+        self.builder.build()
+        self.write("<%\nimport os\n%>\n" + SUITE)
+        code, className, changed = self.builder.build()
+        self.assertEqual(changed, set(["initialize", "test_get", "test_post"]))
+        self.assertEqual(self.dump(code), self.fullBuild())
+
+    def test_section_swallowed(self):
+        self.builder = NomosBuilder(self.path, "suite.ns", backend="text")
+        self.builder.build()
+        self.write(SUITE.replace("code : 200\n", 'content: """\n', 1) + '"""\n')
+        code, className, changed = self.builder.build()
+        self.assertEqual(changed, set(["test_get", "test_post"]))
+        self.assertEqual(code, self.fullBuild("text"))
+
+    def test_failed_build(self):
+        self.builder.build()
+        self.write(SUITE.replace("{ a: 1 }", "{ a: [1 }"))
+        self.assertRaises(Exception, self.builder.build)
+        self.write(SUITE.replace("{ a: 1 }", "{ a: 3 }"))
+        self.assertEqual(self.builder.build()[2], set(["test_post"]))
+
+
+@unittest.skipIf(not AST_BACKEND, "the ast backend requires python 3.8+")
+class AstNomosBuilderTest(NomosBuilderTest):
+
+    backend = "ast"
+
+
+class BuildWorkersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.files = []
+        for i in range(4):
+            self.write("suite%d.ns" % i, SUITE.replace("[get]", "[get %d]" % i))
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def write(self, filename, text):
+        with open(os.path.join(self.path, filename), "w") as f:
+            f.write(text)
+        self.files.append((self.path, filename))
+
+    def compile(self, buildWorkers):
+        runner = NomosRunner("http://localhost", [self.path], cache=False, buildWorkers=buildWorkers)
+        return runner.compileTestcases(self.files)
+
+    def test_file_order(self):
+        compiled = self.compile(3)
+        self.assertEqual([name for code, name in compiled], ["Suite0Test", "Suite1Test", "Suite2Test", "Suite3Test"])
+        self.assertEqual(compiled, self.compile(1))
+
+    def test_first_error(self):
+        self.write("bad1.ns", "[bad]\ncode : ^\n")
+        self.write("bad2.ns", "code : 200\n")
+        with self.assertRaises(ParserException) as cm:
+            self.compile(3)
+        self.assertIn("line 2, column 8", str(cm.exception))
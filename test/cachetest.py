@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os.path
+import shutil
+import tempfile
+import unittest
+
+from nomos.cache import CompileCache
+from nomos.runner import NomosRunner
+
+
+SUITE = """[initialize]
+$page = 10
+
+[get]
+>> GET /get page=$page
+code : 200
+"""
+
+
+class CompileCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.write(SUITE)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def write(self, text):
+        with open(os.path.join(self.path, "suite.ns"), "w") as f:
+            f.write(text)
+
+    def countingRunner(self, **kw):
+        runner = NomosRunner("http://localhost", [self.path], **kw)
+        runner.generated = 0
+        genTestcase = runner.genTestcase
+
+        def counting(path, filename):
+            runner.generated += 1
+            return genTestcase(path, filename)
+        runner.genTestcase = counting
+        return runner
+
+    def test_cache_hit(self):
+        runner = self.countingRunner()
+        testClass = runner.genTestClassFromFile(self.path, "suite.ns")
+        self.assertEqual(runner.generated, 1)
+        self.assertTrue(os.path.exists(CompileCache().cachePath(os.path.join(self.path, "suite.ns"))))
+
+        runner = self.countingRunner()
+        cachedClass = runner.genTestClassFromFile(self.path, "suite.ns")
+        self.assertEqual(runner.generated, 0)
+        self.assertEqual(cachedClass.__name__, testClass.__name__)
+        self.assertTrue(hasattr(cachedClass, "test_get"))
+
+    def test_cache_miss_on_change(self):
+        self.countingRunner().genTestClassFromFile(self.path, "suite.ns")
+        self.write(SUITE + "\n[post]\n>> POST /post\ncode : 200\n")
+        runner = self.countingRunner()
+        testClass = runner.genTestClassFromFile(self.path, "suite.ns")
+        self.assertEqual(runner.generated, 1)
+        self.assertTrue(hasattr(testClass, "test_post"))
+
+    def test_cache_dir(self):
+        cacheDir = os.path.join(self.path, "cache")
+        runner = self.countingRunner(cacheDir=cacheDir)
+        runner.genTestClassFromFile(self.path, "suite.ns")
+        self.assertEqual(len(os.listdir(cacheDir)), 1)
+        self.assertFalse(os.path.exists(os.path.join(self.path, CompileCache.CACHE_DIR)))
+
+    def test_no_cache(self):
+        for _ in range(2):
+            runner = self.countingRunner(cache=False)
+            runner.genTestClassFromFile(self.path, "suite.ns")
+            self.assertEqual(runner.generated, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.path, CompileCache.CACHE_DIR)))
+
+    def test_key(self):
+        cache = CompileCache()
+        self.assertEqual(cache.key(SUITE), cache.key(SUITE))
+        self.assertNotEqual(cache.key(SUITE), cache.key(SUITE + " "))
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import io
+import json
+import os.path
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+from nomos.cassette import Cassette, requestKey
+from nomos.errors import CassetteError
+from nomos.http import HttpSession
+from nomos.runner import NomosRunner
+
+try:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+except ImportError:
+    ThreadingHTTPServer = None
+
+
+SUITE = """[count]
+>> GET /count
+code : 200
+
+[post]
+>> POST /post page=2
+json << { name: "nomos", size: 12 }
+code : 200
+"""
+
+
+if ThreadingHTTPServer is not None:
+
+    class CountHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+        count = 0
+
+        def log_message(self, *args):
+            pass
+
+        def reply(self):
+            type(self).count += 1
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if self.path == "/binary":
+                content, contentType = b"\xff\x00" * 4, "application/octet-stream"
+            else:
+                content = json.dumps({"path": self.path, "count": self.count, "body": body.decode()}).encode()
+                contentType = "application/json"
+            self.send_response(200)
+            self.send_header("Content-Type", contentType)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        do_GET = do_POST = reply
+
+
+class RequestKeyTest(unittest.TestCase):
+
+    def test_normalized(self):
+        self.assertEqual(requestKey("get", "http://a/get?b=2", {"a": [1, "x y"], "c": None}, None, None, None),
+                         requestKey("GET", "http://b/get", {"b": 2, "a": [1, "x y"]}, None, None, None))
+        self.assertEqual(requestKey("GET", "http://a", None, None, None, None), "GET /")
+        self.assertEqual(requestKey("POST", "http://a/p", None, None, {"a": 1, "b": [2]}, None),
+                         requestKey("POST", "http://a/p", None, None, {"b": [2], "a": 1}, None))
+        self.assertNotEqual(requestKey("POST", "http://a/p", None, None, {"a": 1}, None),
+                            requestKey("POST", "http://a/p", None, None, {"a": 2}, None))
+        files = {"file": ("report.xls", "data", "application/txt")}
+        self.assertEqual(requestKey("POST", "http://a/p", None, {"f": 1}, None, files),
+                         requestKey("POST", "http://a/p", None, {"f": 1}, None, dict(files)))
+
+
+@unittest.skipIf(ThreadingHTTPServer is None, "the local server requires python 3.7+")
+class CassetteTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), CountHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever).start()
+        cls.url = "http://127.0.0.1:%d" % cls.server.server_address[1]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cassette = os.path.join(self.path, "cassette.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def requests(self, session):
+        calls = [
+            (("GET", "/count"), {}),
+            (("GET", "/count"), {}),
+            (("POST", "/post"), {"params": {"page": 2}, "json": {"name": "nomos"}}),
+            (("GET", "/binary"), {}),
+        ]
+        return [(res.status, res.contentType, res.json if res.contentType == "application/json" else res.res.content)
+                for res in (session.doRequest(*args, **kw) for args, kw in calls)]
+
+    def test_record_replay(self):
+        cassette = Cassette(self.cassette, "record")
+        recorded = self.requests(HttpSession(self.url, cassette=cassette, backend="urllib3"))
+        cassette.close()
+        self.assertNotEqual(recorded[0][2]["count"], recorded[1][2]["count"])
+
+        # the host is not used, the repeated requests get the recorded responses in order
+        cassette = Cassette(self.cassette)
+        session = HttpSession("http://127.0.0.1:1", cassette=cassette)
+        self.assertEqual(self.requests(session), recorded)
+        self.assertEqual(session.doRequest("GET", "/count").json, recorded[1][2])
+        self.assertRaises(CassetteError, session.doRequest, "GET", "/missing")
+        self.assertRaises(CassetteError, session.doRequest, "POST", "/post", params={"page": 3},
+                          json={"name": "nomos"})
+        cassette.close()
+
+        self.assertRaises(CassetteError, Cassette(os.path.join(self.path, "none")).replay, "GET /")
+
+    def test_runner(self):
+        suite = os.path.join(self.path, "suite")
+        os.mkdir(suite)
+        for name in ("a.ns", "b.ns"):
+            with open(os.path.join(suite, name), "w") as f:
+                f.write(SUITE)
+
+        stderr = sys.stderr
+        sys.stderr = io.StringIO() if str is not bytes else io.BytesIO()
+        try:
+            recorded = NomosRunner(self.url, [suite], cache=False, workers=2, parallel="process",
+                                   cassette=self.cassette, cassetteMode="record").run()
+            with open(self.cassette) as f:
+                self.assertEqual(len(f.readlines()), 4)
+            replayed = NomosRunner("http://127.0.0.1:1", [suite], cache=False, workers=2,
+                                   cassette=self.cassette).run()
+        finally:
+            sys.stderr = stderr
+        self.assertEqual((recorded.testsRun, replayed.testsRun), (4, 4))
+        self.assertTrue(recorded.wasSuccessful())
+        self.assertTrue(replayed.wasSuccessful())
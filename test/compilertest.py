@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import ast
+import asyncio
+import os.path
+import re
+import shutil
+import sys
+import tempfile
+import traceback
+import unittest
+
+from nomos import nodes
+from nomos.builder import NomosBuilder, compileCode
+from nomos.compiler import AST_BACKEND
+from nomos.errors import NomosError
+from nomos.runner import NomosRunner
+from nomos.testcase import WebTestCase
+
+
+SUITE = """<%
+import os
+%>
+[initialize]
+$page = 10
+$name = "nomos"
+
+[get]
+>> GET /get page=$page q="a b" n=null t=true f=-1.5 g=@os.sep e=@{os.path.join("a", "b")}
+head << { x_id: "1" }
+json << { a: [1, "s", $page, { b: null }] }
+content =~ /nomos/i
+code : 200
+head { content_length: 10 }
+json { a: 1, b: [1, { c: !len }], d != 0 }
+"""
+
+
+class Response(object):
+    status = 200
+    content = "other"
+
+
+class JsonResponse(object):
+    json = {"a": 1, "b": [1, {"c": 10}], "d": {"e": 2}, "x": 10}
+
+
+class RegexResponse(object):
+    content = "Nomos"
+    json = {"a": "nomos", "b": "Nomos"}
+
+
+class Session(object):
+
+    def __init__(self, response=Response):
+        self.response = response
+
+    def doRequest(self, *args, **kw):
+        return self.response()
+
+
+class AsyncSession(Session):
+
+    async def doRequest(self, *args, **kw):
+        return self.response()
+
+
+class RecordingSession(Session):
+
+    def __init__(self):
+        super(RecordingSession, self).__init__()
+        self.requests = []
+
+    def doRequest(self, *args, **kw):
+        self.requests.append(kw)
+        return super(RecordingSession, self).doRequest(*args, **kw)
+
+
+def loadTestcase(code, path, filename, className, session=None):
+    """Returns the test case class of the code built from the dsl file"""
+    ns = {"WebTestCase": WebTestCase, "_n": nodes, "_session": session or Session(), "_params": {}}
+    exec(compileCode(code, path, filename), ns)
+    return ns[className]
+
+
+class NomasComplirerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        with open(os.path.join(self.path, "json.ns"), "w") as f:
+            f.write("[initialize]\n$page = 10\n\n[get]\n>> GET /get\n"
+                    "json { a: 1, b: [1, { c: $page }], d: { e: 2 }, x: $page }\n")
+        with open(os.path.join(self.path, "request.ns"), "w") as f:
+            f.write('[initialize]\n$page = 10\n\n[get]\n>> GET /get page=$page size=20 page=30 q="a"\n'
+                    'head << { x_id: "1", x_page: $page }\n')
+        with open(os.path.join(self.path, "body.ns"), "w") as f:
+            f.write('[initialize]\n$page = 10\n\n[post]\n>> POST /post\njson << { a: [1, "x", $page], b: null }\n\n'
+                    '[form]\n>> POST /form\ndata: { a: 1 }\njson << { a: 1 }\n')
+        with open(os.path.join(self.path, "depends.ns"), "w") as f:
+            f.write('[login]\n>> POST /login\n$token = @{res.status}\n\n[get]\n>> GET /get\nhead << { auth: $token }\n\n'
+                    '[delete all]\n>> DELETE /all\ndepends : [get, "login"]\n\n[other]\n>> GET /other\n')
+        with open(os.path.join(self.path, "regex.ns"), "w") as f:
+            f.write('[initialize]\n$re = "/^N/"\n\n[get]\n>> GET /get\n'
+                    'content =~ /nomos/i\njson { a =~ "/^n/", b =~ $re }\ncontent =~ "/(/"\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_json_asserts(self):
+        for backend in ("text", "ast") if AST_BACKEND else ("text",):
+            code, className = NomosBuilder(self.path, "json.ns", backend=backend).build()[:2]
+            self.assertNotIn("assertJson", code if backend == "text" else ast.dump(code))
+            testClass = loadTestcase(code, self.path, "json.ns", className, Session(JsonResponse))
+            testClass.setUpClass()
+            testClass("test_get").test_get()
+            # the variables are resolved by the call, the failure tells the json path
+            testClass.page = 11
+            with self.assertRaises(AssertionError) as cm:
+                testClass("test_get").test_get()
+            self.assertIn("json.b[1].c", str(cm.exception))
+
+    def test_request_templates(self):
+        for backend in ("text", "ast") if AST_BACKEND else ("text",):
+            code, className = NomosBuilder(self.path, "request.ns", backend=backend).build()[:2]
+            session = RecordingSession()
+            testClass = loadTestcase(code, self.path, "request.ns", className, session)
+            # the variable slots keep the key order, the later literal of a variable key is set by the call
+            self.assertEqual(list(testClass._params_test_get.items()), [("page", None), ("size", 20), ("q", "a")])
+            testClass.setUpClass()
+            testClass("test_get").test_get()
+            session.requests[0]["headers"]["X-Id"] = "2"
+            testClass("test_get").test_get()
+            for kw in session.requests:
+                self.assertEqual(list(kw["params"].items()), [("page", 30), ("size", 20), ("q", "a")])
+            self.assertEqual(list(session.requests[1]["headers"].items()), [("X-Id", "1"), ("X-Page", 10)])
+
+    def test_encoded_json(self):
+        for backend in ("text", "ast") if AST_BACKEND else ("text",):
+            code, className = NomosBuilder(self.path, "body.ns", backend=backend).build()[:2]
+            session = RecordingSession()
+            testClass = loadTestcase(code, self.path, "body.ns", className, session)
+            testClass.setUpClass()
+            testClass("test_post").test_post()
+            testClass("test_post").test_post()
+            self.assertEqual(testClass._body_test_post, b'{"a": [1, "x", 10], "b": null}')
+            for kw in session.requests:
+                self.assertIs(kw["data"], testClass._body_test_post)
+                self.assertIsNone(kw["json"])
+                self.assertEqual(kw["headers"], {"Content-Type": "application/json"})
+            # requests drops the json with the data
+            testClass("test_form").test_form()
+            self.assertEqual((session.requests[-1]["data"], session.requests[-1]["json"]), ({"a": 1}, {"a": 1}))
+
+    def test_captured_json(self):
+        suite = ('[initialize]\n$page = 10\n\n[login]\n>> POST /login\n$token = @{res.status}\n\n'
+                 '[post]\n>> POST /post\njson << { a: $page, t: [$token] }\n\n'
+                 '[page]\n>> POST /page\njson << { a: $page }\n')
+        for backend in ("text", "ast") if AST_BACKEND else ("text",):
+            with open(os.path.join(self.path, "captured.ns"), "w") as f:
+                f.write(suite)
+            builder = NomosBuilder(self.path, "captured.ns", backend=backend)
+            for captured in (False, True):
+                if captured:
+                    # the initial variable captured by a test section is not encoded any more
+                    with open(os.path.join(self.path, "captured.ns"), "w") as f:
+                        f.write(suite + '\n[next]\n>> GET /next\n$page = @{res.status}\n')
+                code, className = builder.build()[:2]
+                session = RecordingSession()
+                testClass = loadTestcase(code, self.path, "captured.ns", className, session)
+                testClass.setUpClass()
+                for name in ("test_login", "test_post", "test_page"):
+                    getattr(testClass(name), name)()
+                post, page = session.requests[1:]
+                self.assertNotIn("_body_test_post", testClass.__dict__)
+                self.assertEqual((post["data"], post["json"]), ({}, {"a": 10, "t": [200]}))
+                if captured:
+                    self.assertNotIn("_body_test_page", testClass.__dict__)
+                    self.assertEqual((page["data"], page["json"]), ({}, {"a": 10}))
+                else:
+                    self.assertEqual((page["data"], page["json"]), (b'{"a": 10}', None))
+
+    def test_dependencies(self):
+        for backend in ("text", "ast") if AST_BACKEND else ("text",):
+            code, className = NomosBuilder(self.path, "depends.ns", backend=backend).build()[:2]
+            testClass = loadTestcase(code, self.path, "depends.ns", className)
+            self.assertEqual(testClass.DEPENDENCIES, {"test_get": ("test_login",),
+                                                      "test_delete_all": ("test_get", "test_login")})
+            testClass.setUpClass()
+            testClass("test_login").test_login()
+            self.assertEqual(testClass.token, 200)
+
+        path = os.path.join(self.path, "depends.ns")
+        for text, message in [("[a]\n>> GET /a\ndepends : b\n", "Unknown test section `b`"),
+                              ("[a]\n>> GET /a\ndepends : b\n\n[b]\n>> GET /b\nhead << { h: $xx }\n\n"
+                               "[c]\n>> GET /c\ndepends : a\n$xx = @{res.status}\n",
+                               "test_a -> test_b -> test_c -> test_a")]:
+            with open(path, "w") as f:
+                f.write(text)
+            with self.assertRaises(NomosError) as cm:
+                NomosBuilder(self.path, "depends.ns").build()
+            self.assertIn(message, str(cm.exception))
+
+    def test_regex_asserts(self):
+        for backend in ("text", "ast") if AST_BACKEND else ("text",):
+            code, className = NomosBuilder(self.path, "regex.ns", backend=backend).build()[:2]
+            testClass = loadTestcase(code, self.path, "regex.ns", className, Session(RegexResponse))
+            self.assertEqual(testClass._re_test_get_0.pattern, "nomos")
+            self.assertEqual(testClass._re_test_get_1.pattern, "^n")
+            # the variables and the invalid regex are complied by the call
+            self.assertFalse(hasattr(testClass, "_re_test_get_2"))
+            testClass.setUpClass()
+            self.assertRaises(re.error, testClass("test_get").test_get)
+            self.assertIn("/^N/", WebTestCase.REGEX_CACHE.items)
+
+
+@unittest.skipUnless(AST_BACKEND, "the ast backend requires python 3.8+")
+class NomasAstComplirerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        with open(os.path.join(self.path, "suite.ns"), "w") as f:
+            f.write(SUITE)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def build(self, backend, asyncMethods=False):
+        return NomosBuilder(self.path, "suite.ns", backend=backend, asyncMethods=asyncMethods).build()[0]
+
+    def test_same_code(self):
+        self.assertEqual(ast.dump(self.build("ast")), ast.dump(ast.parse(self.build("text"))))
+
+    def test_async_methods(self):
+        module = self.build("ast", asyncMethods=True)
+        self.assertEqual(ast.dump(module), ast.dump(ast.parse(self.build("text", asyncMethods=True))))
+        self.assertIn("res = await self.session.doRequest(", self.build("text", asyncMethods=True))
+        testClass = loadTestcase(module, self.path, "suite.ns", "SuiteTest", AsyncSession())
+        testClass.setUpClass()
+        with self.assertRaises(AssertionError):
+            asyncio.run(testClass("test_get").test_get())
+
+    def test_line_numbers(self):
+        testClass = loadTestcase(self.build("ast"), self.path, "suite.ns", "SuiteTest")
+        testClass.setUpClass()
+        self.assertEqual(testClass.name, "nomos")
+        try:
+            testClass("test_get").test_get()
+        except AssertionError:
+            frames = traceback.extract_tb(sys.exc_info()[2])
+        lines = [frame[1] for frame in frames if frame[0] == os.path.join(self.path, "suite.ns")]
+        self.assertEqual(lines, [12])
+
+    def test_dump_code(self):
+        runner = NomosRunner("http://localhost", [self.path], dumpCode=True, cache=False)
+        self.assertEqual(runner.genTestcaseSource(self.path, "suite.ns"), self.build("text"))
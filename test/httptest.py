@@ -14,8 +14,18 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import json
+import sys
+import threading
 import unittest
-from nomos.http import HttpSession
+from nomos.http import HttpPool, HttpSession
+from nomos.transport import encodeMultipart
+from requests.models import RequestEncodingMixin
+
+try:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+except ImportError:
+    ThreadingHTTPServer = None
 
 
 class HttpSessionTest(unittest.TestCase):
@@ -62,3 +72,169 @@ class HttpSessionTest(unittest.TestCase):
         res = session.doRequest("POST", "/post", files=files)
         self.assertEqual(res.status, 200)
         self.assertEqual(res.json['files']['file'], "data")
+
+
+class MultipartTest(unittest.TestCase):
+
+    def testFileHeaders(self):
+        files = {"file": ("report.xls", b"data", "application/txt", {"Expires": 0, "X-Part": "1",
+                                                                      "Content-Location": "/report"}),
+                 "plain": ("a.txt", b"hello")}
+        data = {"a": "1"}
+        body, contentType = RequestEncodingMixin._encode_files(files, data)
+        boundary = contentType.split("boundary=")[1]
+        self.assertEqual(encodeMultipart(data, files, boundary), (body, contentType))
+        self.assertIn(b"Content-Type: application/txt\r\nX-Part: 1\r\n\r\n", body)
+
+
+#: the content type and the body of the paths without the charset
+ENCODED = {
+    "/latin": ("text/plain", u"caf\xe9 cr\xe8me".encode("latin-1")),
+    "/json": ("application/json", u'{"a": "\xe9"}'.encode("utf-8")),
+    "/utf16": ("application/vnd.api+json", u'{"a": "\xe9"}'.encode("utf-16")),
+    "/guessed": ("application/octet-stream", u"Le caf\xe9 est tr\xe8s chaud, d\xe9j\xe0 pr\xeat.".encode("latin-1")),
+}
+
+
+if ThreadingHTTPServer is not None:
+
+    class EchoHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def echo(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if self.path in ENCODED:
+                contentType, body = ENCODED[self.path]
+                self.send_response(200)
+                self.send_header("Content-Type", contentType)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            info = json.dumps({"method": self.command, "path": self.path, "body": body.decode("latin-1"),
+                               "type": self.headers.get("Content-Type"), "cookie": self.headers.get("Cookie"),
+                               "auth": self.headers.get("Authorization")})
+            location = {"/redirect": "/get?from=redirect", "/away": self.headers.get("X-Location")}.get(self.path)
+            self.send_response(302 if location else 200)
+            if self.path == "/login":
+                self.send_header("Set-Cookie", "token=abc; Path=/")
+            if location:
+                self.send_header("Location", location)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(info)))
+            self.end_headers()
+            self.wfile.write(info.encode())
+
+        do_GET = do_POST = echo
+
+
+@unittest.skipIf(ThreadingHTTPServer is None, "the local server requires python 3.7+")
+class HttpPoolTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), EchoHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever).start()
+        cls.url = "http://127.0.0.1:%d" % cls.server.server_address[1]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def testSharedConnections(self):
+        for backend in ("requests", "urllib3"):
+            pool = HttpPool(maxsize=2)
+            first = HttpSession(self.url, pool=pool, backend=backend)
+            second = HttpSession(self.url + "/api", pool=pool, backend=backend)
+            self.assertEqual(first.doRequest("GET", "/login").status, 200)
+            for i in range(3):
+                self.assertEqual(first.doRequest("GET", "/get").json["cookie"], "token=abc")
+                # the sessions share the connections and not the cookies
+                self.assertEqual(second.doRequest("GET", "").json["cookie"], None)
+            self.assertEqual((pool.opened, pool.reused), (1, 6), backend)
+
+            pool.close()
+            self.assertEqual((pool.adapters, pool.managers), ({}, {}))
+            self.assertEqual((pool.opened, pool.reused), (1, 6))
+
+    def testBackends(self):
+        calls = [
+            (("GET", "/get"), {"params": {"a": [1, 2], "b": None, "c": "x y"}}),
+            (("POST", "/post"), {"data": {"a": "1 2"}}),
+            (("POST", "/post"), {"json": {"a": [1]}, "headers": {"X-Test": "1", "Skipped": None}}),
+            (("POST", "/post"), {"data": "raw", "headers": {"Content-Type": "text/plain"}}),
+            (("POST", "/redirect"), {"data": {"a": 1}}),
+            (("GET", "/login"), {}),
+            (("GET", "/get"), {}),
+        ]
+        results = {}
+        for backend in ("requests", "urllib3"):
+            session = HttpSession(self.url, backend=backend)
+            results[backend] = [(res.status, res.json, res.contentType, res.charset, res.getHeader("set_cookie"))
+                                for res in (session.doRequest(*args, **kw) for args, kw in calls)]
+        self.assertEqual(results["urllib3"], results["requests"])
+        self.assertEqual(results["urllib3"][4][1]["path"], "/get?from=redirect")
+        self.assertEqual(results["urllib3"][6][1]["cookie"], "token=abc")
+
+    def testRedirectAuth(self):
+        # the credentials are sent to the same host only
+        other = ThreadingHTTPServer(("127.0.0.1", 0), EchoHandler)
+        other.daemon_threads = True
+        threading.Thread(target=other.serve_forever).start()
+        otherUrl = "http://localhost:%d/get" % other.server_address[1]
+        calls = [(("GET", "/away"), {"headers": {"Authorization": "Basic YQ==", "Cookie": "a=1",
+                                                 "X-Location": location}})
+                 for location in ("/get", otherUrl)]
+        try:
+            results = {}
+            for backend in ("requests", "urllib3"):
+                session = HttpSession(self.url, backend=backend)
+                results[backend] = [session.doRequest(*args, **kw).json for args, kw in calls]
+            if sys.version_info >= (3, 7):
+                import asyncio
+                from nomos.asynchttp import AsyncHttpSession
+
+                async def send():
+                    session = AsyncHttpSession(self.url)
+                    try:
+                        return [(await session.doRequest(*args, **kw)).json for args, kw in calls]
+                    finally:
+                        session.pool.close()
+                results["asyncio"] = asyncio.run(send())
+        finally:
+            other.shutdown()
+            other.server_close()
+        for backend in results:
+            self.assertEqual([_["auth"] for _ in results[backend]], ["Basic YQ==", None], backend)
+            self.assertEqual(results[backend][1]["cookie"], None, backend)
+
+    def testDecodedContent(self):
+        # the content without the charset is decoded like requests does by every backend
+        results = {}
+        for backend in ("requests", "urllib3"):
+            session = HttpSession(self.url, backend=backend)
+            results[backend] = [session.doRequest("GET", path).content for path in sorted(ENCODED)]
+            results[backend].extend(session.doRequest("GET", path).json for path in ("/json", "/utf16"))
+        if sys.version_info >= (3, 7):
+            import asyncio
+            from nomos.asynchttp import AsyncHttpSession
+
+            async def send():
+                session = AsyncHttpSession(self.url)
+                try:
+                    responses = [await session.doRequest("GET", path) for path in sorted(ENCODED)]
+                    responses.extend([await session.doRequest("GET", path) for path in ("/json", "/utf16")])
+                finally:
+                    session.pool.close()
+                return [_.content for _ in responses[:len(ENCODED)]] + [_.json for _ in responses[len(ENCODED):]]
+            results["asyncio"] = asyncio.run(send())
+        for backend in results:
+            self.assertEqual(results[backend], results["requests"], backend)
+        self.assertIn(u"caf\xe9 cr\xe8me", results["requests"])
+        self.assertEqual(results["requests"][-2:], [{"a": u"\xe9"}] * 2)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import io
+import os.path
+import shutil
+import socket
+import sys
+import tempfile
+import unittest
+
+from nomos.runner import NomosRunner
+
+if sys.version_info >= (3, 7):
+    from nomos.mock import MockServer, Rules, buildRoutes, check, sampleRegex
+    from nomos.testcase import WebTestCase
+
+
+SUITE = r"""[initialize]
+$page = 10
+$name = "nomos"
+
+[get item]
+>> GET /items/1 page=$page
+code : 200
+code < 300
+content_type : "application/json"
+head : { x_token : "abc", server =~ "/^nomos \d+$/" }
+json {
+    id : 1
+    name : $name
+    count > 3
+    count != 4
+    score >= 1.5
+    tags ~~ 2
+    !items > 2
+    ok : true
+    owner { name : "tom", age < 30, email =~ "/^[a-z]+@\w+\.com$/" }
+    devices : [ { deviceId : 133, deviceId != 134, arr : [1, 2] } ]
+    roles <- "admin"
+    title =~ "/^(no|yes)mos$/i"
+}
+
+[item again]
+>> GET /items/1 page=2
+json {
+    extra : "field"
+}
+
+[created]
+>> POST /items
+code : 201
+content_type : "text/plain"
+content =~ "/created \w+/"
+
+[expression]
+>> GET /expression
+code : 200
+json {
+    status : @{res.status}
+}
+"""
+
+
+@unittest.skipIf(sys.version_info < (3, 7), "the mock server requires python 3.7+")
+class RulesTest(unittest.TestCase):
+
+    def value(self, rules, default=None):
+        warnings = []
+        value = Rules()
+        value.rules = rules
+        return value.value(warnings, "json", default), warnings
+
+    def test_values(self):
+        for rules in ([(">", 3), ("!=", 4), ("<=", 10)], [(">", 1.2), ("<", 1.8)], [(">=", 5), ("<", 6)]):
+            value, warnings = self.value(rules)
+            self.assertEqual(warnings, [])
+            self.assertTrue(all(check(value, operation, expected) for operation, expected in rules), value)
+        self.assertEqual(self.value([("!=", 200)], 200)[0], 201)
+        self.assertEqual(self.value([("<-", "a"), ("~~", 3)])[0], "axx")
+        self.assertEqual(self.value([("<-", 1), ("~~", 3)])[0], [1, 0, 0])
+        value, warnings = self.value([(":", 1), (":", 2)])
+        self.assertEqual((value, warnings), (1, ["json : 1 and : 2"]))
+
+    def test_regex(self):
+        for text in ("/^nomos \\d+$/", "/(a|b)c[x-z]{2,3}\\1/", "/[^a-c0-9]+@\\w*\\.com$/i", "/^\\s?-?\\d+(\\.\\d+)?$/"):
+            pattern = WebTestCase.complieRegex(text)
+            self.assertTrue(pattern.search(sampleRegex(pattern)), text)
+
+
+@unittest.skipIf(sys.version_info < (3, 7), "the mock server requires python 3.7+")
+class MockServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        with open(os.path.join(self.path, "suite.ns"), "w") as f:
+            f.write(SUITE)
+        self.routes = buildRoutes([(self.path, "suite.ns")])
+        self.server = MockServer(self.routes)
+        self.server.startThread()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.path)
+
+    def test_routes(self):
+        self.assertEqual(list(self.routes), [("GET", "/items/1"), ("POST", "/items"), ("GET", "/expression")])
+        self.assertEqual(self.routes[("GET", "/items/1")].warnings, [])
+        self.assertEqual(len(self.routes[("GET", "/expression")].warnings), 1)
+
+    def test_suite_passes(self):
+        stderr = sys.stderr
+        sys.stderr = io.StringIO()
+        try:
+            result = NomosRunner("http://127.0.0.1:%d" % self.server.port, [self.path], cache=False).run()
+        finally:
+            sys.stderr = stderr
+        self.assertEqual(result.testsRun, 4)
+        self.assertEqual([test.id().split(".")[-1] for test, text in result.failures], ["test_expression"])
+        self.assertEqual(result.errors, [])
+
+    def test_keep_alive(self):
+        conn = socket.create_connection(("127.0.0.1", self.server.port))
+        requests = [b"POST /items?x=1 HTTP/1.1\r\nContent-Length: 3\r\n\r\nabc",
+                    b"POST /items HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n3\r\nabc\r\n0\r\n\r\n",
+                    b"HEAD /items/1 HTTP/1.1\r\n\r\n",
+                    b"GET /missing HTTP/1.1\r\nConnection: close\r\n\r\n"]
+        conn.sendall(b"".join(requests))
+        data = b""
+        while True:
+            chunk = conn.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+        conn.close()
+        created = self.server.responses[("POST", "/items")]
+        head = self.server.responses[("HEAD", "/items/1")]
+        self.assertEqual(data, created * 2 + head + MockServer.NOT_FOUND)
+        self.assertIn(b"Content-Type: text/plain; charset=utf-8", created)
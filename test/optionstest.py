@@ -1,4 +1,6 @@
 import unittest
+from nomos.config import SelectConfig
+from nomos.nomoser import Nomoser
 from nomos.options import Options
 
 
@@ -28,3 +30,14 @@ class OptionsTest(unittest.TestCase):
         config = vars(config)
         self.assertEqual(config['server.port'], 8888)
         self.assertEqual(config['server.host'], "host")
+
+    def test_nomoser_options(self):
+        options = Options("Nomos")
+        nomoser = Nomoser()
+        nomoser.conf_path = None
+        nomoser.config(options)
+        config = SelectConfig()
+        # an option name is not the group of another option
+        config.update(vars(options.parse_args(["--http.cassette.mode", "record"])))
+        self.assertEqual(config.get("http.cassette.mode"), "record")
+        self.assertEqual(config.get("http.pool.maxsize"), 10)
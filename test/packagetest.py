@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+import os.path
+import shutil
+import tempfile
+import unittest
+
+from nomos.errors import NomosError
+from nomos.package import MANIFEST
+from nomos.runner import NomosRunner
+
+
+SUITE = """<%
+import os
+%>
+
+[initialize]
+$page = 10
+
+[get]
+>> GET /get page=$page sep=@os.sep
+code : 200
+"""
+
+MINIX = """__all__ = ["%s"]
+
+
+class %s(object):
+    %s = True
+"""
+
+
+class Response(object):
+    status = 200
+
+
+class Session(object):
+
+    def __init__(self):
+        self.requests = []
+
+    def doRequest(self, *args, **kw):
+        self.requests.append(kw)
+        return Response()
+
+
+class PackageRunner(NomosRunner):
+
+    def __init__(self, *args, **kw):
+        super(PackageRunner, self).__init__(*args, **kw)
+        self.session = Session()
+
+    def defaultNamespace(self):
+        ns = super(PackageRunner, self).defaultNamespace()
+        ns["_session"] = self.session
+        return ns
+
+
+class PackageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.suite = os.path.join(self.path, "suite")
+        os.makedirs(os.path.join(self.suite, "sub"))
+        for name in ("a.ns", os.path.join("sub", "a.ns")):
+            with open(os.path.join(self.suite, name), "w") as f:
+                f.write(SUITE)
+        with open(os.path.join(self.suite, "sub", "helper.py"), "w") as f:
+            f.write(MINIX % ("Helper", "Helper", "helped"))
+        self.minix = os.path.join(self.path, "common.py")
+        with open(self.minix, "w") as f:
+            f.write(MINIX % ("Common", "Common", "common"))
+        self.out = os.path.join(self.path, "out")
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_build_and_run(self):
+        manifest = NomosRunner("http://localhost", [self.suite], minixs=[self.minix]).buildPackage(self.out)
+        with open(os.path.join(self.out, MANIFEST)) as f:
+            self.assertEqual(json.load(f), manifest)
+        self.assertEqual([(_["class"], _["minixs"]) for _ in manifest["tests"]],
+                         [("ATest", ["_minix_0"]), ("ATest", ["_minix_0", "_minix_1"])])
+        self.assertNotEqual(manifest["tests"][0]["module"], manifest["tests"][1]["module"])
+
+        runner = PackageRunner("http://localhost", [self.out], cache=False)
+        results = runner.run()
+        self.assertEqual((results.testsRun, results.errors, results.failures), (2, [], []))
+        self.assertEqual(runner.builders, {})
+        self.assertEqual([_["params"] for _ in runner.session.requests], [{"page": 10, "sep": os.sep}] * 2)
+
+    def test_minixs(self):
+        NomosRunner("http://localhost", [self.suite], minixs=[self.minix]).buildPackage(self.out)
+        classes = []
+        runner = PackageRunner("http://localhost", [self.out], cache=False)
+        runner.extendMinixs = lambda testClass, minixs: classes.append(minixs) or testClass
+        runner.run()
+        self.assertEqual([[_.__name__ for _ in minixs] for minixs in classes], [["Common"], ["Common", "Helper"]])
+
+    def test_rebuild(self):
+        runner = NomosRunner("http://localhost", [self.suite])
+        runner.buildPackage(self.out)
+        runner.buildPackage(self.out)
+        self.assertRaises(NomosError, runner.buildPackage, self.suite)
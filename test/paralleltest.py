@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import asyncio
+import io
+import multiprocessing
+import os.path
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.util import strclass
+
+from nomos import globalvar
+import nomos.runner
+from nomos.parallel import ProcessSuite, RecordingResult, ThreadedSuite
+from nomos.runner import NomosRunner
+
+
+SUITES = {
+    "a.ns": """[get]
+>> GET /ok
+code : 200
+""",
+    "b.ns": """[fail]
+>> GET /missing
+code : 200
+
+[error]
+>> GET /ok
+code : @undefinedName
+""",
+    "c.ns": """[helped]
+>> GET /ok
+code : 200
+""",
+}
+
+DEPENDS = """[zlogin]
+>> POST /ok
+$token = @{res.status}
+
+[a]
+>> GET /ok
+head << { auth: $token }
+
+[b fail]
+>> GET /missing
+code : 200
+
+[c]
+>> GET /ok
+depends : ["b fail"]
+
+[d]
+>> GET /ok
+"""
+
+RESOURCE = """[resource]
+>> GET /ok
+code : @{int(resource("status.txt"))}
+"""
+
+MINIX = """__all__ = ["Helper"]
+
+
+class Helper(object):
+
+    def test_helper(self):
+        assert self.helped
+"""
+
+
+class Response(object):
+
+    def __init__(self, status):
+        self.status = status
+
+
+class Session(object):
+
+    def doRequest(self, method, url, **kw):
+        return Response(404 if url == "/missing" else 200)
+
+
+class AsyncSession(Session):
+
+    async def doRequest(self, method, url, **kw):
+        await asyncio.sleep(0.2)
+        return super(AsyncSession, self).doRequest(method, url, **kw)
+
+
+class ProcessRunner(NomosRunner):
+
+    def defaultNamespace(self):
+        ns = super(ProcessRunner, self).defaultNamespace()
+        ns["_session"] = AsyncSession() if self.asyncMethods else Session()
+        return ns
+
+
+def makeCase(name, fail=False):
+    """Returns the test case class recording the threads of its setUpClass and tests"""
+
+    class Case(unittest.TestCase):
+
+        @classmethod
+        def setUpClass(cls):
+            cls.threads = [threading.current_thread()]
+
+        def test_a(self):
+            time.sleep(0.2)
+            self.threads.append(threading.current_thread())
+
+        def test_b(self):
+            self.threads.append(threading.current_thread())
+            self.assertFalse(fail, name)
+
+    Case.__name__ = name
+    return Case
+
+
+def run(suite):
+    stream = io.StringIO() if str is not bytes else io.BytesIO()
+    result = unittest.TextTestRunner(stream=stream, verbosity=2).run(suite)
+    return result, stream.getvalue()
+
+
+def runDsl(path, **kw):
+    """Runs the dsl files with the fake sessions, returns the result and the report"""
+    stderr = sys.stderr
+    sys.stderr = io.StringIO() if str is not bytes else io.BytesIO()
+    try:
+        result = ProcessRunner("http://localhost", [path], debug=True, cache=False, **kw).run()
+        return result, sys.stderr.getvalue()
+    finally:
+        sys.stderr = stderr
+
+
+def report(output):
+    """Returns the report without the timing line"""
+    return [_ for _ in output.splitlines() if not _.startswith("Ran ")]
+
+
+class ThreadedSuiteTest(unittest.TestCase):
+
+    def suites(self):
+        loader = unittest.TestLoader()
+        self.classes = [makeCase("Case%d" % i, fail=i == 2) for i in range(4)]
+        return [loader.loadTestsFromTestCase(_) for _ in self.classes]
+
+    def test_same_report(self):
+        serial, serialOutput = run(unittest.TestSuite(self.suites()))
+        start = time.time()
+        threaded, threadedOutput = run(ThreadedSuite(self.suites(), 4))
+        elapsed = time.time() - start
+        self.assertLess(elapsed, 0.6)
+        self.assertEqual(report(serialOutput), report(threadedOutput))
+        self.assertEqual(threaded.testsRun, 8)
+        self.assertEqual(len(threaded.failures), 1)
+        self.assertEqual(threaded.failures[0][0].__class__.__name__, "Case2")
+
+    def test_class_on_one_thread(self):
+        run(ThreadedSuite(self.suites(), 2))
+        for testClass in self.classes:
+            self.assertEqual(len(testClass.threads), 3)
+            self.assertEqual(len(set(testClass.threads)), 1)
+
+    def test_class_error(self):
+
+        class Broken(unittest.TestCase):
+
+            @classmethod
+            def setUpClass(cls):
+                raise ValueError("broken")
+
+            def test_a(self):
+                pass
+
+        suites = self.suites()
+        suites.insert(1, unittest.TestLoader().loadTestsFromTestCase(Broken))
+        result, output = run(ThreadedSuite(suites, 3))
+        self.assertEqual(len(result.errors), 1)
+        self.assertIn("setUpClass", str(result.errors[0][0]))
+        self.assertEqual(result.testsRun, 8)
+
+    def test_recording_result(self):
+        recorder = RecordingResult()
+        self.suites()
+        unittest.TestLoader().loadTestsFromTestCase(self.classes[2])(recorder)
+        self.assertEqual(len(recorder.failures), 1)
+        result = unittest.TestResult()
+        recorder.replay(result)
+        self.assertEqual(result.testsRun, 2)
+        self.assertEqual(len(result.failures), 1)
+
+
+@unittest.skipIf(sys.version_info < (3, 7), "the asyncio engine requires python 3.7+")
+class AsyncSuiteTest(unittest.TestCase):
+
+    def test_class_fixtures(self):
+        from nomos.asyncsuite import AsyncSuite
+
+        class Broken(unittest.TestCase):
+
+            @classmethod
+            def setUpClass(cls):
+                raise ValueError("broken")
+
+            def test_a(self):
+                pass
+
+        class Skipped(Broken):
+
+            @classmethod
+            def setUpClass(cls):
+                raise unittest.SkipTest("later")
+
+        loader = unittest.TestLoader()
+        result = unittest.TestResult()
+        AsyncSuite([loader.loadTestsFromTestCase(Broken), loader.loadTestsFromTestCase(Skipped)], 2)(result)
+        self.assertEqual(result.testsRun, 0)
+        self.assertEqual([str(_[0]) for _ in result.errors], ["setUpClass (%s)" % strclass(Broken)])
+        self.assertIn("ValueError: broken", result.errors[0][1])
+        self.assertEqual([(str(test), reason) for test, reason in result.skipped],
+                         [("setUpClass (%s)" % strclass(Skipped), "later")])
+        # the fixture errors are sent by the process workers too
+        recorder = RecordingResult()
+        AsyncSuite([loader.loadTestsFromTestCase(Broken)], 2)(recorder)
+        self.assertEqual(str(recorder.serialize()[-1][1][0]), "setUpClass (%s)" % strclass(Broken))
+
+
+class ProcessSuiteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        for name, text in SUITES.items():
+            with open(os.path.join(self.path, name), "w") as f:
+                f.write(text)
+        with open(os.path.join(self.path, "helper.py"), "w") as f:
+            f.write(MINIX.replace("self.helped", "True"))
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_same_report(self):
+        serial, serialOutput = runDsl(self.path)
+        result, output = runDsl(self.path, workers=3, parallel="process")
+        self.assertEqual(report(serialOutput), report(output))
+        self.assertEqual((result.testsRun, len(result.failures), len(result.errors)), (7, 1, 1))
+        self.assertFalse(result.wasSuccessful())
+        self.assertIn("NameError", result.errors[0][1])
+        self.assertIn("b.ns", result.errors[0][1])
+
+    def test_asyncio(self):
+        serial, serialOutput = runDsl(self.path)
+        start = time.time()
+        result, output = runDsl(self.path, workers=10, parallel="asyncio")
+        self.assertLess(time.time() - start, 0.6)
+        self.assertEqual(report(serialOutput), report(output))
+        self.assertEqual((result.testsRun, len(result.failures), len(result.errors)), (7, 1, 1))
+        self.assertIn("b.ns", result.errors[0][1])
+        self.assertNotIn("asyncsuite", result.errors[0][1])
+
+
+class SpawnSuite(ProcessSuite):
+
+    def __init__(self, runner, tasks, workers):
+        super(SpawnSuite, self).__init__(runner, tasks, workers, multiprocessing.get_context("spawn"))
+
+
+class SpawnProcessSuiteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.resources = tempfile.mkdtemp()
+        for name in ("a.ns", "b.ns"):
+            with open(os.path.join(self.path, name), "w") as f:
+                f.write(RESOURCE)
+        with open(os.path.join(self.resources, "status.txt"), "w") as f:
+            f.write("200")
+        self.resource = globalvar.config.get("resource")
+        globalvar.config.set("resource", self.resources)
+        nomos.runner.ProcessSuite = SpawnSuite
+
+    def tearDown(self):
+        nomos.runner.ProcessSuite = ProcessSuite
+        globalvar.config.set("resource", self.resource)
+        shutil.rmtree(self.path)
+        shutil.rmtree(self.resources)
+
+    def test_resource_config(self):
+        result, output = runDsl(self.path, workers=2, parallel="process")
+        self.assertEqual((result.testsRun, len(result.failures), len(result.errors)), (2, 0, 0), output)
+
+
+class DependencyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        with open(os.path.join(self.path, "depends.ns"), "w") as f:
+            f.write(DEPENDS)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_order_and_skip(self):
+        for kw in ({}, {"parallel": "asyncio", "workers": 10}):
+            start = time.time()
+            result, output = runDsl(self.path, **kw)
+            names = [_.split()[0] for _ in output.splitlines() if _.startswith("test_")]
+            self.assertEqual(names, ["test_zlogin", "test_a", "test_b_fail", "test_c", "test_d"])
+            self.assertEqual((result.testsRun, len(result.failures), len(result.skipped)), (5, 1, 1))
+            self.assertEqual(result.skipped[0][1], "test_b_fail did not pass")
+        # the async tests take the time of the longest dependency path
+        self.assertLess(time.time() - start, 0.6)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os.path
+import shutil
+import tempfile
+import unittest
+
+from nomos.compiler import NomasComplirer
+from nomos.dsl import DslParser
+from nomos.errors import ParserException, TokenizerException
+from nomos.parser import NomosScanner, NomosTokenizer, TokenType
+from nomos.util import resource
+
+
+SMOKE_PATH = os.path.join(os.path.dirname(__file__), "smoke", "httpbin.org")
+CONF_PATH = os.path.join(os.path.dirname(__file__), "conf")
+
+
+def corpus():
+    """The test corpus file list"""
+    files = [os.path.join(SMOKE_PATH, f) for f in sorted(os.listdir(SMOKE_PATH)) if f.endswith(".ns")]
+    files.append(os.path.join(CONF_PATH, "config.txt"))
+    return files
+
+
+def tokenStream(reader):
+    """Pull all the tokens until the end of file or the first error"""
+    stream = []
+    while True:
+        try:
+            t = reader.pullNext()
+        except TokenizerException as e:
+            stream.append(("error", str(e), reader.index))
+            return stream
+        stream.append((type(t).__name__, t.tokenType, t.sourceIndex, t.length,
+                       t.value, getattr(t, "isQuoted", None), reader.index))
+        if t.tokenType == TokenType.EoF:
+            return stream
+
+
+class NomosTokenizerTest(unittest.TestCase):
+
+    def test_pull_rest_of_line(self):
+        reader = NomosTokenizer(" token=$token \r\n next")
+        self.assertEqual(reader.pullRestOfLine(), "token=$token")
+        self.assertEqual(reader.pullRestOfLine(), "next")
+        self.assertTrue(reader.eof)
+
+    def test_pull_util_match(self):
+        reader = NomosTokenizer("<% import os\nimport re %> [name]")
+        reader.take(2)
+        self.assertEqual(reader.pullUtilMatch("%>"), "import os\nimport re")
+        self.assertEqual(reader.pullNext().tokenType, TokenType.MethodNameStart)
+        self.assertEqual(reader.pullUtilMatch("]"), "name")
+        self.assertRaises(TokenizerException, NomosTokenizer("import os").pullUtilMatch, "%>")
+
+    def test_pull_quoted_text(self):
+        reader = NomosTokenizer('"a\\tb" "unterminated')
+        t = reader.pullQuotedText()
+        self.assertEqual((t.value, t.sourceIndex, t.length, t.isQuoted), ("a\\tb", 0, 6, True))
+        reader.pullWhitespace()
+        self.assertEqual(reader.pullQuotedText().value, "unterminated")
+        self.assertTrue(reader.eof)
+
+    def test_pull_trip_quoted_text(self):
+        reader = NomosTokenizer('"""line "1"\nline 2""" tail')
+        t = reader.pullValue()
+        self.assertEqual((t.value, t.length), ('line "1"\nline 2', 21))
+        self.assertRaises(TokenizerException, NomosTokenizer('"""line').pullTripQuotedText)
+
+    def test_pull_unquoted_text(self):
+        reader = NomosTokenizer("/page/i// comment", True)
+        self.assertEqual(reader.pullUnquotedText().value, "/page/i")
+        self.assertEqual(NomosTokenizer("12,", True).pullUnquotedText().value, 12)
+
+    def test_line_column(self):
+        reader = NomosTokenizer("a\nbc\n\nd")
+        self.assertEqual(reader.lineColumn(0), (1, 1))
+        self.assertEqual(reader.lineColumn(1), (1, 2))
+        self.assertEqual(reader.lineColumn(3), (2, 2))
+        self.assertEqual(reader.lineColumn(5), (3, 1))
+        self.assertEqual(reader.lineColumn(6), (4, 1))
+
+    def test_error_position(self):
+        reader = NomosTokenizer("a = 1\n  ^x")
+        reader.pullNext()
+        reader.pullNext()
+        reader.pullWhitespace()
+        reader.pullValue()
+        with self.assertRaises(TokenizerException) as cm:
+            reader.pullNext()
+        self.assertIn("at line 2, column 3: `^x...`", str(cm.exception))
+
+    def test_sub_range(self):
+        text = "[get]\n>> GET /get page=$page size=10\ncode: 200"
+        for cls in (NomosTokenizer, NomosScanner):
+            reader = cls(text, start=text.index("page"), end=text.index("\ncode"))
+            tokens = []
+            while not reader.eof:
+                tokens.append(reader.pullNext())
+                reader.pullWhitespace()
+                if reader.isValue():
+                    tokens.append(reader.pullValue())
+            self.assertEqual([t.value for t in tokens], ["page", "=", "$page", "size", "=", "10"])
+            self.assertEqual(tokens[0].sourceIndex, text.index("page"))
+
+            reader = cls(text)
+            reader.pushEnd(text.index("]"))
+            self.assertEqual(reader.pullNext().tokenType, TokenType.MethodNameStart)
+            self.assertEqual(reader.pullNext().value, "get")
+            self.assertTrue(reader.eof)
+            reader.popEnd()
+            self.assertEqual(reader.pullNext().tokenType, TokenType.MethodNameEnd)
+
+    def test_slotted_tokens(self):
+        t = NomosTokenizer('"key"').pullNext()
+        self.assertFalse(hasattr(t, "__dict__"))
+        self.assertEqual((t.value, t.isQuoted), ("key", True))
+
+
+class NomosScannerTest(unittest.TestCase):
+
+    def test_token_stream(self):
+        for path in corpus():
+            text = resource(path)
+            self.assertEqual(tokenStream(NomosScanner(text)), tokenStream(NomosTokenizer(text)), path)
+
+    def test_values(self):
+        text = 'a = "quoted" b:unquoted c=${ call() } d = [1, 2] e = {} f = 1.5 g = on'
+        for pystyle in (True, False):
+            for index in range(len(text) + 1):
+                expected, scanner = NomosTokenizer(text, pystyle), NomosScanner(text, pystyle)
+                expected._index = scanner._index = index
+                self.assertEqual(scanner.isValue(), expected.isValue())
+                if not expected.isValue():
+                    continue
+                t, e = scanner.pullValue(), expected.pullValue()
+                self.assertEqual((t.tokenType, t.sourceIndex, t.length, t.value),
+                                 (e.tokenType, e.sourceIndex, e.length, e.value))
+                self.assertEqual(scanner.index, expected.index)
+
+    def test_unknown_token(self):
+        self.assertRaises(TokenizerException, NomosScanner("  ^").pullNext)
+
+    def test_build_nomos(self):
+        for filename in sorted(os.listdir(SMOKE_PATH)):
+            if not filename.endswith(".ns"):
+                continue
+            codes = []
+            for tokenizer in ("default", "regex"):
+                compiler = NomasComplirer()
+                compiler.complie(DslParser(SMOKE_PATH, filename, tokenizer).buildNomos())
+                codes.append(compiler.code)
+            self.assertEqual(codes[0], codes[1], filename)
+
+    def test_build_config(self):
+        expected = DslParser(CONF_PATH, "config.txt").buildConfig()
+        config = DslParser(CONF_PATH, "config.txt", "regex").buildConfig()
+        self.assertEqual(config.config(), expected.config())
+        self.assertEqual(config.get("server.port"), 8880)
+
+
+class DslParserTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def parse(self, text, tokenizer="default"):
+        with open(os.path.join(self.path, "suite.ns"), "w") as f:
+            f.write(text)
+        return DslParser(self.path, "suite.ns", tokenizer).buildNomos()
+
+    def test_request_line_position(self):
+        for tokenizer in ("default", "regex"):
+            with self.assertRaises(ParserException) as cm:
+                self.parse("[get]\n>> GET /get page=^\ncode: 200\n", tokenizer)
+            self.assertIn("at line 2, column 18", str(cm.exception))
+
+    def test_request_line(self):
+        root = self.parse("[get]\n>> GET /get page=1 # comment\r\ncode: 200\n")
+        method = root.methods[0]
+        self.assertEqual((method.httpMethod, method.httpPath), ("GET", "/get"))
+        self.assertEqual([(k.value, v.value) for k, v in method.params.items()], [("page", 1)])
+        self.assertEqual(len(method.testAsserts), 1)
+
+    def test_method_tree(self):
+        root = self.parse('[post]\n>> POST /post\njson << {"a": [1, {"b": "c"}]}\n'
+                          'json: {"code": 0, "items": [1, 2]}\nhead << {"X": "y"}\n'
+                          '[empty]\n>> POST /empty\njson << {}\n')
+        post, empty = root.methods
+        self.assertEqual(post.json.value["a"].value[1].value["b"].value, "c")
+        self.assertEqual([(k.value, v.value) for k, v in post.headers.items()], [("X", "y")])
+        self.assertEqual([(n.key.value, n.nodeType) for n in post.testAsserts], [("code", "json"), ("items", "array")])
+        self.assertEqual(empty.json.value, {})
+
+    def test_key_without_section(self):
+        with self.assertRaises(ParserException):
+            self.parse("code: 200\n[get]\n>> GET /get\n")
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import io
+import json
+import os.path
+import shutil
+import sys
+import tempfile
+import unittest
+
+from nomos.errors import NomosError
+from nomos.runner import NomosRunner
+from nomos.shard import loadReport, mergeReportFiles, parseShard, shardUnits
+
+
+SUITES = {
+    "a.ns": """[get]
+>> GET /ok
+code : 200
+""",
+    "b.ns": """[fail]
+>> GET /missing
+code : 200
+
+[error]
+>> GET /ok
+code : @undefinedName
+""",
+    "c.ns": """[get]
+>> GET /ok
+code : 200
+
+[missing]
+>> GET /missing
+code : 404
+""",
+}
+
+
+class Response(object):
+
+    def __init__(self, status):
+        self.status = status
+
+
+class Session(object):
+
+    def doRequest(self, method, url, **kw):
+        return Response(404 if url == "/missing" else 200)
+
+
+class FakeRunner(NomosRunner):
+
+    def defaultNamespace(self):
+        ns = super(FakeRunner, self).defaultNamespace()
+        ns["_session"] = Session()
+        return ns
+
+
+class ShardTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        for name, text in SUITES.items():
+            with open(os.path.join(self.path, name), "w") as f:
+                f.write(text)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def run_shard(self, shard, **kw):
+        stderr = sys.stderr
+        sys.stderr = io.StringIO() if str is not bytes else io.BytesIO()
+        try:
+            report = os.path.join(self.path, "report-%d.json" % shard[0])
+            FakeRunner("http://localhost", [self.path], cache=False, shard=shard, report=report, **kw).run()
+            return report
+        finally:
+            sys.stderr = stderr
+
+    def test_parse_shard(self):
+        self.assertEqual(parseShard("2/3"), (2, 3))
+        for text in ("0/3", "4/3", "1", "a/b"):
+            self.assertRaises(NomosError, parseShard, text)
+
+    def test_partition(self):
+        units = [("f%d.ns" % i, 100 * (i % 4) + 1) for i in range(20)]
+        shards = [shardUnits(units, i, 3) for i in range(1, 4)]
+        self.assertEqual(sorted(sum(shards, [])), sorted(units))
+        self.assertEqual(shards, [shardUnits(list(units), i, 3) for i in range(1, 4)])
+        loads = [sum(_[1] for _ in shard) for shard in shards]
+        self.assertLessEqual(max(loads) - min(loads), 301)
+
+        # the durations win over the sizes, the sizes are scaled to the seconds of the known classes
+        durations = dict((_[0], 1.0) for _ in units)
+        durations["f1.ns"] = 30.0
+        shards = [shardUnits(units, i, 2, durations) for i in range(1, 3)]
+        self.assertEqual([_[0] for _ in shards[0]], ["f1.ns"])
+        self.assertEqual(len(shards[1]), 19)
+        durations = {"f1.ns": 30.0}
+        shards = [shardUnits(units, i, 2, durations) for i in range(1, 3)]
+        self.assertEqual(sorted(sum(shards, [])), sorted(units))
+
+    def test_keys(self):
+        os.makedirs(os.path.join(self.path, "sub"))
+        for name in ("d.ns", "e.ns"):
+            with open(os.path.join(self.path, "sub", name), "w") as f:
+                f.write(SUITES["a.ns"])
+        cwd = os.getcwd()
+        keys = []
+        try:
+            # the keys do not depend on the working directory and the absolute paths, the first root wins
+            for workdir, path in ((cwd, self.path), (self.path, "."), (os.path.join(self.path, "sub"), "..")):
+                os.chdir(workdir)
+                runner = FakeRunner("http://localhost", [os.path.join(path, "sub", "d.ns"), path], cache=False)
+                keys.append(sorted(runner.testFileKey(*_[:2]) for _ in runner.walkTestFiles()))
+                manifest = runner.buildPackage(os.path.join(self.path, "built"))
+                self.assertEqual(sorted(_["key"] for _ in manifest["tests"]), keys[-1])
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(keys, [["a.ns", "b.ns", "c.ns", "d.ns", "d.ns", "sub/e.ns"]] * 3)
+
+    def test_merge_reports(self):
+        reports = [self.run_shard((i, 2), workers=2 if i == 2 else 1) for i in (1, 2)]
+        runs = [loadReport(_)["testsRun"] for _ in reports]
+        self.assertNotIn(0, runs)
+        self.assertEqual(sum(runs), 5)
+
+        merged = os.path.join(self.path, "merged.json")
+        stream = io.StringIO() if str is not bytes else io.BytesIO()
+        result = mergeReportFiles(reports, merged, stream)
+        self.assertFalse(result.wasSuccessful())
+        output = stream.getvalue()
+        self.assertIn("Ran 5 tests in ", output)
+        self.assertIn("FAILED (failures=1, errors=1)", output)
+        self.assertIn("FAIL: test_fail", output)
+
+        with open(merged) as f:
+            durations = json.load(f)["durations"]
+        self.assertEqual(sorted(os.path.basename(_) for _ in durations), sorted(SUITES))
+
+        # the next run balances the shards by the durations of the merged report
+        report = self.run_shard((1, 3), durations=merged)
+        self.assertEqual(len(loadReport(report)["durations"]), 1)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Nomos
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os.path
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+from nomos.http import HttpSession
+from nomos.runner import NomosRunner
+from nomos.stream import WINDOW, RegexScan, scanContent
+
+try:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+except ImportError:
+    ThreadingHTTPServer = None
+
+
+#: the export content of 3MB
+EXPORT = "".join("row %d,nomos\n" % i for i in range(200000)) + "total 200000\n"
+
+#: the export content of the latin-1 encoding and its content types without the charset by the path
+LATIN_EXPORT = "".join(u"caf\xe9 %d, cr\xe8me br\xfbl\xe9e, d\xe9j\xe0 vu\n" % i for i in range(60000))
+LATIN = {"/latin": "text/csv", "/guessed": "application/octet-stream"}
+
+SUITE = r"""[export]
+>> GET /export
+code : 200
+content =~ "/^row 0,/"
+content =~ "/total \d+$/"
+content <- "row 123456,nomos"
+content ~~ %d
+
+[chunked]
+>> GET /chunked
+content <- "row 199999,nomos"
+
+[missing]
+>> GET /export
+content =~ "/row 200000,/"
+
+[whole]
+>> GET /export
+content =~ "/^row 0,/"
+content != ""
+""" % len(EXPORT)
+
+
+def chunks(text, size):
+    return (text[i:i + size] for i in range(0, len(text), size))
+
+
+class ScanTest(unittest.TestCase):
+
+    def scan(self, text, rules, size=7):
+        return [_.found if _.operation != '~~' else _.length for _ in scanContent(chunks(text, size), rules)]
+
+    def test_split_matches(self):
+        text = "abc nomos 123 def\nlast"
+        rules = [('=~', re.compile(r'nomos \d+ d')), ('<-', 'nomos 12'), ('~~', 4), ('<-', 'nomosx'),
+                 ('=~', re.compile(r'^last')), ('=~', re.compile(r'(?m)^last$')), ('=~', re.compile(r'\Aabc'))]
+        for size in (1, 2, 7, 100):
+            self.assertEqual(self.scan(text, rules, size), [True, True, len(text), False, False, True, True])
+
+    def test_anchors(self):
+        # the $ before a chunk end and the ^ after the trimmed window are not the content end and start
+        text = "ab\n" + "x" * (WINDOW * 3) + "\nend"
+        for pattern, found in ((r'ab$', False), (r'(?m)ab$', True), (r'^x', False), (r'(?m)^x', True),
+                               (r'x$', False), (r'd$', True), (r'^ab', True)):
+            self.assertEqual(self.scan(text, [('=~', re.compile(pattern))], 1000), [found], pattern)
+
+    def test_bounded_window(self):
+        scan = RegexScan(re.compile(r'nomos.*\d'))
+        for chunk in chunks("x" * (WINDOW * 50), 65536):
+            scan.feed(chunk)
+            self.assertLessEqual(len(scan.text), WINDOW * 2 + 256)
+        scan.feed("nomos 1")
+        scan.close()
+        self.assertTrue(scan.found)
+
+
+if ThreadingHTTPServer is not None:
+
+    class ExportHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            body = EXPORT.encode("utf-8")
+            contentType = "text/csv; charset=utf-8"
+            if self.path in LATIN:
+                body, contentType = LATIN_EXPORT.encode("latin-1"), LATIN[self.path]
+            self.send_response(200)
+            self.send_header("Content-Type", contentType)
+            if self.path == "/chunked":
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i in range(0, len(body), 100000):
+                    chunk = body[i:i + 100000]
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                if self.path == "/short":
+                    body = b"short"
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+
+@unittest.skipIf(ThreadingHTTPServer is None, "the local server requires python 3.7+")
+class StreamTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), ExportHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever).start()
+        cls.url = "http://127.0.0.1:%d" % cls.server.server_address[1]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_sessions(self):
+        for backend in ("requests", "urllib3"):
+            session = HttpSession(self.url, backend=backend, stream=True)
+            res = session.doRequest("GET", "/short")
+            self.assertFalse(res.stream)
+            self.assertEqual(res.content, "short")
+            for path in ("/export", "/chunked"):
+                res = session.doRequest("GET", path)
+                self.assertTrue(res.stream)
+                self.assertEqual("".join(res.iterContent()), EXPORT, backend)
+                self.assertRaises(Exception, lambda: res.content)
+            # the unread content is dropped by the next request
+            res = session.doRequest("GET", "/export")
+            self.assertEqual(res.status, 200)
+            self.assertEqual(session.doRequest("GET", "/chunked").content, EXPORT)
+
+    def test_decoded_chunks(self):
+        # the chunks are decoded like the content read at once
+        for backend in ("requests", "urllib3"):
+            for path in sorted(LATIN):
+                content = HttpSession(self.url, backend=backend).doRequest("GET", path).content
+                res = HttpSession(self.url, backend=backend, stream=True).doRequest("GET", path)
+                self.assertTrue(res.stream)
+                self.assertEqual("".join(res.iterContent()), content, (backend, path))
+            # the text types without the charset are ISO-8859-1, the other encodings are guessed
+            self.assertEqual(HttpSession(self.url, backend=backend).doRequest("GET", "/latin").content, LATIN_EXPORT)
+
+    def test_suite(self):
+        path = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(path, "export.ns"), "w") as f:
+                f.write(SUITE)
+            for backend, stream in (("requests", True), ("urllib3", True), ("requests", False)):
+                stderr = sys.stderr
+                sys.stderr = open(os.devnull, "w")
+                try:
+                    result = NomosRunner(self.url, [path], cache=False, backend=backend, stream=stream).run()
+                finally:
+                    sys.stderr.close()
+                    sys.stderr = stderr
+                self.assertEqual(result.testsRun, 4)
+                self.assertEqual([test.id().split(".")[-1] for test, text in result.failures], ["test_missing"])
+                self.assertEqual(result.errors, [])
+        finally:
+            shutil.rmtree(path)
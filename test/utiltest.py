@@ -17,7 +17,7 @@
 
 import unittest
 
-from nomos.util import lazy_attr, resource
+from nomos.util import LruCache, lazy_attr, resource
 
 
 class Dummy(object):
@@ -50,6 +50,20 @@ class TestLazyAttr(unittest.TestCase):
         self.assertEqual(decorator.__doc__, "My doc")
 
 
+class LruCacheTest(unittest.TestCase):
+
+    def test_drops_least_recently_used(self):
+        cache = LruCache(2)
+        self.assertEqual(cache.put("a", 1), 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+
+
 class ResourceTest(unittest.TestCase):
 
     def tet_resource(self):